@@ -0,0 +1,12 @@
+"""Image encryption by pixel manipulation (XOR + pixel scrambling)."""
+
+__all__ = ['encrypt', 'decrypt', 'validate_key']
+
+
+def __getattr__(name):
+    # Resolve the cipher lazily so importing a light submodule (such as the
+    # GUI's job runner) does not pull in NumPy
+    if name in __all__:
+        from . import cipher
+        return getattr(cipher, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
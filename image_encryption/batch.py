@@ -0,0 +1,174 @@
+"""Encrypt or decrypt whole directory trees on a process pool.
+
+Each worker decodes, ciphers and encodes one file at a time, so with several
+workers the decode, cipher and encode stages of different files overlap.
+Output is written as PNG (or, with ``output_format='pxc'``, as the GUI's
+``.pxc`` container) because the ciphertext must survive the round trip bit
+for bit, and it is written to a temporary file that is renamed into place,
+so an interrupted run never leaves a truncated result. ``.pxc`` files saved
+by the GUI are read too; a container's own scheme is used to decrypt it.
+Only NumPy and OpenCV are imported here, never tkinter or matplotlib.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from . import cipher, container
+from .loader import channel_order_of
+from .schemes import DEFAULT_SCHEME, SCHEMES
+
+# Same extensions the GUI's upload dialog offers, plus its containers
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.gif', '.webp',
+                    container.EXTENSION)
+
+# Formats results can be written in
+OUTPUT_FORMATS = ('png', 'pxc')
+
+
+class BatchResult:
+    """Totals for one batch run"""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.failures = []
+        self.elapsed = 0.0
+
+    @property
+    def files_per_second(self):
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def megabytes_per_second(self):
+        return self.bytes / self.elapsed / 1e6 if self.elapsed else 0.0
+
+    def summary(self):
+        return (f"{self.files} file(s), {self.bytes / 1e6:.1f} MB in {self.elapsed:.2f}s "
+                f"({self.files_per_second:.1f} files/s, {self.megabytes_per_second:.1f} MB/s)"
+                + (f", {len(self.failures)} failed" if self.failures else ""))
+
+
+def find_images(input_path):
+    """Yield image files under input_path (or input_path itself if it is a file)"""
+    if os.path.isfile(input_path):
+        yield input_path
+        return
+    for dirpath, dirnames, filenames in os.walk(input_path):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+def output_path_for(path, input_path, output_dir, output_format='png'):
+    """Mirror path's location under input_path into output_dir as a PNG or container"""
+    if os.path.isfile(input_path):
+        relative = os.path.basename(path)
+    else:
+        relative = os.path.relpath(path, input_path)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + '.' + output_format)
+
+
+def _read_container(mode, key, src_path):
+    """Return (pixels, channel_order, scheme) of a whole-image .pxc file to run mode on"""
+    header, image = container.load(src_path)
+    if header.has_regions:
+        raise ValueError(f"{src_path} has encrypted regions; use the roi command")
+    if mode == 'encrypt':
+        if header.scheme != container.SCHEME_PLAIN:
+            raise ValueError(f"{src_path} is already encrypted ({header.scheme})")
+        return image, header.channel_order, None
+    if header.scheme not in SCHEMES:
+        raise ValueError(f"{src_path} is not encrypted with a scrambling scheme "
+                         f"({header.scheme})")
+    if container.check_key(header, key) is False:
+        raise ValueError("Wrong key (key check value does not match)")
+    return image, header.channel_order, header.scheme
+
+
+def process_file(mode, key, src_path, dst_path, scheme=DEFAULT_SCHEME):
+    """Decode, encrypt/decrypt and encode one file; return pixel bytes processed
+
+    src_path and dst_path may be images or ``.pxc`` containers. A container
+    being decrypted is decrypted with the scheme it records.
+    """
+    if src_path.lower().endswith(container.EXTENSION):
+        image, channel_order, stored_scheme = _read_container(mode, key, src_path)
+        scheme = stored_scheme or scheme
+    else:
+        # Decoded as stored (alpha and 16-bit samples included); byte XOR and
+        # whole-pixel scrambling do not care about channel order or bit depth
+        image = cv2.imread(src_path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise ValueError(f"Could not load image: {src_path}")
+        channel_order = channel_order_of(image)
+
+    operation = cipher.encrypt if mode == 'encrypt' else cipher.decrypt
+    result = operation(image, key, scheme=scheme)
+
+    write_atomic(dst_path, result,
+                 scheme if mode == 'encrypt' else container.SCHEME_PLAIN, channel_order)
+    return image.nbytes
+
+
+def write_atomic(dst_path, image, scheme=container.SCHEME_PLAIN, channel_order=None):
+    """Encode image to dst_path so readers never see a partly written file
+
+    A ``.pxc`` path is written as a container recording scheme and
+    channel_order; anything else is encoded by OpenCV.
+    """
+    directory, name = os.path.split(dst_path)
+    os.makedirs(directory or '.', exist_ok=True)
+    # Hidden temporary in the same directory (so the rename stays on one file
+    # system), keeping the extension cv2 picks the encoder by
+    temporary = os.path.join(directory, f".{name}.{os.getpid()}.tmp{os.path.splitext(name)[1]}")
+    try:
+        if dst_path.lower().endswith(container.EXTENSION):
+            container.save(temporary, image, scheme, channel_order=channel_order)
+        elif not cv2.imwrite(temporary, image):
+            raise ValueError(f"Could not write image: {dst_path}")
+        os.replace(temporary, dst_path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def run_batch(mode, key, input_path, output_dir, workers=None, progress=None,
+              scheme=DEFAULT_SCHEME, output_format='png'):
+    """Process every image under input_path into output_dir
+
+    output_format is 'png' or 'pxc'. progress, if given, is called as
+    progress(done, total, path) after each file. Returns a BatchResult.
+    """
+    if mode not in ('encrypt', 'decrypt'):
+        raise ValueError(f"Unknown mode: {mode}")
+    if scheme not in SCHEMES:
+        raise ValueError(f"Unknown scrambling scheme: {scheme}")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    key = cipher.validate_key(key)
+
+    jobs = [(path, output_path_for(path, input_path, output_dir, output_format))
+            for path in find_images(input_path)]
+    result = BatchResult()
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_file, mode, key, src, dst, scheme): src
+                   for src, dst in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                result.bytes += future.result()
+                result.files += 1
+            except Exception as e:
+                result.failures.append((path, str(e)))
+            if progress is not None:
+                progress(done, len(jobs), path)
+
+    result.elapsed = time.perf_counter() - start
+    return result
@@ -0,0 +1,327 @@
+"""Headless benchmark harness for the cipher, histogram and display hot paths.
+
+Every stage runs on synthetic images of several sizes and channel counts.
+For each combination the harness records latency percentiles, throughput in
+MB/s of image data, the tracemalloc peak of one extra (untimed) run, and
+the process's peak RSS so far. Results are saved as JSON and can be
+compared against a stored baseline with a regression threshold.
+
+Stages are registered with the ``@stage`` decorator. A stage function takes
+the image and returns a zero-argument callable that performs one timed
+iteration; setup work done before returning is not timed.
+"""
+
+import json
+import math
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+from . import cipher, keystream
+from .histogram import channel_histograms
+from .permutation import SCHEME_FEISTEL, FeistelPermutation, default_cache, scramble_indices
+from .preview import PreviewPyramid
+
+# Default sizes in megapixels and channel counts
+DEFAULT_MEGAPIXELS = (1, 24, 100)
+DEFAULT_CHANNELS = (1, 3, 4)
+
+# Sizes and thread counts of the cipher scaling benchmark
+SCALING_MEGAPIXELS = (24, 100)
+SCALING_WORKERS = (1, 2, 4, 8)
+
+# Preview size used by the display stages (a typical canvas)
+DISPLAY_SIZE = (1280, 720)
+
+BENCH_KEY = 173
+
+STAGES = {}
+
+
+def stage(name):
+    """Register a benchmark stage under name"""
+    def register(function):
+        STAGES[name] = function
+        return function
+    return register
+
+
+@stage('permutation')
+def _bench_permutation(img):
+    total_pixels = img.shape[0] * img.shape[1]
+    return lambda: scramble_indices(BENCH_KEY, total_pixels)
+
+
+@stage('permutation_feistel')
+def _bench_permutation_feistel(img):
+    permutation = FeistelPermutation(BENCH_KEY, img.shape[0] * img.shape[1])
+    return lambda: permutation[:]
+
+
+@stage('encrypt')
+def _bench_encrypt(img):
+    out = np.empty_like(img)
+    # Warm the permutation cache so only the cipher itself is timed
+    cipher.encrypt(img, BENCH_KEY, out=out)
+    return lambda: cipher.encrypt(img, BENCH_KEY, out=out)
+
+
+@stage('decrypt')
+def _bench_decrypt(img):
+    out = np.empty_like(img)
+    cipher.decrypt(img, BENCH_KEY, out=out)
+    return lambda: cipher.decrypt(img, BENCH_KEY, out=out)
+
+
+@stage('encrypt_feistel')
+def _bench_encrypt_feistel(img):
+    out = np.empty_like(img)
+    return lambda: cipher.encrypt(img, BENCH_KEY, out=out, scheme=SCHEME_FEISTEL)
+
+
+@stage('keystream_generate')
+def _bench_keystream_generate(img):
+    stream_key = keystream.derive_key('bench', salt=bytes(keystream.SALT_BYTES))
+    generator = np.random.Philox(key=stream_key.words)
+    words = img.nbytes // 8
+
+    def run():
+        # Same chunking as xor_keystream(), without the XOR
+        for start in range(0, words, keystream.CHUNK_BYTES // 8):
+            generator.random_raw(min(keystream.CHUNK_BYTES // 8, words - start))
+    return run
+
+
+@stage('keystream')
+def _bench_keystream(img):
+    stream_key = keystream.derive_key('bench', salt=bytes(keystream.SALT_BYTES))
+    out = np.empty_like(img)
+    return lambda: keystream.encrypt(img, stream_key, out=out)
+
+
+@stage('keystream_inplace')
+def _bench_keystream_inplace(img):
+    stream_key = keystream.derive_key('bench', salt=bytes(keystream.SALT_BYTES))
+    buffer = img.copy()
+    return lambda: keystream.encrypt(buffer, stream_key, out=buffer)
+
+
+@stage('histogram')
+def _bench_histogram(img):
+    return lambda: channel_histograms(img)
+
+
+@stage('display_cold')
+def _bench_display_cold(img):
+    # Pyramid built from scratch: the first time an image is shown
+    return lambda: PreviewPyramid(img).fit(*DISPLAY_SIZE)
+
+
+@stage('display_warm')
+def _bench_display_warm(img):
+    pyramid = PreviewPyramid(img)
+    pyramid.fit(*DISPLAY_SIZE)
+    # Slightly different size so the final resize is not a no-op
+    return lambda: pyramid.fit(DISPLAY_SIZE[0] - 17, DISPLAY_SIZE[1] - 11)
+
+
+def synthetic_image(megapixels, channels, seed=0):
+    """Return a random 4:3 uint8 image of about megapixels million pixels"""
+    width = int(math.sqrt(megapixels * 1e6 * 4 / 3))
+    height = max(1, int(megapixels * 1e6 / width))
+    shape = (height, width) if channels == 1 else (height, width, channels)
+    return np.random.default_rng(seed).integers(0, 256, size=shape, dtype=np.uint8)
+
+
+def max_rss_mb():
+    """Return the peak resident set size of this process in MB, if available"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 1e6 if platform.system() == 'Darwin' else peak / 1e3
+
+
+def measure(name, img, repeat=5):
+    """Run one stage on img and return its result record"""
+    run = STAGES[name](img)
+    run()  # warm-up
+
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+
+    # Separate untimed run: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies_ms = np.array(latencies) * 1000
+    median_s = float(np.median(latencies))
+    return {
+        'stage': name,
+        'shape': list(img.shape),
+        'megapixels': round(img.shape[0] * img.shape[1] / 1e6, 2),
+        'channels': 1 if img.ndim == 2 else img.shape[2],
+        'bytes': img.nbytes,
+        'repeat': repeat,
+        'latency_ms': {
+            'min': float(latencies_ms.min()),
+            'mean': float(latencies_ms.mean()),
+            'p50': float(np.percentile(latencies_ms, 50)),
+            'p90': float(np.percentile(latencies_ms, 90)),
+            'p99': float(np.percentile(latencies_ms, 99)),
+        },
+        'mb_per_s': img.nbytes / median_s / 1e6 if median_s else None,
+        'tracemalloc_peak_mb': peak / 1e6,
+        'max_rss_mb': max_rss_mb(),
+    }
+
+
+def run_benchmarks(stages=None, megapixels=DEFAULT_MEGAPIXELS, channels=DEFAULT_CHANNELS,
+                   repeat=5, progress=None):
+    """Benchmark every stage on every (size, channels) combination
+
+    Returns a JSON-serialisable dict with a 'meta' and a 'results' section.
+    progress, if given, is called with each result record as it is produced.
+    """
+    stages = list(stages or STAGES)
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+
+    results = []
+    for size in megapixels:
+        for count in channels:
+            img = synthetic_image(size, count)
+            for name in stages:
+                record = measure(name, img, repeat)
+                results.append(record)
+                if progress is not None:
+                    progress(record)
+            del img
+            default_cache.clear()
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+        },
+        'results': results,
+    }
+
+
+def _scaling_operations(img, out):
+    stream_key = keystream.derive_key('bench', salt=bytes(keystream.SALT_BYTES))
+    return {
+        'encrypt': lambda workers: cipher.encrypt(img, BENCH_KEY, out=out, workers=workers),
+        'decrypt': lambda workers: cipher.decrypt(img, BENCH_KEY, out=out, workers=workers),
+        'encrypt_feistel': lambda workers: cipher.encrypt(img, BENCH_KEY, out=out,
+                                                          scheme=SCHEME_FEISTEL, workers=workers),
+        'keystream': lambda workers: keystream.encrypt(img, stream_key, out=out, workers=workers),
+    }
+
+
+def run_scaling(megapixels=SCALING_MEGAPIXELS, channels=3, workers=SCALING_WORKERS,
+                repeat=3, progress=None):
+    """Time the cipher on one image with each thread count
+
+    Returns a list of records with the median latency, MB/s and speed-up
+    over the first thread count. Every output is checked against the
+    first thread count's, so a scaling run also proves the results are
+    identical. progress, if given, is called with each record.
+    """
+    records = []
+    for size in megapixels:
+        img = synthetic_image(size, channels)
+        out = np.empty_like(img)
+        for name, operation in _scaling_operations(img, out).items():
+            reference = baseline_ms = None
+            for count in workers:
+                operation(count)  # warm-up (and permutation cache)
+                latencies = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    operation(count)
+                    latencies.append(time.perf_counter() - start)
+                if reference is None:
+                    reference = out.copy()
+                elif not np.array_equal(out, reference):
+                    raise AssertionError(f"{name} with {count} workers differs from "
+                                         f"{workers[0]} worker(s)")
+                median_ms = float(np.median(latencies)) * 1000
+                baseline_ms = baseline_ms or median_ms
+                record = {
+                    'stage': name,
+                    'megapixels': round(img.shape[0] * img.shape[1] / 1e6, 2),
+                    'channels': channels,
+                    'workers': count,
+                    'p50_ms': median_ms,
+                    'mb_per_s': img.nbytes / median_ms / 1e3,
+                    'speedup': baseline_ms / median_ms,
+                }
+                records.append(record)
+                if progress is not None:
+                    progress(record)
+        del img, out
+        default_cache.clear()
+    return records
+
+
+def format_scaling(record):
+    return (f"{record['stage']:<20} {record['megapixels']:>7.2f} MP x{record['channels']}  "
+            f"{record['workers']:>3} thread(s)  p50 {record['p50_ms']:9.2f} ms  "
+            f"{record['mb_per_s']:9.1f} MB/s  x{record['speedup']:.2f}")
+
+
+def _result_key(record):
+    return (record['stage'], record['megapixels'], record['channels'])
+
+
+def compare(current, baseline, threshold=0.10):
+    """Return regressions of current versus baseline
+
+    A regression is a matching (stage, size, channels) record whose median
+    latency grew by more than threshold (a fraction, 0.10 = 10%). Each is
+    returned as (stage, megapixels, channels, baseline_ms, current_ms).
+    """
+    previous = {_result_key(record): record for record in baseline['results']}
+    regressions = []
+    for record in current['results']:
+        old = previous.get(_result_key(record))
+        if old is None:
+            continue
+        old_ms, new_ms = old['latency_ms']['p50'], record['latency_ms']['p50']
+        if new_ms > old_ms * (1 + threshold):
+            regressions.append(_result_key(record) + (old_ms, new_ms))
+    return regressions
+
+
+def format_record(record):
+    latency = record['latency_ms']
+    return (f"{record['stage']:<20} {record['megapixels']:>7.2f} MP x{record['channels']}  "
+            f"p50 {latency['p50']:9.2f} ms  p90 {latency['p90']:9.2f} ms  "
+            f"{record['mb_per_s'] or 0:9.1f} MB/s  "
+            f"tracemalloc {record['tracemalloc_peak_mb']:8.1f} MB")
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
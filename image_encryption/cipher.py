@@ -0,0 +1,260 @@
+"""Headless XOR + pixel scrambling cipher.
+
+By default this is the same scheme the GUI has always used: every byte is
+XORed with the key and, for keys above zero, whole pixels are shuffled with
+the legacy ``np.random.seed(key)`` / ``np.random.shuffle`` permutation
+(cached, see :mod:`.permutation`, which also offers a stateless Feistel
+permutation as an alternative scheme). Decryption scatters pixels back through the same
+permutation instead of inverting it with a sort. The work is done
+on the raw bytes chunk by chunk so the gather/scatter and the XOR touch each
+chunk while it is still in cache, and results can be written straight into
+caller-provided buffers.
+
+Chunks are independent, so with ``workers`` above one they are dealt out to
+a shared thread pool. NumPy releases the GIL inside the gather, scatter and
+XOR kernels, and every chunk writes a disjoint part of the output (a
+permutation never sends two pixels to one place), so the result is
+byte-for-byte the same as the serial path.
+
+Channel order and bit depth do not matter to the cipher: a pixel is just
+its bytes, so BGR, RGBA, grayscale and 16-bit images all round-trip
+unchanged (for ``uint16`` both bytes of every sample are XORed with the key).
+
+as_image(), flat_pixels() and opaque_pixels() are the input check and the
+pixel views the kernels use; modules that move pixels the same way (key
+sweeps, progressive previews) use them too.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+from .instrument import span
+from .permutation import DEFAULT_SCHEME, get_indices
+
+# Pixels handled per gather/scatter + XOR step
+CHUNK_PIXELS = 1 << 20
+
+# Threads per image when callers do not choose (1 keeps the serial path)
+DEFAULT_WORKERS = 1
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def validate_key(key):
+    """Return key as an int, raising ValueError if it is outside 0-255"""
+    try:
+        key = int(key)
+    except (TypeError, ValueError):
+        raise ValueError("Key must be an integer between 0 and 255")
+    if not 0 <= key <= 255:
+        raise ValueError("Key must be between 0 and 255")
+    return key
+
+
+def as_image(arr):
+    """Return arr as a C-contiguous integer array of shape (H, W[, C])"""
+    img = np.asarray(arr)
+    if img.dtype.kind not in 'ui':
+        raise TypeError(f"Expected an integer image, got {img.dtype}")
+    if img.ndim < 2:
+        raise ValueError(f"Expected an image of shape (H, W[, C]), got {img.shape}")
+    return np.ascontiguousarray(img)
+
+
+def cpu_workers():
+    """Return a worker count that uses every available core"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _get_pool(workers):
+    """Return the shared thread pool, grown to at least workers threads
+
+    Growing replaces the pool without shutting the old one down: another
+    thread may still be submitting to it. Its idle threads exit once the
+    last caller holding it lets go.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool_workers < workers:
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cipher')
+            _pool_workers = workers
+        return _pool
+
+
+def run_chunks(kernel, total, workers=None, progress=None, chunk=CHUNK_PIXELS):
+    """Call kernel(start, stop) for every chunk of range(total)
+
+    With more than one worker, chunks are dealt out round-robin to that many
+    threads of the shared pool. progress(pixels_done, total_pixels) is
+    called after every chunk, from the worker threads but never
+    concurrently. An exception from a kernel or from progress stops the
+    remaining chunks and is re-raised once every thread has returned.
+    """
+    starts = range(0, total, chunk)
+    workers = max(1, min(DEFAULT_WORKERS if workers is None else workers, len(starts)))
+    if workers == 1:
+        for start in starts:
+            stop = min(start + chunk, total)
+            kernel(start, stop)
+            if progress is not None:
+                progress(stop, total)
+        return
+
+    lock = threading.Lock()
+    failed = threading.Event()
+    done = 0
+
+    def run(part):
+        nonlocal done
+        try:
+            for start in starts[part::workers]:
+                if failed.is_set():
+                    return
+                stop = min(start + chunk, total)
+                kernel(start, stop)
+                if progress is not None:
+                    with lock:
+                        done += stop - start
+                        progress(done, total)
+        except BaseException:
+            failed.set()
+            raise
+
+    pool = _get_pool(workers)
+    futures = [pool.submit(run, part) for part in range(workers)]
+    # Every thread must be finished with out before anything is returned or raised
+    wait(futures)
+    for future in futures:
+        future.result()
+
+
+def _prepare_out(img, out):
+    """Allocate or validate the destination buffer for img"""
+    if out is None:
+        return np.empty_like(img)
+
+    out = np.asarray(out)
+    if out.dtype != img.dtype or out.shape != img.shape:
+        raise ValueError(f"out must be a {img.dtype} array of shape {img.shape}, "
+                         f"got {out.dtype} {out.shape}")
+    if not out.flags.c_contiguous or not out.flags.writeable:
+        raise ValueError("out must be a writeable C-contiguous array")
+    if np.shares_memory(out, img):
+        raise ValueError("out must not overlap the input image")
+    return out
+
+
+def opaque_pixels(img):
+    """View img as a 1-D array with one opaque item per pixel"""
+    flat = flat_pixels(img)
+    return flat.view(np.dtype((np.void, flat.shape[1]))).reshape(-1)
+
+
+def flat_pixels(img):
+    """View img as a 2-D uint8 array of (pixels, bytes per pixel)"""
+    height, width = img.shape[:2]
+    return img.reshape(height * width, -1).view(np.uint8)
+
+
+def _bytes(img):
+    """View img as a 1-D uint8 array of its raw bytes"""
+    return img.reshape(-1).view(np.uint8)
+
+
+def scramble(img, key, indices, out, progress=None, workers=None):
+    """Write img XOR key, with pixels gathered through indices, into out
+
+    img and out are validated C-contiguous arrays of the same shape and
+    dtype, and indices is a permutation of range(H*W), either an index array
+    or a FeistelPermutation sliced chunk by chunk. This is the encryption kernel.
+    progress, if given, is called as progress(pixels_done, total_pixels)
+    after every chunk; an exception raised from it aborts the operation.
+    workers is the number of threads (see run_chunks()).
+    """
+    src, dst, dst_flat = opaque_pixels(img), opaque_pixels(out), flat_pixels(out)
+
+    def kernel(start, stop):
+        # Gather scrambled pixels, then XOR them while they are still hot
+        with span('gather'):
+            np.take(src, indices[start:stop], out=dst[start:stop])
+        chunk = dst_flat[start:stop]
+        with span('xor'):
+            np.bitwise_xor(chunk, np.uint8(key), out=chunk)
+
+    run_chunks(kernel, len(indices), workers, progress)
+    return out
+
+
+def unscramble(img, key, indices, out, progress=None, workers=None):
+    """Inverse of scramble(): XOR img with key and scatter pixels through indices"""
+    total_pixels = len(indices)
+    src_flat, dst = flat_pixels(img), opaque_pixels(out)
+    buffer_shape = (min(CHUNK_PIXELS, total_pixels), src_flat.shape[1])
+    # One chunk buffer per thread, reused for all of its chunks
+    local = threading.local()
+
+    def kernel(start, stop):
+        buffer = getattr(local, 'buffer', None)
+        if buffer is None:
+            buffer = local.buffer = np.empty(buffer_shape, dtype=np.uint8)
+        count = stop - start
+        # Undo the XOR on a small buffer, then scatter pixels home
+        with span('xor'):
+            np.bitwise_xor(src_flat[start:stop], np.uint8(key), out=buffer[:count])
+        with span('scatter'):
+            dst[indices[start:stop]] = opaque_pixels(buffer[:count].reshape(count, 1, -1))
+
+    run_chunks(kernel, total_pixels, workers, progress)
+    return out
+
+
+def encrypt(arr, key, out=None, progress=None, scheme=DEFAULT_SCHEME, workers=None):
+    """Encrypt an integer image of shape (H, W[, C]) and return the result
+
+    If out is given the ciphertext is written into it and out is returned.
+    progress and workers are forwarded to scramble(). scheme selects the
+    pixel permutation (see :mod:`.permutation`).
+    """
+    img = as_image(arr)
+    key = validate_key(key)
+    out = _prepare_out(img, out)
+
+    if key == 0 or img.size == 0:
+        np.bitwise_xor(_bytes(img), np.uint8(key), out=_bytes(out))
+        return out
+
+    total_pixels = img.shape[0] * img.shape[1]
+    with span('permutation', scheme=scheme, pixels=total_pixels):
+        indices = get_indices(key, total_pixels, scheme)
+    with span('encrypt', shape=list(img.shape)):
+        return scramble(img, key, indices, out, progress, workers)
+
+
+def decrypt(arr, key, out=None, progress=None, scheme=DEFAULT_SCHEME, workers=None):
+    """Decrypt an image produced by encrypt() with the same key
+
+    If out is given the plaintext is written into it and out is returned.
+    progress and workers are forwarded to unscramble(). scheme must match
+    the one used for encryption.
+    """
+    img = as_image(arr)
+    key = validate_key(key)
+    out = _prepare_out(img, out)
+
+    if key == 0 or img.size == 0:
+        np.bitwise_xor(_bytes(img), np.uint8(key), out=_bytes(out))
+        return out
+
+    total_pixels = img.shape[0] * img.shape[1]
+    with span('permutation', scheme=scheme, pixels=total_pixels):
+        indices = get_indices(key, total_pixels, scheme)
+    with span('decrypt', shape=list(img.shape)):
+        return unscramble(img, key, indices, out, progress, workers)
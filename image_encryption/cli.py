@@ -0,0 +1,420 @@
+"""Command-line interface: ``python -m image_encryption <command> ...``"""
+
+import argparse
+import os
+import sys
+
+from . import batch, instrument, tiled
+from .schemes import DEFAULT_SCHEME, SCHEMES
+
+
+def _add_cipher_command(subparsers, mode):
+    parser = subparsers.add_parser(mode, help=f"{mode} an image or a directory of images")
+    parser.add_argument('input', help="image file or directory to walk")
+    parser.add_argument('output', help="directory to write results into")
+    parser.add_argument('--key', type=int, required=True, help="cipher key (0-255)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument('--scheme', choices=SCHEMES, default=DEFAULT_SCHEME,
+                        help="pixel scrambling scheme (default: %(default)s; .pxc inputs "
+                             "are decrypted with their own)")
+    parser.add_argument('--format', choices=batch.OUTPUT_FORMATS, default='png',
+                        dest='output_format',
+                        help="write PNGs or .pxc containers the GUI can load "
+                             "(default: %(default)s)")
+    parser.add_argument('--quiet', action='store_true', help="only print the summary")
+    parser.set_defaults(handler=_run_cipher_command, mode=mode)
+
+
+def _run_cipher_command(args):
+    def progress(done, total, path):
+        if not args.quiet:
+            print(f"[{done}/{total}] {path}", file=sys.stderr)
+
+    result = batch.run_batch(args.mode, args.key, args.input, args.output,
+                             workers=args.workers, progress=progress, scheme=args.scheme,
+                             output_format=args.output_format)
+    for path, error in result.failures:
+        print(f"FAILED {path}: {error}", file=sys.stderr)
+    print(result.summary())
+    return 1 if result.failures else 0
+
+
+def _add_watch_command(subparsers):
+    from .watch import DEFAULT_QUEUE_SIZE, POLL_INTERVAL, SETTLE_SECONDS, STATUS_INTERVAL
+
+    parser = subparsers.add_parser(
+        'watch', help="encrypt/decrypt images as they arrive in a directory")
+    parser.add_argument('mode', choices=['encrypt', 'decrypt'])
+    parser.add_argument('input', help="directory to watch (including subdirectories)")
+    parser.add_argument('output', help="directory to write PNG results into")
+    parser.add_argument('--key', type=int, required=True, help="cipher key (0-255)")
+    parser.add_argument('--scheme', choices=SCHEMES, default=DEFAULT_SCHEME,
+                        help="pixel scrambling scheme (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="ready files waiting for a worker before scanning pauses "
+                             "(default: %(default)s)")
+    parser.add_argument('--poll', type=float, default=POLL_INTERVAL,
+                        help="seconds between scans (default: %(default)s)")
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                        help="seconds a file must be unmodified before it is taken "
+                             "(default: %(default)s)")
+    parser.add_argument('--status-port', type=int,
+                        help="serve live counters as JSON on http://127.0.0.1:PORT/")
+    parser.add_argument('--status-interval', type=float, default=STATUS_INTERVAL,
+                        help="seconds between status log lines, 0 for none (default: %(default)s)")
+    parser.add_argument('--once', action='store_true',
+                        help="exit once every file present has been processed")
+    parser.set_defaults(handler=_run_watch_command)
+
+
+def _run_watch_command(args):
+    from . import watch
+
+    stats = watch.watch(args.mode, args.key, args.input, args.output, once=args.once,
+                        status_port=args.status_port, status_interval=args.status_interval,
+                        scheme=args.scheme, workers=args.workers, queue_size=args.queue_size,
+                        poll_interval=args.poll, settle=args.settle)
+    return 1 if stats.failures else 0
+
+
+def _add_tiled_command(subparsers):
+    parser = subparsers.add_parser(
+        'tiled', help="stream one huge image through the strip scheme with bounded memory")
+    parser.add_argument('mode', choices=['encrypt', 'decrypt'])
+    parser.add_argument('input', help=".npy, .pxc container, raw file (with --shape) or image")
+    parser.add_argument('output', help=".npy or .pxc container file to write")
+    parser.add_argument('--key', type=int, required=True, help="cipher key (0-255)")
+    parser.add_argument('--shape', type=int, nargs='+', metavar='DIM',
+                        help="H W [C] of a raw uint8 input file")
+    parser.add_argument('--tile-mb', type=float, default=tiled.DEFAULT_TILE_BYTES / 2**20,
+                        help="working memory budget in MiB (default: %(default)g)")
+    parser.set_defaults(handler=_run_tiled_command)
+
+
+def _run_tiled_command(args):
+    operation = tiled.encrypt_file if args.mode == 'encrypt' else tiled.decrypt_file
+    result = operation(args.input, args.output, args.key,
+                       tile_bytes=int(args.tile_mb * 2**20), shape=args.shape)
+    print(f"{args.mode}ed {result.shape} -> {args.output}")
+    return 0
+
+
+def _add_roi_command(subparsers):
+    parser = subparsers.add_parser(
+        'roi', help="encrypt/decrypt only rectangles or a mask of an image")
+    parser.add_argument('mode', choices=['encrypt', 'decrypt'])
+    parser.add_argument('input', help="image, .npy or .pxc (encrypt); .pxc with regions (decrypt)")
+    parser.add_argument('output', nargs='?',
+                        help=".pxc container (encrypt); .npy, .pxc or image (decrypt); "
+                             "omit to work in place on a .pxc input")
+    parser.add_argument('--key', type=int, required=True, help="cipher key (0-255)")
+    parser.add_argument('--rect', type=int, nargs=4, action='append', default=[],
+                        metavar=('X', 'Y', 'W', 'H'), help="region to encrypt (repeatable)")
+    parser.add_argument('--mask', help="image whose non-zero pixels are encrypted")
+    parser.add_argument('--key-check', action='store_true',
+                        help="store a key check value so wrong keys are rejected "
+                             "(it also reveals the key to a 256-key search)")
+    parser.add_argument('--scheme', choices=SCHEMES, default=DEFAULT_SCHEME,
+                        help="pixel scrambling scheme (default: %(default)s)")
+    parser.set_defaults(handler=_run_roi_command)
+
+
+def _run_roi_command(args):
+    from . import roi
+
+    target = args.output or args.input
+    if args.mode == 'decrypt':
+        roi.decrypt_file(args.input, args.output, args.key)
+        print(f"decrypted regions of {args.input} -> {target}")
+        return 0
+
+    mask = None
+    if args.mask:
+        import cv2
+        mask = cv2.imread(args.mask, cv2.IMREAD_GRAYSCALE)
+        if mask is None:
+            raise ValueError(f"Could not load mask: {args.mask}")
+        mask = mask > 0
+    if not args.rect and mask is None:
+        raise ValueError("Give at least one --rect or a --mask")
+    header = roi.encrypt_file(args.input, args.output, args.key, args.rect, mask,
+                              scheme=args.scheme, key_check=args.key_check)
+    regions = len(header.rectangles) + (header.mask is not None)
+    print(f"encrypted {regions} region(s) of {args.input} -> {target}")
+    return 0
+
+
+def _add_video_command(subparsers):
+    parser = subparsers.add_parser(
+        'video', help="encrypt/decrypt a video or multi-frame image frame by frame")
+    parser.add_argument('mode', choices=['encrypt', 'decrypt'])
+    parser.add_argument('input', help="video file, animated GIF or multi-page TIFF")
+    parser.add_argument('output', help="output video (lossless codec) or multi-page TIFF")
+    parser.add_argument('--key', type=int, required=True, help="cipher key (0-255)")
+    parser.add_argument('--scheme', choices=SCHEMES, default=DEFAULT_SCHEME,
+                        help="pixel scrambling scheme (default: %(default)s)")
+    parser.add_argument('--fourcc', default='FFV1',
+                        help="lossless output codec for videos (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=2, help="cipher threads (default: 2)")
+    parser.add_argument('--queue-size', type=int, default=8,
+                        help="frames in flight between stages (default: 8)")
+    parser.set_defaults(handler=_run_video_command)
+
+
+def _run_video_command(args):
+    from . import video
+
+    options = {'scheme': args.scheme, 'workers': args.workers, 'queue_size': args.queue_size,
+               'fourcc': args.fourcc}
+    result = video.process(args.mode, args.key, args.input, args.output, **options)
+    print(result.summary())
+    return 0
+
+
+def _add_keystream_command(subparsers):
+    parser = subparsers.add_parser(
+        'keystream', help="encrypt/decrypt with a passphrase-derived per-byte keystream")
+    parser.add_argument('mode', choices=['encrypt', 'decrypt'])
+    parser.add_argument('input', help="image, .npy, .pxc or raw file (encrypt); .pxc (decrypt)")
+    parser.add_argument('output', help=".pxc container (encrypt); .npy, .pxc or image (decrypt)")
+    parser.add_argument('--passphrase-file', help="read the passphrase from this file "
+                        "(default: $IMAGE_ENCRYPTION_PASSPHRASE, else prompt)")
+    parser.add_argument('--shape', type=int, nargs='+', metavar='DIM',
+                        help="H W [C] of a raw uint8 input file")
+    parser.set_defaults(handler=_run_keystream_command)
+
+
+def _read_passphrase(args):
+    if args.passphrase_file:
+        with open(args.passphrase_file, encoding='utf-8') as f:
+            return f.read().rstrip('\r\n')
+    if os.environ.get('IMAGE_ENCRYPTION_PASSPHRASE'):
+        return os.environ['IMAGE_ENCRYPTION_PASSPHRASE']
+    import getpass
+    return getpass.getpass("Passphrase: ")
+
+
+def _run_keystream_command(args):
+    from . import keystream
+
+    passphrase = _read_passphrase(args)
+    if args.mode == 'encrypt':
+        keystream.encrypt_file(args.input, args.output, passphrase, shape=args.shape)
+    else:
+        keystream.decrypt_file(args.input, args.output, passphrase)
+    print(f"{args.mode}ed {args.input} -> {args.output}")
+    return 0
+
+
+def _add_metrics_command(subparsers):
+    parser = subparsers.add_parser(
+        'metrics', help="report entropy, adjacent-pixel correlation and NPCR/UACI")
+    parser.add_argument('input', help="image file or directory to walk")
+    parser.add_argument('--compare', metavar='OTHER',
+                        help="second image of the same shape for NPCR/UACI")
+    parser.add_argument('--differential-key', type=int, metavar='KEY',
+                        help="measure NPCR/UACI of the cipher under KEY for a one-pixel change")
+    parser.add_argument('--scheme', choices=SCHEMES, default=DEFAULT_SCHEME,
+                        help="scheme for --differential-key (default: %(default)s)")
+    parser.add_argument('--sample', type=int, metavar='N',
+                        help="estimate correlation from N random pairs per direction")
+    parser.add_argument('--seed', type=int, default=0, help="seed for sampling (default: 0)")
+    parser.add_argument('--json', action='store_true', help="print one JSON object per file")
+    parser.set_defaults(handler=_run_metrics_command)
+
+
+def _run_metrics_command(args):
+    import json
+
+    from . import cipher, container, loader, metrics
+
+    other = tiled.open_source(args.compare) if args.compare else None
+    for path in batch.find_images(args.input) if os.path.isdir(args.input) else [args.input]:
+        img = tiled.open_source(path)
+        result = metrics.analyze(img, other, sample=args.sample, seed=args.seed)
+        if args.differential_key is not None:
+            npcr, uaci = metrics.differential(
+                img, lambda x: cipher.encrypt(x, args.differential_key, scheme=args.scheme),
+                seed=args.seed)
+            result['differential'] = {'key': args.differential_key, 'scheme': args.scheme,
+                                      'npcr': npcr.tolist(), 'uaci': uaci.tolist()}
+        if args.json:
+            print(json.dumps(dict(result, path=path)))
+            continue
+        order = '' if path.lower().endswith(('.npy', container.EXTENSION)) else \
+            loader.channel_order_of(img)
+        print(path)
+        print(metrics.format_metrics(result, list(order) if order.startswith('BGR') else None))
+    return 0
+
+
+def _add_sweep_command(subparsers):
+    parser = subparsers.add_parser(
+        'sweep', help="try all 256 keys on a ciphertext and rank them by plaintext likelihood")
+    parser.add_argument('input', help="encrypted image, .npy or .pxc container")
+    parser.add_argument('--scheme', choices=SCHEMES, default=DEFAULT_SCHEME,
+                        help="pixel scrambling scheme (default: %(default)s)")
+    parser.add_argument('--sample', type=int, default=None, metavar='N',
+                        help="plaintext positions decrypted per key (default: 20000)")
+    parser.add_argument('--stop-score', type=float, default=None,
+                        help="stop once a key scores at least this (default: 0.5)")
+    parser.add_argument('--all', action='store_true', help="try every key, never stop early")
+    parser.add_argument('--top', type=int, default=5, help="candidates to list (default: 5)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="threads trying keys (default: every available core)")
+    parser.add_argument('--seed', type=int, default=0, help="seed for sampling (default: 0)")
+    parser.set_defaults(handler=_run_sweep_command)
+
+
+def _run_sweep_command(args):
+    from . import keysweep
+
+    img = tiled.open_source(args.input)
+    stop_score = None if args.all else \
+        keysweep.STOP_SCORE if args.stop_score is None else args.stop_score
+    result = keysweep.sweep(
+        img, scheme=args.scheme,
+        sample=args.sample or keysweep.DEFAULT_SAMPLE,
+        stop_score=stop_score,
+        workers=args.workers,
+        seed=args.seed)
+    for key, score in result.ranking(args.top):
+        print(f"key {key:>3}  score {score:+.4f}")
+    print(result.summary())
+    return 0
+
+
+def _add_bench_command(subparsers):
+    parser = subparsers.add_parser('bench', help="benchmark the hot paths on synthetic images")
+    parser.add_argument('--stages', nargs='+', help="stages to run (default: all)")
+    parser.add_argument('--megapixels', type=float, nargs='+', default=None,
+                        help="image sizes in megapixels (default: 1 24 100)")
+    parser.add_argument('--channels', type=int, nargs='+', default=None,
+                        help="channel counts (default: 1 3 4)")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per stage")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help="allowed median slowdown versus baseline in percent (default: 10)")
+    parser.add_argument('--workers', type=int, nargs='+', metavar='N',
+                        help="instead of the stages, time the cipher with each thread count "
+                             "(sizes default to 24 100 MP, 3 channels)")
+    parser.set_defaults(handler=_run_bench_command)
+
+
+def _run_bench_command(args):
+    from . import bench
+
+    if args.workers:
+        records = bench.run_scaling(
+            megapixels=args.megapixels or bench.SCALING_MEGAPIXELS,
+            channels=(args.channels or [3])[0],
+            workers=args.workers,
+            repeat=args.repeat,
+            progress=lambda record: print(bench.format_scaling(record)))
+        if args.output:
+            bench.save({'scaling': records}, args.output)
+        return 0
+
+    results = bench.run_benchmarks(
+        stages=args.stages,
+        megapixels=args.megapixels or bench.DEFAULT_MEGAPIXELS,
+        channels=args.channels or bench.DEFAULT_CHANNELS,
+        repeat=args.repeat,
+        progress=lambda record: print(bench.format_record(record)))
+    if args.output:
+        bench.save(results, args.output)
+
+    if args.baseline:
+        regressions = bench.compare(results, bench.load(args.baseline), args.threshold / 100)
+        for name, megapixels, channels, old_ms, new_ms in regressions:
+            print(f"REGRESSION {name} {megapixels} MP x{channels}: "
+                  f"{old_ms:.2f} ms -> {new_ms:.2f} ms")
+        if regressions:
+            return 1
+    return 0
+
+
+def _add_serve_command(subparsers):
+    parser = subparsers.add_parser(
+        'serve', help="run the local encryption daemon on a Unix domain socket")
+    parser.add_argument('--socket', help="socket path (default: in $XDG_RUNTIME_DIR or a "
+                        "private per-user temp dir)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="concurrent cipher jobs (default: CPU count)")
+    parser.set_defaults(handler=_run_serve_command)
+
+
+def _run_serve_command(args):
+    from . import daemon
+
+    daemon.serve(args.socket, args.workers)
+    return 0
+
+
+def _add_serve_bench_command(subparsers):
+    parser = subparsers.add_parser(
+        'serve-bench', help="compare daemon latency/throughput with the in-process cipher")
+    parser.add_argument('--megapixels', type=float, default=24, help="image size (default: 24)")
+    parser.add_argument('--channels', type=int, default=3, help="channel count (default: 3)")
+    parser.add_argument('--repeat', type=int, default=10, help="timed requests per measurement")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 2, 4],
+                        help="concurrent client counts (default: 1 2 4)")
+    parser.add_argument('--socket', help="use an already running daemon instead of starting one")
+    parser.set_defaults(handler=_run_serve_bench_command)
+
+
+def _run_serve_bench_command(args):
+    from . import bench, daemon
+
+    img = bench.synthetic_image(args.megapixels, args.channels)
+    rows = daemon.benchmark(img, repeat=args.repeat, clients=args.clients,
+                            socket_path=args.socket)
+    for label, p50_ms, mb_per_s in rows:
+        latency = f"p50 {p50_ms:9.2f} ms" if p50_ms is not None else " " * 16
+        print(f"{label:<20} {latency}  {mb_per_s:9.1f} MB/s")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m image_encryption',
+        description="Headless XOR + pixel scrambling image encryption")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="record per-stage timings and write them to FILE "
+                             "(*.trace.json: Chrome trace, else JSON report); "
+                             "batch worker processes are not traced")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="with --trace, also record tracemalloc peaks (slower)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    _add_cipher_command(subparsers, 'encrypt')
+    _add_cipher_command(subparsers, 'decrypt')
+    _add_watch_command(subparsers)
+    _add_tiled_command(subparsers)
+    _add_roi_command(subparsers)
+    _add_video_command(subparsers)
+    _add_keystream_command(subparsers)
+    _add_metrics_command(subparsers)
+    _add_sweep_command(subparsers)
+    _add_bench_command(subparsers)
+    _add_serve_command(subparsers)
+    _add_serve_bench_command(subparsers)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace:
+        instrument.enable(memory=args.trace_memory)
+    try:
+        return args.handler(args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if args.trace:
+            instrument.recorder.export(args.trace)
+            print(instrument.format_summary(instrument.recorder.summary()), file=sys.stderr)
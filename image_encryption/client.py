@@ -0,0 +1,184 @@
+"""Thin client for the local encryption daemon (see :mod:`.daemon`).
+
+Pixel data never goes through the socket. The client places it in
+``multiprocessing.shared_memory`` blocks and sends only their names, shape,
+key and scheme, and the daemon writes its result straight into the output
+block. For zero-copy use, allocate() buffers once, fill ``buffer.array``
+and call run(). encrypt()/decrypt() are conveniences that copy in and out.
+
+Messages are length-prefixed JSON: a 4-byte big-endian size, then UTF-8.
+"""
+
+import json
+import os
+import socket
+import stat
+import struct
+import tempfile
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .schemes import DEFAULT_SCHEME
+
+_LENGTH = struct.Struct('>I')
+
+
+def _check_private_dir(path):
+    """Raise PermissionError unless path is a directory only this user can access"""
+    status = os.lstat(path)
+    if (not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid()
+            or status.st_mode & 0o077):
+        raise PermissionError(f"{path} must be a directory owned by and private to this user")
+
+
+def default_socket_path():
+    """Socket path in $XDG_RUNTIME_DIR, else in a private per-user temp directory
+
+    The directory is created (mode 0700) if missing and must belong to this
+    user and be closed to everyone else, so no other user can put a socket
+    where the client or daemon will look.
+    """
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    if not directory:
+        directory = os.path.join(tempfile.gettempdir(), f'image-encryption-{os.getuid()}')
+        try:
+            os.mkdir(directory, 0o700)
+        except FileExistsError:
+            pass
+    _check_private_dir(directory)
+    return os.path.join(directory, 'image-encryption.sock')
+
+
+def check_socket(path):
+    """Raise PermissionError if path exists but is not a socket owned by this user"""
+    try:
+        status = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(status.st_mode) or status.st_uid != os.getuid():
+        raise PermissionError(f"Refusing to use {path}: not a socket owned by this user")
+
+
+def send_message(sock, message):
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(_LENGTH.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    """Return the next message from sock, or None once the peer has closed it"""
+    header = _recv_exactly(sock, _LENGTH.size)
+    if header is None:
+        return None
+    data = _recv_exactly(sock, _LENGTH.unpack(header)[0])
+    if data is None:
+        return None
+    return json.loads(data.decode('utf-8'))
+
+
+class SharedBuffer:
+    """uint8 image array backed by a shared memory block this process owns"""
+
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        size = max(1, int(np.prod(self.shape)))
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.array = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        """Release and unlink the block"""
+        if self.shm is None:
+            return
+        # The array view must go before the mapping can be closed
+        self.array = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DaemonError(RuntimeError):
+    """The daemon rejected or failed a request"""
+
+
+class CipherClient:
+    """Connection to a running daemon; one request at a time per client"""
+
+    def __init__(self, socket_path=None, timeout=None):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise OSError("Unix domain sockets are not available on this platform")
+        socket_path = socket_path or default_socket_path()
+        # Never talk to a daemon another user planted
+        check_socket(socket_path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path)
+
+    def request(self, message):
+        send_message(self.sock, message)
+        response = recv_message(self.sock)
+        if response is None:
+            raise DaemonError("Daemon closed the connection")
+        if not response.get('ok'):
+            raise DaemonError(response.get('error', 'unknown error'))
+        return response
+
+    def ping(self):
+        return self.request({'op': 'ping'})
+
+    def allocate(self, shape):
+        """Return a SharedBuffer of shape the daemon can read from or write to"""
+        return SharedBuffer(shape)
+
+    def run(self, op, src, dst, key, scheme=DEFAULT_SCHEME):
+        """Encrypt/decrypt SharedBuffer src into SharedBuffer dst on the daemon"""
+        if src.shape != dst.shape:
+            raise ValueError(f"Buffer shapes differ: {src.shape} vs {dst.shape}")
+        return self.request({'op': op, 'key': key, 'scheme': scheme, 'shape': list(src.shape),
+                             'dtype': 'uint8', 'src': src.name, 'dst': dst.name})
+
+    def _copying(self, op, arr, key, scheme):
+        arr = np.asarray(arr)
+        if arr.dtype != np.uint8:
+            raise TypeError(f"The daemon only ciphers uint8 images, got {arr.dtype}")
+        with self.allocate(arr.shape) as src, self.allocate(arr.shape) as dst:
+            np.copyto(src.array, arr)
+            self.run(op, src, dst, key, scheme)
+            return dst.array.copy()
+
+    def encrypt(self, arr, key, scheme=DEFAULT_SCHEME):
+        """Encrypt arr on the daemon and return a new array"""
+        return self._copying('encrypt', arr, key, scheme)
+
+    def decrypt(self, arr, key, scheme=DEFAULT_SCHEME):
+        """Decrypt arr on the daemon and return a new array"""
+        return self._copying('decrypt', arr, key, scheme)
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
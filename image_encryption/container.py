@@ -0,0 +1,223 @@
+"""Compact, memory-mappable container for encrypted images.
+
+Layout (little endian), a fixed 64-byte header followed by raw pixel rows::
+
+    offset  size  field
+    0       6     magic b'PXCRYP'
+    6       2     format version (1)
+    8       16    scheme name, ASCII, NUL padded ('shuffle-v1', 'feistel-v1',
+                  'strip-v1', 'keystream-v1' or 'plain' for unencrypted data)
+    24      4     height
+    28      4     width
+    32      2     channels
+    34      1     dtype code (1 = uint8, 2 = little-endian uint16)
+    35      4     channel order, ASCII, NUL padded ('RGB', 'BGR', 'RGBA', 'GRAY', ...)
+    39      1     1 if a key check value follows, else 0
+    40      4     key check value
+    44      16    key derivation salt (keystream-v1), all zero if unused
+    60      4     flags (bit 0: a region table follows the pixel data)
+    64      ...   pixel data, C order, H x W x C
+
+Images encrypted only in regions (see :mod:`.roi`) end with a region table::
+
+    offset  size  field
+    0       6     magic b'PXROI\0'
+    6       2     1 if a mask follows the rectangles, else 0
+    8       4     rectangle count N
+    12      16*N  rectangles as x, y, width, height (uint32 each)
+    ...     ...   mask, one bit per pixel in row-major order (np.packbits)
+
+Because the pixel data starts at a fixed aligned offset, loading is a single
+``np.memmap`` with no decode step. The key check value (the first four bytes
+of a SHA-256 over the scheme and key) lets a reader reject a wrong key before
+decrypting. With only 256 possible keys it also makes brute force trivial,
+so leave it out when that matters.
+"""
+
+import hashlib
+import struct
+
+import numpy as np
+
+from .instrument import span
+
+MAGIC = b'PXCRYP'
+FORMAT_VERSION = 1
+HEADER_SIZE = 64
+EXTENSION = '.pxc'
+
+SCHEME_PLAIN = 'plain'
+
+FLAG_REGIONS = 1
+
+_HEADER = struct.Struct('<6sH16sIIHB4sB4s16sI')
+_REGIONS_MAGIC = b'PXROI\0'
+_REGIONS = struct.Struct('<6sHI')
+_RECTANGLE = struct.Struct('<IIII')
+_NO_SALT = bytes(16)
+_DTYPES = {1: np.dtype(np.uint8), 2: np.dtype('<u2')}
+_DTYPE_CODES = {dtype: code for code, dtype in _DTYPES.items()}
+
+
+class ContainerHeader:
+    """Decoded container header"""
+
+    def __init__(self, scheme, shape, dtype=np.uint8, channel_order='RGB', key_check=None,
+                 salt=None, rectangles=None, mask=None):
+        self.scheme = scheme
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.channel_order = channel_order
+        self.key_check = key_check
+        self.salt = salt
+        # Regions the scheme was applied to; both None for a whole-image cipher
+        self.rectangles = rectangles
+        self.mask = mask
+
+    @property
+    def channels(self):
+        return 1 if len(self.shape) == 2 else self.shape[2]
+
+    @property
+    def has_regions(self):
+        return self.rectangles is not None or self.mask is not None
+
+    @property
+    def pixel_bytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def pack(self):
+        height, width = self.shape[:2]
+        return _HEADER.pack(MAGIC, FORMAT_VERSION, self.scheme.encode('ascii'),
+                            height, width, self.channels, _DTYPE_CODES[self.dtype],
+                            self.channel_order.encode('ascii'),
+                            0 if self.key_check is None else 1,
+                            self.key_check or b'\0\0\0\0',
+                            self.salt or _NO_SALT,
+                            FLAG_REGIONS if self.has_regions else 0)
+
+    def pack_regions(self):
+        """Return the region table written after the pixel data (empty without regions)"""
+        if not self.has_regions:
+            return b''
+        rectangles = self.rectangles or []
+        parts = [_REGIONS.pack(_REGIONS_MAGIC, 0 if self.mask is None else 1, len(rectangles))]
+        parts += [_RECTANGLE.pack(*rectangle) for rectangle in rectangles]
+        if self.mask is not None:
+            parts.append(np.packbits(np.asarray(self.mask, dtype=bool), axis=None).tobytes())
+        return b''.join(parts)
+
+    def unpack_regions(self, data):
+        """Set rectangles and mask from a region table"""
+        magic, has_mask, count = _REGIONS.unpack_from(data)
+        if magic != _REGIONS_MAGIC:
+            raise ValueError("Corrupt container (bad region table)")
+        offset = _REGIONS.size
+        self.rectangles = [_RECTANGLE.unpack_from(data, offset + i * _RECTANGLE.size)
+                           for i in range(count)]
+        offset += count * _RECTANGLE.size
+        if has_mask:
+            height, width = self.shape[:2]
+            bits = np.frombuffer(data, dtype=np.uint8, offset=offset)
+            self.mask = np.unpackbits(bits, count=height * width).astype(bool).reshape(height, width)
+
+    @classmethod
+    def unpack(cls, data):
+        if len(data) < HEADER_SIZE or data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not an encrypted image container (bad magic)")
+        (_, version, scheme, height, width, channels, dtype_code, channel_order,
+         has_check, key_check, salt, flags) = _HEADER.unpack(data[:HEADER_SIZE])
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported container version {version}")
+        if dtype_code not in _DTYPES:
+            raise ValueError(f"Unsupported pixel dtype code {dtype_code}")
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        header = cls(scheme.rstrip(b'\0').decode('ascii'), shape, _DTYPES[dtype_code],
+                     channel_order.rstrip(b'\0').decode('ascii'),
+                     key_check if has_check else None,
+                     None if salt == _NO_SALT else salt)
+        if flags & FLAG_REGIONS:
+            # Filled in from the region table after the pixel data by read_header()
+            header.rectangles = []
+        return header
+
+
+def key_check_value(scheme, key):
+    """Return the 4-byte key check value stored for scheme and key"""
+    return hashlib.sha256(f'{scheme}:{int(key)}'.encode('ascii')).digest()[:4]
+
+
+def check_key(header, key):
+    """Return True/False if key matches the header's check value, None if it has none"""
+    if header.key_check is None:
+        return None
+    return key_check_value(header.scheme, key) == header.key_check
+
+
+def default_channel_order(img):
+    channels = 1 if img.ndim == 2 else img.shape[2]
+    return {1: 'GRAY', 3: 'RGB', 4: 'RGBA'}.get(channels, '')
+
+
+def save(path, img, scheme, key=None, channel_order=None, key_check=None, rectangles=None,
+         mask=None):
+    """Write img to path
+
+    A key check value is stored if key is given, or copied from key_check
+    (for example when re-saving a loaded container). rectangles and mask
+    record the regions an ROI cipher was applied to.
+    """
+    img = np.ascontiguousarray(img)
+    if img.dtype not in _DTYPE_CODES or img.ndim not in (2, 3):
+        raise ValueError(f"Cannot store an array of {img.dtype} {img.shape}")
+    if channel_order is None:
+        channel_order = default_channel_order(img)
+    if key is not None:
+        key_check = key_check_value(scheme, key)
+    header = ContainerHeader(scheme, img.shape, img.dtype, channel_order, key_check,
+                             rectangles=rectangles, mask=mask)
+
+    with span('container_save', bytes=img.nbytes), open(path, 'wb') as f:
+        f.write(header.pack())
+        img.tofile(f)
+        f.write(header.pack_regions())
+    return header
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        header = ContainerHeader.unpack(f.read(HEADER_SIZE))
+        if header.has_regions:
+            f.seek(HEADER_SIZE + header.pixel_bytes)
+            header.unpack_regions(f.read())
+    return header
+
+
+def update(path, header):
+    """Rewrite the header and region table of an existing container, leaving its pixels alone"""
+    with open(path, 'r+b') as f:
+        f.write(header.pack())
+        f.seek(HEADER_SIZE + header.pixel_bytes)
+        f.write(header.pack_regions())
+        f.truncate()
+
+
+def load(path, mode='r'):
+    """Return (header, pixels) with pixels memory-mapped from path
+
+    mode is passed to np.memmap ('r' read-only, 'r+' read-write, 'c'
+    copy-on-write).
+    """
+    header = read_header(path)
+    pixels = np.memmap(path, dtype=header.dtype, mode=mode, offset=HEADER_SIZE,
+                       shape=header.shape)
+    return header, pixels
+
+
+def create(path, header):
+    """Write header to path and return a writeable memmap for its pixel data"""
+    with open(path, 'wb') as f:
+        f.write(header.pack())
+        f.truncate(HEADER_SIZE + header.pixel_bytes)
+    return np.memmap(path, dtype=header.dtype, mode='r+', offset=HEADER_SIZE,
+                     shape=header.shape)
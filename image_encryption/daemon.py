@@ -0,0 +1,237 @@
+"""Long-running local encryption server on a Unix domain socket.
+
+Clients (see :mod:`.client`) pass pixel data through
+``multiprocessing.shared_memory`` and send only block names over the
+socket. Each connection gets its own thread, while the cipher work itself is
+bounded by a worker pool (NumPy releases the GIL in the gather/scatter and
+XOR kernels). The permutation cache stays warm between requests, so repeat
+jobs of the same size skip permutation generation.
+"""
+
+import os
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from . import cipher
+from .client import CipherClient, check_socket, default_socket_path, recv_message, \
+    send_message
+from .schemes import DEFAULT_SCHEME, SCHEMES
+
+
+def _attach(name):
+    """Open an existing block without letting this process's tracker own it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers the block; the client owns it, so
+        # stop our resource tracker from unlinking it when we exit. This
+        # assumes the client lives in another process, as the daemon intends
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (OSError, ValueError):
+                return
+            if request is None:
+                return
+            send_message(self.request, self.server.dispatch(request))
+
+
+class CipherServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix socket server running cipher jobs on a bounded pool"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path=None, workers=None):
+        self.socket_path = socket_path or default_socket_path()
+        self._remove_stale_socket()
+        self.pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count(),
+                                       thread_name_prefix='daemon-cipher')
+        self.requests = 0
+        self._count_lock = threading.Lock()
+        super().__init__(self.socket_path, _Handler)
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        # Only ever replace our own socket
+        check_socket(self.socket_path)
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)
+        else:
+            raise OSError(f"A daemon is already listening on {self.socket_path}")
+        finally:
+            probe.close()
+
+    def dispatch(self, request):
+        op = request.get('op')
+        try:
+            if op == 'ping':
+                return {'ok': True, 'pid': os.getpid(), 'requests': self.requests}
+            if op in ('encrypt', 'decrypt'):
+                elapsed = self.pool.submit(self._run_job, op, request).result()
+                with self._count_lock:
+                    self.requests += 1
+                return {'ok': True, 'elapsed': elapsed}
+            return {'ok': False, 'error': f"Unknown op: {op}"}
+        except Exception as e:
+            return {'ok': False, 'error': str(e)}
+
+    def _run_job(self, op, request):
+        scheme = request.get('scheme', DEFAULT_SCHEME)
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown scrambling scheme: {scheme}")
+        dtype = request.get('dtype', 'uint8')
+        if dtype != 'uint8':
+            raise ValueError(f"The daemon only ciphers uint8 images, got {dtype}")
+        shape = tuple(request['shape'])
+        size = int(np.prod(shape))
+
+        src_block, dst_block = _attach(request['src']), _attach(request['dst'])
+        try:
+            if src_block.size < size or dst_block.size < size:
+                raise ValueError("Shared memory block is smaller than the image")
+            src = np.ndarray(shape, dtype=np.uint8, buffer=src_block.buf)
+            dst = np.ndarray(shape, dtype=np.uint8, buffer=dst_block.buf)
+            operation = cipher.encrypt if op == 'encrypt' else cipher.decrypt
+            start = time.perf_counter()
+            operation(src, request['key'], out=dst, scheme=scheme)
+            elapsed = time.perf_counter() - start
+            # Views must be released before the mappings can be closed
+            del src, dst
+        finally:
+            src_block.close()
+            dst_block.close()
+        return elapsed
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def serve(socket_path=None, workers=None):
+    """Run the daemon until interrupted or terminated"""
+    def terminate(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, terminate)
+    with CipherServer(socket_path, workers) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def start_subprocess(socket_path, workers=None, timeout=10.0):
+    """Launch ``python -m image_encryption serve`` and wait until it answers"""
+    command = [sys.executable, '-m', 'image_encryption', 'serve', '--socket', socket_path]
+    if workers:
+        command += ['--workers', str(workers)]
+    process = subprocess.Popen(command)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with CipherClient(socket_path) as client:
+                client.ping()
+            return process
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise OSError("Daemon did not start") from None
+            time.sleep(0.05)
+
+
+def _latencies(run, repeat):
+    run()  # warm-up, also fills the permutation cache
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+
+def _concurrent_throughput(socket_path, img, key, clients, requests_per_client):
+    """Return MB/s with clients connections issuing zero-copy requests at once"""
+    def client_loop():
+        with CipherClient(socket_path) as client, client.allocate(img.shape) as src, \
+                client.allocate(img.shape) as dst:
+            np.copyto(src.array, img)
+            client.run('encrypt', src, dst, key)
+            barrier.wait()
+            for _ in range(requests_per_client):
+                client.run('encrypt', src, dst, key)
+
+    barrier = threading.Barrier(clients + 1)
+    threads = [threading.Thread(target=client_loop) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return clients * requests_per_client * img.nbytes / elapsed / 1e6
+
+
+def benchmark(img, key=173, repeat=10, clients=(1, 2, 4), socket_path=None, workers=None):
+    """Compare in-process encryption with a daemon in a separate process
+
+    Returns a list of (label, p50_ms, mb_per_s) rows: the in-process call,
+    daemon requests on preallocated shared buffers (zero-copy), daemon
+    requests that copy in and out, and aggregate throughput for each number
+    of concurrent clients.
+    """
+    own_socket = socket_path is None
+    if own_socket:
+        socket_path = os.path.join(tempfile.mkdtemp(prefix='image-encryption-'), 'bench.sock')
+    process = start_subprocess(socket_path, workers) if own_socket else None
+    rows = []
+
+    def add(label, latencies_ms):
+        p50 = float(np.percentile(latencies_ms, 50))
+        rows.append((label, p50, img.nbytes / p50 / 1e3 if p50 else 0.0))
+
+    try:
+        out = np.empty_like(img)
+        add('in-process', _latencies(lambda: cipher.encrypt(img, key, out=out), repeat))
+
+        with CipherClient(socket_path) as client, client.allocate(img.shape) as src, \
+                client.allocate(img.shape) as dst:
+            np.copyto(src.array, img)
+            add('daemon zero-copy', _latencies(lambda: client.run('encrypt', src, dst, key),
+                                               repeat))
+            add('daemon copying', _latencies(lambda: client.encrypt(img, key), repeat))
+            if not np.array_equal(dst.array, out):
+                raise RuntimeError("Daemon result differs from the in-process cipher")
+
+        for count in clients:
+            throughput = _concurrent_throughput(socket_path, img, key, count, repeat)
+            rows.append((f'daemon x{count} clients', None, throughput))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+            os.rmdir(os.path.dirname(socket_path))
+    return rows
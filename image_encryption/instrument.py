@@ -0,0 +1,216 @@
+"""Optional per-stage timing and memory instrumentation.
+
+Hot paths are wrapped in ``with span('name'):`` blocks. While recording is
+off, span() returns a shared no-op context manager, which costs one function
+call and one attribute check. While it is on, every span records:
+
+- wall time (``time.perf_counter``),
+- CPU time of the calling thread (``time.thread_time``),
+- and, in memory mode, the tracemalloc peak above the level at entry.
+
+tracemalloc slows down every allocation, so memory mode is separate.
+
+Recording starts when the ``IMAGE_ENCRYPTION_TRACE`` environment variable is
+set (``1`` for timing, ``memory`` for timing plus tracemalloc) or enable() is
+called. The records can be summarised per stage, or exported as JSON or as a
+Chrome trace that opens in ``chrome://tracing`` or https://ui.perfetto.dev.
+
+tracemalloc has a single process-wide peak. When spans overlap on several
+threads, each span's memory peak can include allocations made by the other
+threads.
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+ENV_VAR = 'IMAGE_ENCRYPTION_TRACE'
+
+# Spans kept before the oldest are dropped
+MAX_SPANS = 100000
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed stage; a context manager that records itself on exit"""
+
+    __slots__ = ('recorder', 'name', 'args', 'thread', 'start', 'wall', 'cpu', 'peak',
+                 '_cpu_start', '_memory_start', '_child_peak')
+
+    def __init__(self, recorder, name, args):
+        self.recorder = recorder
+        self.name = name
+        self.args = args
+        self.thread = threading.get_ident()
+        self.wall = self.cpu = 0.0
+        self.peak = None
+        self._memory_start = 0
+        self._child_peak = 0
+
+    def __enter__(self):
+        stack = self.recorder._stack()
+        stack.append(self)
+        if self.recorder.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._memory_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._cpu_start = time.thread_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self.start
+        self.cpu = time.thread_time() - self._cpu_start
+        stack = self.recorder._stack()
+        stack.pop()
+        if self.recorder.memory and tracemalloc.is_tracing():
+            # reset_peak() in nested spans hides earlier peaks from this one,
+            # so children report theirs upwards
+            own = tracemalloc.get_traced_memory()[1] - self._memory_start
+            self.peak = max(own, self._child_peak, 0)
+            if stack:
+                parent = stack[-1]
+                parent._child_peak = max(parent._child_peak,
+                                         self.peak + self._memory_start - parent._memory_start)
+        self.recorder._add(self)
+        return False
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'thread': self.thread,
+            'start_ms': (self.start - self.recorder.epoch) * 1000,
+            'wall_ms': self.wall * 1000,
+            'cpu_ms': self.cpu * 1000,
+            'peak_mb': None if self.peak is None else self.peak / 1e6,
+            'args': self.args,
+        }
+
+
+class Recorder:
+    """Collects spans from every thread of the process"""
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.epoch = time.perf_counter()
+        self._spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def enable(self, memory=False):
+        self.memory = memory
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memory = False
+
+    def span(self, name, **args):
+        """Return a context manager timing the enclosed block as name"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, args)
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _add(self, span):
+        with self._lock:
+            self._spans.append(span)
+            if len(self._spans) > MAX_SPANS:
+                del self._spans[:len(self._spans) - MAX_SPANS]
+
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+        self.epoch = time.perf_counter()
+
+    def summary(self):
+        """Return per-stage totals: {name: {count, wall_ms, cpu_ms, max_wall_ms, peak_mb}}"""
+        stages = {}
+        for span in self.spans():
+            stage = stages.setdefault(span.name, {'count': 0, 'wall_ms': 0.0, 'cpu_ms': 0.0,
+                                                  'max_wall_ms': 0.0, 'peak_mb': None})
+            stage['count'] += 1
+            stage['wall_ms'] += span.wall * 1000
+            stage['cpu_ms'] += span.cpu * 1000
+            stage['max_wall_ms'] = max(stage['max_wall_ms'], span.wall * 1000)
+            if span.peak is not None:
+                stage['peak_mb'] = max(stage['peak_mb'] or 0.0, span.peak / 1e6)
+        return stages
+
+    def to_json(self):
+        return {'spans': [span.as_dict() for span in self.spans()], 'summary': self.summary()}
+
+    def to_chrome_trace(self):
+        """Return the spans in Chrome's Trace Event Format (complete 'X' events)"""
+        pid = os.getpid()
+        events = []
+        for span in self.spans():
+            args = dict(span.args, cpu_ms=round(span.cpu * 1000, 3))
+            if span.peak is not None:
+                args['peak_mb'] = round(span.peak / 1e6, 3)
+            events.append({'name': span.name, 'ph': 'X', 'pid': pid, 'tid': span.thread,
+                           'ts': (span.start - self.epoch) * 1e6, 'dur': span.wall * 1e6,
+                           'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path, kind=None):
+        """Write the records to path as kind 'json' or 'chrome'
+
+        Without kind, paths ending in ``.trace.json`` get a Chrome trace and
+        anything else the JSON report.
+        """
+        if kind is None:
+            kind = 'chrome' if path.endswith('.trace.json') else 'json'
+        data = self.to_chrome_trace() if kind == 'chrome' else self.to_json()
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=None if kind == 'chrome' else 2)
+
+
+def format_summary(summary):
+    """Return a text table of summary(), slowest stage first"""
+    lines = [f"{'stage':<22} {'count':>6} {'wall ms':>10} {'cpu ms':>10} {'max ms':>9} {'peak MB':>8}"]
+    for name, stage in sorted(summary.items(), key=lambda item: -item[1]['wall_ms']):
+        peak = '' if stage['peak_mb'] is None else f"{stage['peak_mb']:.1f}"
+        lines.append(f"{name:<22} {stage['count']:>6} {stage['wall_ms']:>10.1f} "
+                     f"{stage['cpu_ms']:>10.1f} {stage['max_wall_ms']:>9.1f} {peak:>8}")
+    return '\n'.join(lines)
+
+
+recorder = Recorder()
+span = recorder.span
+enable = recorder.enable
+disable = recorder.disable
+
+
+def _enable_from_environment():
+    value = os.environ.get(ENV_VAR, '').strip().lower()
+    if value and value not in ('0', 'false', 'no', 'off'):
+        enable(memory=(value == 'memory'))
+
+
+_enable_from_environment()
@@ -0,0 +1,101 @@
+"""Run long operations off the Tk main loop.
+
+Tk widgets may only be touched from the thread running ``mainloop``, so the
+worker thread never calls back into the UI directly. It posts progress and
+results onto a queue that the main thread drains from ``root.after``.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's progress callback once cancel() was requested"""
+
+
+class JobRunner:
+    """Runs one background job at a time and reports back on the Tk thread"""
+
+    def __init__(self, root, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-job')
+        self._messages = queue.Queue()
+        self._cancel = threading.Event()
+        self._callbacks = None
+
+    @property
+    def busy(self):
+        return self._callbacks is not None
+
+    def submit(self, work, on_done, on_error=None, on_progress=None, on_finish=None):
+        """Run work(report) on the worker thread
+
+        work receives a report(fraction) callable to publish progress between
+        0 and 1; report raises JobCancelled once cancel() has been called, so
+        work stops at its next progress update. on_done(result),
+        on_error(exception), on_progress(fraction) and on_finish() are all
+        called on the Tk thread. on_finish runs after done, error or cancel.
+        """
+        if self.busy:
+            raise RuntimeError("A background job is already running")
+        self._cancel.clear()
+        self._callbacks = (on_done, on_error, on_progress, on_finish)
+        self._executor.submit(self._run, work)
+        self.root.after(self.poll_ms, self._poll)
+
+    def cancel(self):
+        """Ask the running job to stop at its next progress update"""
+        self._cancel.set()
+
+    def _report(self, fraction):
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self._messages.put(('progress', fraction))
+
+    def _run(self, work):
+        try:
+            self._messages.put(('done', work(self._report)))
+        except JobCancelled as e:
+            self._messages.put(('cancelled', e))
+        except Exception as e:
+            self._messages.put(('error', e))
+
+    def _poll(self):
+        on_done, on_error, on_progress, on_finish = self._callbacks
+        finished = latest = None
+        try:
+            while True:
+                kind, payload = self._messages.get_nowait()
+                if kind == 'progress':
+                    # Only the latest progress value matters
+                    latest = payload
+                    continue
+                finished = (kind, payload)
+                break
+        except queue.Empty:
+            pass
+
+        if on_progress is not None and latest is not None:
+            on_progress(latest)
+
+        if finished is None:
+            self.root.after(self.poll_ms, self._poll)
+            return
+
+        self._callbacks = None
+        kind, payload = finished
+        try:
+            if kind == 'done':
+                on_done(payload)
+            elif kind == 'error' and on_error is not None:
+                on_error(payload)
+        finally:
+            if on_finish is not None:
+                on_finish()
+
+    def shutdown(self):
+        """Cancel any running job and stop the worker thread"""
+        self.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,189 @@
+"""Keystream XOR mode: every byte gets its own key byte.
+
+Scheme keystream-v1
+-------------------
+A passphrase and a random 16-byte salt go through PBKDF2-HMAC-SHA256
+(``ITERATIONS`` rounds, 20 bytes out). The first 16 bytes key a Philox4x64
+counter-based generator and the last 4 are a key check value. Byte i of the
+image, flattened in C order, is XORed with byte i of the generator's output
+stream. The stream is little-endian 64-bit words with the counter starting
+at 0.
+
+The stream is produced ``CHUNK_BYTES`` at a time and each chunk is XORed
+into the output at once, while it is still in cache. The keystream for the
+whole image therefore never exists in memory, and memory-mapped sources and
+outputs are streamed through. Because Philox is counter-based, keystream()
+can also produce any slice of the stream directly, which is how chunks are
+spread over several threads (``workers``) with an identical result.
+
+Pixels are not scrambled in this mode. A position-dependent keystream
+already hides the structure that pixel shuffling only rearranges. Every
+encryption draws a fresh salt, and the salt is stored in the container
+header, so the same passphrase never reuses a keystream.
+"""
+
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+from . import cipher, container, loader, tiled
+from .instrument import span
+
+SCHEME_KEYSTREAM = 'keystream-v1'
+
+# PBKDF2 rounds (part of the scheme, do not change)
+ITERATIONS = 200000
+SALT_BYTES = 16
+
+# Keystream bytes generated and XORed per step (a multiple of one Philox block)
+CHUNK_BYTES = 1 << 22
+
+# Bytes produced per Philox4x64 counter value
+_BLOCK_BYTES = 32
+
+
+class StreamKey:
+    """Philox key material derived from a passphrase and salt"""
+
+    def __init__(self, key, salt, key_check):
+        self.key = key
+        self.salt = salt
+        self.key_check = key_check
+
+    @property
+    def words(self):
+        """The 128-bit Philox key as two uint64 words"""
+        return np.frombuffer(self.key, dtype='<u8').astype(np.uint64)
+
+
+def derive_key(passphrase, salt=None):
+    """Derive a StreamKey from passphrase; a random salt is drawn if none is given"""
+    if isinstance(passphrase, str):
+        passphrase = passphrase.encode('utf-8')
+    if not passphrase:
+        raise ValueError("Passphrase must not be empty")
+    if salt is None:
+        salt = os.urandom(SALT_BYTES)
+    if len(salt) != SALT_BYTES:
+        raise ValueError(f"Salt must be {SALT_BYTES} bytes")
+    material = hashlib.pbkdf2_hmac('sha256', passphrase, salt, ITERATIONS, dklen=20)
+    return StreamKey(material[:16], salt, material[16:])
+
+
+def _words(generator, count):
+    """Return the next count stream words with their bytes in little-endian order"""
+    words = generator.random_raw(count)
+    if sys.byteorder == 'big':
+        words.byteswap(inplace=True)
+    return words
+
+
+def keystream(stream_key, offset, size):
+    """Return keystream bytes [offset, offset + size) as a uint8 array
+
+    offset must be a multiple of 32 (one Philox block).
+    """
+    if offset % _BLOCK_BYTES:
+        raise ValueError(f"offset must be a multiple of {_BLOCK_BYTES}")
+    generator = np.random.Philox(key=stream_key.words, counter=[offset // _BLOCK_BYTES, 0, 0, 0])
+    return _words(generator, -(-size // 8)).view(np.uint8)[:size]
+
+
+def xor_keystream(arr, stream_key, out=None, progress=None, workers=None):
+    """XOR every byte of arr with the keystream and return the result
+
+    arr may be any integer array, including a read-only memmap. out may be a
+    separate C-contiguous array of the same shape and dtype (for example a
+    memmap), or arr itself to work in place. progress, if given, is called
+    as progress(bytes_done, total_bytes) after every chunk. workers is the
+    number of threads (see :func:`.cipher.run_chunks`).
+    """
+    img = np.asarray(arr)
+    if img.dtype.kind not in 'ui':
+        raise TypeError(f"Expected an integer image, got {img.dtype}")
+    if out is None:
+        out = np.empty_like(img, order='C')
+    if out.shape != img.shape or out.dtype != img.dtype:
+        raise ValueError(f"out must be a {img.dtype} array of shape {img.shape}")
+    if not out.flags.c_contiguous or not out.flags.writeable:
+        raise ValueError("out must be a writeable C-contiguous array")
+    if out is not arr:
+        img = np.ascontiguousarray(img)
+
+    src = img.reshape(-1).view(np.uint8)
+    dst = out.reshape(-1).view(np.uint8)
+    total = src.size
+    words_key = stream_key.words
+
+    def kernel(start, stop):
+        # Each chunk starts on a block boundary, so it gets its own generator
+        generator = np.random.Philox(key=words_key, counter=[start // _BLOCK_BYTES, 0, 0, 0])
+        words = _words(generator, -(-(stop - start) // 8))
+        body = start + (stop - start) // 8 * 8
+        # XOR whole 64-bit words, then any trailing bytes
+        np.bitwise_xor(src[start:body].view(np.uint64), words[:(body - start) // 8],
+                       out=dst[start:body].view(np.uint64))
+        if body < stop:
+            np.bitwise_xor(src[body:stop], words.view(np.uint8)[body - start:stop - start],
+                           out=dst[body:stop])
+
+    with span('keystream', bytes=total):
+        cipher.run_chunks(kernel, total, workers, progress, chunk=CHUNK_BYTES)
+    return out
+
+
+def encrypt(arr, stream_key, out=None, progress=None, workers=None):
+    """Encrypt arr with the keystream (see xor_keystream())"""
+    return xor_keystream(arr, stream_key, out, progress, workers)
+
+
+def decrypt(arr, stream_key, out=None, progress=None, workers=None):
+    """Decrypt arr with the keystream; the XOR is its own inverse"""
+    return xor_keystream(arr, stream_key, out, progress, workers)
+
+
+def encrypt_file(src_path, dst_path, passphrase, shape=None, progress=None):
+    """Stream src_path into a keystream-v1 container at dst_path
+
+    The salt and key check value are stored in the container header.
+    Returns the header.
+    """
+    src = tiled.open_source(src_path, shape)
+    if src_path.lower().endswith(container.EXTENSION):
+        channel_order = container.read_header(src_path).channel_order
+    elif shape is None and not src_path.lower().endswith('.npy'):
+        channel_order = loader.channel_order_of(src)
+    else:
+        channel_order = ''
+    stream_key = derive_key(passphrase)
+    header = container.ContainerHeader(SCHEME_KEYSTREAM, src.shape, src.dtype, channel_order,
+                                       key_check=stream_key.key_check, salt=stream_key.salt)
+    out = container.create(dst_path, header)
+    xor_keystream(src, stream_key, out, progress)
+    out.flush()
+    return header
+
+
+def decrypt_file(src_path, dst_path, passphrase, progress=None):
+    """Decrypt a keystream-v1 container into a ``.npy``, ``.pxc`` or image file"""
+    header, src = container.load(src_path)
+    if header.scheme != SCHEME_KEYSTREAM or header.salt is None:
+        raise ValueError(f"{src_path} is not a {SCHEME_KEYSTREAM} container")
+    stream_key = derive_key(passphrase, header.salt)
+    if header.key_check is not None and header.key_check != stream_key.key_check:
+        raise ValueError("Wrong passphrase (key check value does not match)")
+
+    if dst_path.lower().endswith(('.npy', container.EXTENSION)):
+        out = tiled.open_output(dst_path, header.shape, container.SCHEME_PLAIN,
+                                dtype=header.dtype, channel_order=header.channel_order)
+        xor_keystream(src, stream_key, out, progress)
+        out.flush()
+        return out
+
+    import cv2
+    result = xor_keystream(src, stream_key, progress=progress)
+    if not cv2.imwrite(dst_path, result):
+        raise ValueError(f"Could not write image: {dst_path}")
+    return result
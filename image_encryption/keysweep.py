@@ -0,0 +1,159 @@
+"""Recover a lost key by trying all 256 of them on a sample of pixels.
+
+A wrong key scrambles pixels with a different permutation, so the pixels it
+puts next to each other are unrelated and their correlation is close to 0.
+The right key restores a natural image, whose adjacent pixels correlate
+strongly (typically above 0.8). Candidates are therefore ranked by the
+adjacent-pixel correlation of their plaintext, and only that needs to be
+decrypted: ``sample`` random plaintext positions q together with their
+right and lower neighbours q + 1 and q + W.
+
+Plaintext pixel q is ciphertext pixel ``destination(q)`` XOR key:
+
+- ``feistel-v1`` computes the destinations of the sample directly, so a
+  key costs a few thousand Feistel evaluations and a gather.
+- ``shuffle-v1`` has no shortcut: a key's permutation is a full serial
+  pass of random draws, after which one masked pass over it finds the
+  sample's destinations. At 24 MP that is about two seconds per key, so a
+  full sweep takes minutes (about 475 s on one core), not seconds.
+  Permutations already in the process-wide cache are reused and tried
+  first. Generated ones are not added to the cache, so a sweep does not
+  evict the permutations the session is using.
+
+Keys are dealt out to the shared cipher thread pool (the shuffle and the
+gathers release the GIL), and the sweep stops early once a candidate
+reaches ``stop_score``.
+"""
+
+import time
+
+import numpy as np
+
+from . import cipher
+from .instrument import span
+from .metrics import pair_correlation
+from .permutation import SCHEME_FEISTEL, SCHEME_SHUFFLE, FeistelPermutation, \
+    peek_indices, scramble_indices
+
+# Plaintext positions sampled per sweep (each also needs two neighbours)
+DEFAULT_SAMPLE = 20000
+
+# A candidate scoring at least this ends the sweep
+STOP_SCORE = 0.5
+
+KEYS = range(256)
+
+
+class SweepResult:
+    """Scores of the keys one sweep tried"""
+
+    def __init__(self, scheme):
+        self.scheme = scheme
+        self.scores = {}
+        self.stopped_early = False
+        self.elapsed = 0.0
+
+    def ranking(self, top=None):
+        """Return [(key, score)] best first"""
+        ranked = sorted(self.scores.items(), key=lambda item: -item[1])
+        return ranked if top is None else ranked[:top]
+
+    @property
+    def best(self):
+        """(key, score) of the best candidate, or None if no key was tried"""
+        ranking = self.ranking(1)
+        return ranking[0] if ranking else None
+
+    def summary(self):
+        best = self.best
+        found = f"best key {best[0]} (score {best[1]:+.4f})" if best else "no key tried"
+        return (f"{found}; {len(self.scores)}/{len(KEYS)} key(s) tried in {self.elapsed:.2f}s"
+                + (", stopped early" if self.stopped_early else ""))
+
+
+def sample_positions(height, width, sample, seed=0):
+    """Return sample random flat positions that have a right and a lower neighbour"""
+    rng = np.random.default_rng(seed)
+    ys = rng.integers(0, height - 1, sample)
+    xs = rng.integers(0, width - 1, sample)
+    return ys * width + xs
+
+
+def _destinations(key, total_pixels, positions, scheme):
+    """Return the ciphertext position of every plaintext position (sorted, unique) under key"""
+    if key == 0:
+        return positions
+    if scheme == SCHEME_FEISTEL:
+        return FeistelPermutation(key, total_pixels).destination(positions).astype(np.int64)
+    if scheme != SCHEME_SHUFFLE:
+        raise ValueError(f"Unknown scrambling scheme: {scheme}")
+
+    indices = peek_indices(key, total_pixels, scheme)
+    if indices is None:
+        indices = scramble_indices(key, total_pixels)
+    # Ciphertext positions whose source is sampled, reordered by source
+    wanted = np.zeros(total_pixels, dtype=bool)
+    wanted[positions] = True
+    hits = np.flatnonzero(wanted[indices])
+    return hits[np.argsort(indices[hits], kind='stable')]
+
+
+def score_key(img, key, positions, inverse, scheme):
+    """Return the plaintext-likelihood score of key for an (H, W[, C]) ciphertext
+
+    positions are the sorted unique plaintext positions to decrypt and
+    inverse maps the concatenated (q, q + 1, q + W) sample onto them.
+    """
+    height, width = img.shape[:2]
+    pixels = cipher.flat_pixels(img)[_destinations(key, height * width, positions, scheme)]
+    np.bitwise_xor(pixels, np.uint8(key), out=pixels)
+    values = pixels.view(img.dtype).reshape(positions.size, -1)[inverse]
+    centre, right, below = np.split(values, 3)
+    correlation = np.concatenate([pair_correlation(centre, right),
+                                  pair_correlation(centre, below)])
+    # A constant channel has no correlation to speak of
+    return float(np.nan_to_num(correlation, nan=0.0).mean())
+
+
+def sweep(arr, scheme=cipher.DEFAULT_SCHEME, sample=DEFAULT_SAMPLE, stop_score=STOP_SCORE,
+          workers=None, seed=0, progress=None):
+    """Score every key for the ciphertext arr and return a SweepResult
+
+    stop_score=None tries all keys. workers defaults to every core (see
+    cipher.cpu_workers()). progress, if given, is called as
+    progress(keys_done, total_keys) after every key. A shuffle-v1 sweep
+    generates a full permutation per uncached key, so it takes minutes on
+    large images.
+    """
+    img = cipher.as_image(arr)
+    if workers is None:
+        workers = cipher.cpu_workers()
+    height, width = img.shape[:2]
+    if height < 2 or width < 2:
+        raise ValueError(f"Need at least 2x2 pixels to score keys, got {img.shape}")
+    total_pixels = height * width
+
+    centre = sample_positions(height, width, sample, seed)
+    positions, inverse = np.unique(np.concatenate([centre, centre + 1, centre + width]),
+                                   return_inverse=True)
+
+    # Keys whose permutation needs no generating go first
+    keys = sorted(KEYS, key=lambda key: scheme == SCHEME_SHUFFLE and key != 0 and
+                  peek_indices(key, total_pixels, scheme) is None)
+    result = SweepResult(scheme)
+    start = time.perf_counter()
+
+    def kernel(first, last):
+        for key in keys[first:last]:
+            if result.stopped_early:
+                return
+            with span('sweep_key', key=key):
+                score = score_key(img, key, positions, inverse, scheme)
+            result.scores[key] = score
+            if stop_score is not None and score >= stop_score:
+                result.stopped_early = True
+
+    with span('key_sweep', pixels=total_pixels, sample=sample):
+        cipher.run_chunks(kernel, len(keys), workers=workers, progress=progress, chunk=1)
+    result.elapsed = time.perf_counter() - start
+    return result
@@ -0,0 +1,137 @@
+"""Image file loading that keeps native channel order and bit depth.
+
+Files are decoded with ``cv2.IMREAD_UNCHANGED``, so the cipher sees pixels
+exactly as stored: BGR, BGRA or grayscale, ``uint8`` or ``uint16``. Nothing
+is converted on load. Only the small, display-sized result of a preview fit
+goes through to_display().
+
+Large JPEGs are first decoded at 1/2, 1/4 or 1/8 scale, which libjpeg does in
+the DCT domain for a fraction of the cost of a full decode. The full image
+is decoded later, when something needs every pixel. Other formats cannot
+decode at a reduced size cheaply, so for them the one full decode also
+serves as the preview. EXIF orientation is ignored by both decodes so the
+preview and the full image always agree.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+from .instrument import span
+
+# Smallest long edge a reduced preview may have (about one canvas pane)
+PREVIEW_EDGE = 1024
+
+# (factor, colour flag, grayscale flag), largest reduction first
+_REDUCED = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+)
+
+
+def channel_order_of(img):
+    """Return the channel order OpenCV decodes an image of this shape into"""
+    channels = 1 if img.ndim == 2 else img.shape[2]
+    return {1: 'GRAY', 3: 'BGR', 4: 'BGRA'}.get(channels, '')
+
+
+def read_image(path):
+    """Decode path at full resolution and return (image, channel_order)"""
+    with span('decode'):
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError("Could not load image. Please check the file format.")
+    return image, channel_order_of(image)
+
+
+def _jpeg_header(path):
+    """Return (width, height, grayscale) for a JPEG file, else None"""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as im:
+            if im.format != 'JPEG':
+                return None
+            return im.width, im.height, im.mode == 'L'
+    except OSError:
+        return None
+
+
+def read_preview(path, max_edge=PREVIEW_EDGE):
+    """Return (image, channel_order, (width, height)) decoded at reduced size
+
+    Returns None when the file is not a JPEG or is too small to be reduced
+    without dropping below max_edge on its long edge.
+    """
+    header = _jpeg_header(path)
+    if header is None:
+        return None
+    width, height, grayscale = header
+    for factor, colour_flag, gray_flag in _REDUCED:
+        if max(width, height) // factor >= max_edge:
+            flag = (gray_flag if grayscale else colour_flag) | cv2.IMREAD_IGNORE_ORIENTATION
+            with span('decode_preview', factor=factor):
+                image = cv2.imread(path, flag)
+            if image is None:
+                return None
+            if grayscale and image.ndim == 3:
+                image = image[:, :, 0]
+            return image, channel_order_of(image), (width, height)
+    return None
+
+
+def to_display(img, channel_order):
+    """Return an 8-bit RGB(A) or grayscale copy of img suitable for PIL
+
+    Meant for display-sized images: 16-bit samples keep their high byte and
+    BGR(A) is reordered to RGB(A).
+    """
+    if img.dtype == np.uint16:
+        img = (img >> 8).astype(np.uint8)
+    elif img.dtype != np.uint8:
+        raise ValueError(f"Cannot display {img.dtype} images")
+    if channel_order == 'BGR':
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    if channel_order == 'BGRA':
+        return cv2.cvtColor(img, cv2.COLOR_BGRA2RGBA)
+    return img
+
+
+def rgb_channels(channel_order, channels):
+    """Return the channel indices holding red, green and blue (or gray), in that order"""
+    if channel_order.startswith('BGR'):
+        return [2, 1, 0]
+    return list(range(min(channels, 3)))
+
+
+class LazyImage:
+    """An image file with an instant preview and a full decode on first use
+
+    preview is available right away. full() decodes the whole image once
+    (thread-safe, so it can run in a background job) and returns it.
+    """
+
+    def __init__(self, path, max_edge=PREVIEW_EDGE):
+        self.path = path
+        self._full = None
+        self._lock = threading.Lock()
+        reduced = read_preview(path, max_edge)
+        if reduced is None:
+            self._full, self.channel_order = read_image(path)
+            self.preview = self._full
+            self.size = (self._full.shape[1], self._full.shape[0])
+        else:
+            self.preview, self.channel_order, self.size = reduced
+
+    @property
+    def loaded(self):
+        return self._full is not None
+
+    def full(self):
+        """Return the full-resolution image, decoding it on the first call"""
+        with self._lock:
+            if self._full is None:
+                self._full, self.channel_order = read_image(self.path)
+            return self._full
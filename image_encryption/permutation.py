@@ -0,0 +1,233 @@
+"""Pixel scrambling permutations and a bounded cache for them.
+
+Two versioned schemes are available:
+
+``shuffle-v1``
+    The original scheme: ``np.random.seed(key)`` + ``np.random.shuffle`` over
+    ``np.arange(H*W)``. Generating it costs a full serial pass of random
+    draws, so permutations are kept in an LRU cache keyed by
+    ``(key, total_pixels)``. Indices are stored in the smallest unsigned
+    dtype that can address every pixel and the cache evicts by total bytes.
+
+``feistel-v1``
+    A keyed bijection over ``[0, H*W)``: a 4-round balanced Feistel network
+    over the smallest even bit width covering ``H*W``, with cycle-walking
+    back into range. Round keys are derived from the key and the pixel count
+    with splitmix64. The round function is lowbias32 for domains of up to
+    2**32 pixels and the splitmix64 finaliser above that. Any
+    slice of the permutation is computed on demand, so nothing is stored and
+    chunks can be evaluated independently and in parallel.
+
+Both schemes are used the same way: ciphertext position ``i`` holds source
+pixel ``indices[i]``.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .instrument import span
+from .schemes import DEFAULT_SCHEME, SCHEME_FEISTEL, SCHEME_SHUFFLE, SCHEMES  # noqa: F401
+
+# Default upper bound on bytes of cached index arrays (256 MiB)
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+_MASK64 = (1 << 64) - 1
+
+
+def index_dtype(total_pixels):
+    """Return the smallest unsigned dtype able to index total_pixels items"""
+    for dtype in (np.uint16, np.uint32):
+        if total_pixels <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def scramble_indices(key, total_pixels):
+    """Generate the pixel permutation used for scrambling with this key"""
+    # RandomState(key) is the legacy generator np.random.seed(key) resets and
+    # shuffle() draws the same swaps whatever the dtype, so this matches the
+    # original np.arange + np.random.shuffle without touching global state
+    with span('shuffle', pixels=total_pixels):
+        indices = np.arange(total_pixels, dtype=index_dtype(total_pixels))
+        np.random.RandomState(key).shuffle(indices)
+    return indices
+
+
+def _splitmix64(value):
+    """splitmix64 step on a Python int, used to derive round keys"""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+class FeistelPermutation:
+    """Keyed bijection over range(total_pixels) evaluated on demand
+
+    Supports len() and slicing like an index array, so it can be passed
+    wherever a shuffle permutation is expected.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, key, total_pixels):
+        self.total_pixels = total_pixels
+        bits = max(2, (total_pixels - 1).bit_length())
+        self.half_bits = (bits + 1) // 2
+        self.dtype = index_dtype(total_pixels)
+
+        # Domains up to 2**32 are walked in uint32 with the lowbias32 mixer,
+        # which is much faster than uint64 arithmetic in NumPy
+        self._work = np.uint32 if self.half_bits <= 16 else np.uint64
+        word_mask = (1 << (32 if self._work is np.uint32 else 64)) - 1
+
+        seed = _splitmix64((key << 40) ^ total_pixels)
+        self._round_keys = []
+        for _ in range(self.ROUNDS):
+            seed = _splitmix64(seed)
+            self._round_keys.append(self._work(seed & word_mask))
+        self._shift = self._work(self.half_bits)
+        self._mask = self._work((1 << self.half_bits) - 1)
+
+    def _round(self, half, round_key):
+        """Mix (half ^ round_key) and truncate it to half width"""
+        work = self._work
+        z = half ^ round_key
+        if work is np.uint32:
+            # lowbias32
+            z ^= z >> work(16)
+            z *= work(0x7FEB352D)
+            z ^= z >> work(15)
+            z *= work(0x846CA68B)
+            z ^= z >> work(16)
+        else:
+            # splitmix64 finaliser
+            z ^= z >> work(30)
+            z *= work(0xBF58476D1CE4E5B9)
+            z ^= z >> work(27)
+            z *= work(0x94D049BB133111EB)
+            z ^= z >> work(31)
+        z &= self._mask
+        return z
+
+    def _forward(self, values):
+        left, right = values >> self._shift, values & self._mask
+        for round_key in self._round_keys:
+            left ^= self._round(right, round_key)
+            left, right = right, left
+        left <<= self._shift
+        left |= right
+        return left
+
+    def _backward(self, values):
+        left, right = values >> self._shift, values & self._mask
+        for round_key in reversed(self._round_keys):
+            right ^= self._round(left, round_key)
+            left, right = right, left
+        left <<= self._shift
+        left |= right
+        return left
+
+    def _walk(self, values, step):
+        """Apply step until every value falls back inside range(total_pixels)"""
+        result = step(values)
+        outside = np.flatnonzero(result >= self.total_pixels)
+        while outside.size:
+            stepped = step(result[outside])
+            result[outside] = stepped
+            outside = outside[stepped >= self.total_pixels]
+        return result.astype(self.dtype)
+
+    def __len__(self):
+        return self.total_pixels
+
+    def __getitem__(self, item):
+        """Return the source pixel of each ciphertext position in item"""
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self.total_pixels)
+            positions = np.arange(start, stop, step, dtype=self._work)
+        else:
+            positions = np.asarray(item, dtype=self._work)
+        return self._walk(positions, self._forward)
+
+    def destination(self, pixels):
+        """Return the ciphertext position each source pixel is moved to"""
+        return self._walk(np.asarray(pixels, dtype=self._work), self._backward)
+
+
+class PermutationCache:
+    """Thread-safe LRU cache of scrambling permutations bounded by size in bytes"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, total_pixels):
+        """Return the (read-only) permutation for key and pixel count"""
+        cache_key = (key, total_pixels)
+        with self._lock:
+            indices = self._entries.get(cache_key)
+            if indices is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return indices
+            self.misses += 1
+
+        # Generate outside the lock so other sizes are not blocked meanwhile
+        indices = scramble_indices(key, total_pixels)
+        indices.setflags(write=False)
+        self._store(cache_key, indices)
+        return indices
+
+    def peek(self, key, total_pixels):
+        """Return the cached permutation for key and pixel count, or None without generating it"""
+        with self._lock:
+            return self._entries.get((key, total_pixels))
+
+    def _store(self, cache_key, indices):
+        with self._lock:
+            if cache_key in self._entries or indices.nbytes > self.max_bytes:
+                return
+            self._entries[cache_key] = indices
+            self.current_bytes += indices.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def clear(self):
+        """Drop every cached permutation"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, cache_key):
+        return cache_key in self._entries
+
+
+# Process-wide cache shared by the cipher functions
+default_cache = PermutationCache()
+
+
+def get_indices(key, total_pixels, scheme=DEFAULT_SCHEME):
+    """Return the scrambling permutation for key and pixel count under scheme"""
+    if scheme == SCHEME_SHUFFLE:
+        return default_cache.get(key, total_pixels)
+    if scheme == SCHEME_FEISTEL:
+        return FeistelPermutation(key, total_pixels)
+    raise ValueError(f"Unknown scrambling scheme: {scheme}")
+
+
+def peek_indices(key, total_pixels, scheme=DEFAULT_SCHEME):
+    """Like get_indices(), but None where the permutation would have to be generated"""
+    if scheme == SCHEME_SHUFFLE:
+        return default_cache.peek(key, total_pixels)
+    return get_indices(key, total_pixels, scheme)
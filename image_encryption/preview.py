@@ -0,0 +1,86 @@
+"""Lazily built downscale pyramids for fast on-screen previews.
+
+Each level halves the previous one with an area filter and is only built the
+first time a display needs it. A preview of any size is then a cheap
+resize from the nearest level that is at least as large, so showing a 100 MP
+image costs about the same as showing a 1 MP one once its pyramid exists.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+from .instrument import span
+
+# Levels are not built below this many pixels along the longer edge
+MIN_LEVEL_EDGE = 64
+
+
+class PreviewPyramid:
+    """Halving pyramid over one image, level 0 being the image itself"""
+
+    def __init__(self, img):
+        # The caller's object, for identity checks; np.asarray() of a memmap is a new object
+        self.source = img
+        self.image = np.asarray(img)
+        self._levels = [self.image]
+        self._lock = threading.Lock()
+
+    def level(self, index):
+        """Return pyramid level index, building missing levels on demand"""
+        with self._lock:
+            while len(self._levels) <= index:
+                previous = self._levels[-1]
+                height, width = previous.shape[:2]
+                if max(height, width) <= MIN_LEVEL_EDGE:
+                    break
+                size = (max(1, width // 2), max(1, height // 2))
+                self._levels.append(cv2.resize(previous, size, interpolation=cv2.INTER_AREA))
+            return self._levels[min(index, len(self._levels) - 1)]
+
+    def scale_for(self, max_width, max_height):
+        """Return the factor that fits the image into max_width x max_height, at most 1"""
+        height, width = self.image.shape[:2]
+        return min(max(1, max_width) / width, max(1, max_height) / height, 1.0)
+
+    def level_for(self, max_width, max_height):
+        """Return the smallest level that still covers max_width x max_height"""
+        scale = self.scale_for(max_width, max_height)
+        index = 0
+        # Level index is 2 ** index times smaller; step down while the next still covers
+        while 2 ** (index + 1) * scale <= 1.0:
+            index += 1
+        return self.level(index)
+
+    def fit(self, max_width, max_height):
+        """Return the image scaled to fit max_width x max_height, never upscaled"""
+        height, width = self.image.shape[:2]
+        scale = self.scale_for(max_width, max_height)
+        new_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+        with span('pyramid_fit'):
+            source = self.level_for(max_width, max_height)
+            if (source.shape[1], source.shape[0]) == new_size:
+                return source
+            # At most a 2x reduction remains, so a bilinear filter is enough
+            return cv2.resize(source, new_size, interpolation=cv2.INTER_LINEAR)
+
+
+class PyramidCache:
+    """Pyramids remembered per named image slot, rebuilt when the slot's array changes"""
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, name, img):
+        pyramid = self._entries.get(name)
+        if pyramid is None or pyramid.source is not img:
+            pyramid = self._entries[name] = PreviewPyramid(img)
+        return pyramid
+
+    def invalidate(self, name=None):
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
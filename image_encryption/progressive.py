@@ -0,0 +1,128 @@
+"""Display-resolution previews of cipher results.
+
+The panes show images fitted to the canvas, so the first look at a result
+does not need the full-resolution cipher. These functions evaluate the
+cipher only at about as many pixels as the canvas shows:
+
+- Encrypting: ciphertext pixel i is plaintext pixel ``indices[i]`` XOR key,
+  so a nearest-neighbour grid over the ciphertext needs only those indices.
+  The Feistel scheme computes them directly and the shuffle scheme uses its
+  permutation if it is already cached. The result is an exact sample of
+  the final ciphertext. Without a cached permutation the sampled plaintext
+  grid is encrypted instead: the same kind of noise with the same
+  histogram, but not the real ciphertext.
+- Decrypting with the Feistel scheme: plaintext pixel q is ciphertext pixel
+  ``destination(q)`` XOR key, so the grid is again sampled exactly.
+- Decrypting with the shuffle scheme: inverting a cached permutation takes
+  a full pass over it, so instead about ``SPLAT_SAMPLES`` evenly spaced
+  ciphertext pixels per grid cell are decrypted and written into the cell
+  their plaintext position falls in. Each cell ends up showing one of its
+  own pixels, and the few cells no sample hit copy the previous cell.
+  Without a cached permutation there is no preview.
+
+Every function returns an image of the input's dtype and channel layout,
+or None.
+"""
+
+import numpy as np
+
+from . import cipher
+from .instrument import span
+from .permutation import SCHEME_FEISTEL, FeistelPermutation, peek_indices
+
+# Ciphertext pixels decrypted per grid cell by the shuffle decrypt preview
+SPLAT_SAMPLES = 4
+
+
+def grid_shape(height, width, max_width, max_height):
+    """Return (rows, columns) of the preview grid: the image fitted to the box, never upscaled"""
+    scale = min(max_width / width, max_height / height, 1.0)
+    return max(1, int(height * scale)), max(1, int(width * scale))
+
+
+def grid_positions(height, width, rows, columns):
+    """Return the flat positions of a rows x columns nearest-neighbour grid, in row-major order"""
+    ys = ((np.arange(rows) + 0.5) * height / rows).astype(np.int64)
+    xs = ((np.arange(columns) + 0.5) * width / columns).astype(np.int64)
+    return (ys[:, np.newaxis] * width + xs[np.newaxis, :]).reshape(-1)
+
+
+def _take(img, positions, rows, columns):
+    """Return the pixels of img at flat positions as a rows x columns image"""
+    height, width = img.shape[:2]
+    pixels = img.reshape(height * width, *img.shape[2:])
+    return pixels[positions].reshape(rows, columns, *img.shape[2:])
+
+
+def _xor(img, key):
+    np.bitwise_xor(img.view(np.uint8), np.uint8(key), out=img.view(np.uint8))
+    return img
+
+
+def encrypt_preview(arr, key, max_width, max_height, scheme=cipher.DEFAULT_SCHEME):
+    """Return the ciphertext of arr as it would be shown fitted to max_width x max_height"""
+    img = cipher.as_image(arr)
+    key = cipher.validate_key(key)
+    height, width = img.shape[:2]
+    rows, columns = grid_shape(height, width, max_width, max_height)
+    positions = grid_positions(height, width, rows, columns)
+
+    with span('encrypt_preview', pixels=positions.size):
+        if key == 0:
+            return _take(img, positions, rows, columns)
+        indices = peek_indices(key, height * width, scheme)
+        if indices is None:
+            # Stand-in: the sampled plaintext encrypted on its own
+            return cipher.encrypt(_take(img, positions, rows, columns), key, scheme=scheme)
+        return _xor(_take(img, indices[positions], rows, columns), key)
+
+
+def decrypt_preview(arr, key, max_width, max_height, scheme=cipher.DEFAULT_SCHEME):
+    """Return the plaintext of arr as it would be shown fitted to max_width x max_height
+
+    Returns None for the shuffle scheme when its permutation is not cached.
+    """
+    img = cipher.as_image(arr)
+    key = cipher.validate_key(key)
+    height, width = img.shape[:2]
+    total_pixels = height * width
+    rows, columns = grid_shape(height, width, max_width, max_height)
+
+    with span('decrypt_preview', pixels=rows * columns):
+        if key == 0:
+            return _take(img, grid_positions(height, width, rows, columns), rows, columns)
+        if scheme == SCHEME_FEISTEL:
+            positions = grid_positions(height, width, rows, columns)
+            sources = FeistelPermutation(key, total_pixels).destination(positions)
+            return _xor(_take(img, sources, rows, columns), key)
+        indices = peek_indices(key, total_pixels, scheme)
+        if indices is None:
+            return None
+        return _splat(img, key, indices, rows, columns)
+
+
+def _splat(img, key, indices, rows, columns):
+    """Write decrypted ciphertext samples into the grid cells their plaintext lands in"""
+    height, width = img.shape[:2]
+    total_pixels = height * width
+    cell_count = rows * columns
+    step = max(1, total_pixels // (cell_count * SPLAT_SAMPLES))
+
+    # Plaintext position of every sample, mapped to its grid cell through lookup tables
+    target_rows, target_columns = np.divmod(indices[::step], indices.dtype.type(width))
+    row_cells = (np.arange(height, dtype=np.int64) * rows // height * columns).astype(np.int32)
+    column_cells = (np.arange(width, dtype=np.int64) * columns // width).astype(np.int32)
+    cells = row_cells[target_rows] + column_cells[target_columns]
+
+    # Decrypted samples, moved as opaque pixels like in the cipher kernels
+    values = np.bitwise_xor(cipher.flat_pixels(img)[::step], np.uint8(key))
+    grid = np.zeros((cell_count, values.shape[1]), dtype=np.uint8)
+    cipher.opaque_pixels(grid.reshape(cell_count, 1, -1))[cells] = \
+        cipher.opaque_pixels(values.reshape(values.shape[0], 1, -1))
+    filled = np.zeros(cell_count, dtype=bool)
+    filled[cells] = True
+
+    # Empty cells copy the nearest filled cell before them (or the first one)
+    previous = np.where(filled, np.arange(cell_count), np.argmax(filled))
+    np.maximum.accumulate(previous, out=previous)
+    return grid[previous].view(img.dtype).reshape(rows, columns, *img.shape[2:])
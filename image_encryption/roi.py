@@ -0,0 +1,218 @@
+"""Encrypt only regions of an image, such as faces or number plates.
+
+Regions are rectangles ``(x, y, width, height)`` and/or a boolean mask of
+the image's height and width. Each rectangle is ciphered on its own: its
+pixels are XORed with the key and scrambled with the permutation for its
+pixel count, so they never leave the rectangle. The mask is treated as one
+more region whose pixels, taken in row-major order, are scrambled among
+themselves. Overlapping regions are allowed; decryption undoes them in
+reverse order.
+
+Everything happens in place on the caller's array. Each region is copied
+out (a view of a rectangle is not contiguous), ciphered and written back,
+so time and memory grow with the region area, not the image. For a memmap
+(for example a container opened with mode 'r+'), only the pages under the
+regions are read and written. A mask still costs one pass over the mask
+itself to find its pixels. The file functions copy a source into its new
+file band by band and cipher the regions there, so they never hold the
+whole image either (except to encode an image file).
+
+The regions are needed for decryption; :mod:`.container` stores them in a
+region table after the pixel data.
+"""
+
+import numpy as np
+
+from . import cipher, container, tiled
+from .instrument import span
+from .schemes import DEFAULT_SCHEME
+
+# Bytes copied per band when a source is copied into a new file
+COPY_BYTES = 64 * 1024 * 1024
+
+
+def clip_rectangles(rectangles, height, width):
+    """Return rectangles as int tuples clipped to the image, dropping empty ones"""
+    clipped = []
+    for x, y, w, h in rectangles:
+        x0, y0 = max(0, int(x)), max(0, int(y))
+        x1, y1 = min(width, int(x) + int(w)), min(height, int(y) + int(h))
+        if x1 > x0 and y1 > y0:
+            clipped.append((x0, y0, x1 - x0, y1 - y0))
+    return clipped
+
+
+def _check(img, mask):
+    if not isinstance(img, np.ndarray) or img.dtype.kind not in 'ui' or img.ndim < 2:
+        raise TypeError("Expected an integer image array of shape (H, W[, C])")
+    if not img.flags.writeable:
+        raise ValueError("Regions are ciphered in place; the image must be writeable")
+    if mask is not None:
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != img.shape[:2]:
+            raise ValueError(f"Mask shape {mask.shape} does not match image {img.shape[:2]}")
+    return mask
+
+
+def _cipher_rectangle(operation, img, key, rectangle, scheme, workers, progress):
+    x, y, w, h = rectangle
+    view = img[y:y + h, x:x + w]
+    view[...] = operation(np.ascontiguousarray(view), key, scheme=scheme, workers=workers,
+                          progress=progress)
+
+
+def _cipher_mask(operation, img, key, positions, scheme, workers, progress):
+    if not img.flags.c_contiguous:
+        raise ValueError("Masked regions need a C-contiguous image")
+    if positions.size == 0:
+        return
+    pixels = img.reshape(-1, *img.shape[2:])
+    # The masked pixels as a one-row image
+    region = pixels[positions].reshape(1, positions.size, *img.shape[2:])
+    pixels[positions] = operation(region, key, scheme=scheme, workers=workers,
+                                  progress=progress)[0]
+
+
+def _regions(img, key, rectangles, mask):
+    """Return (key, clipped rectangles, mask pixel positions or None)"""
+    key = cipher.validate_key(key)
+    mask = _check(img, mask)
+    rectangles = clip_rectangles(rectangles, *img.shape[:2])
+    positions = None if mask is None else np.flatnonzero(mask)
+    return key, rectangles, positions
+
+
+def _steps(operation, rectangles, positions, progress):
+    """Yield (kind, region, progress) per region, with progress over all region pixels"""
+    sizes = [w * h for _, _, w, h in rectangles]
+    regions = [('rectangle', rectangle, size) for rectangle, size in zip(rectangles, sizes)]
+    if positions is not None:
+        regions.append(('mask', positions, positions.size))
+    if operation is cipher.decrypt:
+        regions.reverse()
+    total = sum(size for _, _, size in regions)
+    done = 0
+    for kind, region, size in regions:
+        if progress is None:
+            yield kind, region, None
+        else:
+            yield kind, region, lambda pixels, _, offset=done: progress(offset + pixels, total)
+        done += size
+
+
+def _apply(operation, img, key, rectangles, mask, scheme, workers, progress):
+    key, rectangles, positions = _regions(img, key, rectangles, mask)
+    name = 'roi_encrypt' if operation is cipher.encrypt else 'roi_decrypt'
+    with span(name, regions=len(rectangles) + (positions is not None)):
+        for kind, region, region_progress in _steps(operation, rectangles, positions, progress):
+            if kind == 'rectangle':
+                _cipher_rectangle(operation, img, key, region, scheme, workers, region_progress)
+            else:
+                _cipher_mask(operation, img, key, region, scheme, workers, region_progress)
+    return img
+
+
+def encrypt(img, key, rectangles=(), mask=None, scheme=DEFAULT_SCHEME, workers=None,
+            progress=None):
+    """Encrypt the regions of img in place and return img
+
+    rectangles are clipped to the image. Pass the same (clipped) rectangles,
+    mask, key and scheme to decrypt(). progress, if given, is called as
+    progress(pixels_done, total_region_pixels).
+    """
+    return _apply(cipher.encrypt, img, key, rectangles, mask, scheme, workers, progress)
+
+
+def decrypt(img, key, rectangles=(), mask=None, scheme=DEFAULT_SCHEME, workers=None,
+            progress=None):
+    """Decrypt the regions of img in place and return img"""
+    return _apply(cipher.decrypt, img, key, rectangles, mask, scheme, workers, progress)
+
+
+def _copy_rows(src, dst):
+    """Copy src into dst a band of rows at a time, so a memmapped src never sits in RAM whole"""
+    rows = max(1, COPY_BYTES // max(1, src[:1].nbytes))
+    for start in range(0, src.shape[0], rows):
+        dst[start:start + rows] = src[start:start + rows]
+
+
+def encrypt_file(src_path, dst_path, key, rectangles=(), mask=None, scheme=DEFAULT_SCHEME,
+                 key_check=False):
+    """Encrypt regions of src_path into a container at dst_path, with its region table
+
+    With dst_path None, src_path must be a plain container and is encrypted
+    in place: only the region pixels, the header and the table are written.
+    Otherwise the source is copied into the new container band by band and
+    the regions are then encrypted there, so a ``.npy`` or container source
+    is never loaded whole. A key check value is only stored with
+    key_check=True, since it reveals the key to anyone trying all 256.
+    Returns the header.
+    """
+    if dst_path is None:
+        header, img = container.load(src_path, mode='r+')
+        if header.scheme != container.SCHEME_PLAIN:
+            raise ValueError(f"{src_path} is already encrypted ({header.scheme})")
+    else:
+        if not dst_path.lower().endswith(container.EXTENSION):
+            raise ValueError(f"Regions are stored in a {container.EXTENSION} container")
+        src = tiled.open_source(src_path)
+        if src_path.lower().endswith(container.EXTENSION):
+            channel_order = container.read_header(src_path).channel_order
+        elif src_path.lower().endswith('.npy'):
+            channel_order = ''
+        else:
+            from .loader import channel_order_of
+            channel_order = channel_order_of(src)
+        header = container.ContainerHeader(scheme, src.shape, src.dtype, channel_order)
+        img = container.create(dst_path, header)
+        _copy_rows(src, img)
+
+    header.scheme = scheme
+    header.key_check = container.key_check_value(scheme, key) if key_check else None
+    header.rectangles = clip_rectangles(rectangles, *img.shape[:2])
+    header.mask = None if mask is None else np.asarray(mask, dtype=bool)
+    encrypt(img, key, header.rectangles, header.mask, scheme=scheme)
+
+    img.flush()
+    # Writes the header and appends the region table after the pixels
+    container.update(dst_path or src_path, header)
+    return header
+
+
+def decrypt_file(src_path, dst_path, key):
+    """Decrypt the regions of a container into a ``.npy``, ``.pxc`` or image file
+
+    With dst_path None the container is decrypted in place and becomes a
+    plain container again. A ``.npy`` or ``.pxc`` destination is filled
+    band by band and decrypted there; an image file has to be encoded from
+    memory. Returns the decrypted pixels.
+    """
+    header = container.read_header(src_path)
+    if not header.has_regions:
+        raise ValueError(f"{src_path} has no encrypted regions")
+    if container.check_key(header, key) is False:
+        raise ValueError("Wrong key (key check value does not match)")
+    rectangles, mask, scheme = header.rectangles, header.mask, header.scheme
+
+    if dst_path is None:
+        img = container.load(src_path, mode='r+')[1]
+        decrypt(img, key, rectangles, mask, scheme=scheme)
+        img.flush()
+        header.scheme = container.SCHEME_PLAIN
+        header.key_check = header.rectangles = header.mask = None
+        container.update(src_path, header)
+        return img
+
+    src = container.load(src_path)[1]
+    if not dst_path.lower().endswith(('.npy', container.EXTENSION)):
+        img = decrypt(np.array(src), key, rectangles, mask, scheme=scheme)
+        from .batch import write_atomic
+        write_atomic(dst_path, img)
+        return img
+
+    img = tiled.open_output(dst_path, header.shape, container.SCHEME_PLAIN, dtype=header.dtype,
+                            channel_order=header.channel_order)
+    _copy_rows(src, img)
+    decrypt(img, key, rectangles, mask, scheme=scheme)
+    img.flush()
+    return img
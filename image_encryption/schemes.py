@@ -0,0 +1,9 @@
+"""Names of the versioned pixel scrambling schemes (see :mod:`.permutation`).
+
+Kept free of heavy imports so the GUI can list schemes before NumPy loads.
+"""
+
+SCHEME_SHUFFLE = 'shuffle-v1'
+SCHEME_FEISTEL = 'feistel-v1'
+SCHEMES = (SCHEME_SHUFFLE, SCHEME_FEISTEL)
+DEFAULT_SCHEME = SCHEME_SHUFFLE
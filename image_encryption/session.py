@@ -0,0 +1,161 @@
+"""Session store for computed images under a memory budget.
+
+Results are cached under keys such as ``('encrypt', digest, key, scheme)``.
+A result's own key can stand in for its digest in the keys of work done on
+it (``('decrypt', <encrypt key>, key, scheme)``), so only original inputs
+need hashing. Going back to an earlier key or scheme returns the stored
+array instead of recomputing it. Entries are kept in LRU order. When the
+arrays held in RAM exceed the budget, the least recently used ones are
+written to temp files and replaced by read-only memmaps. Their pages can
+then be dropped by the OS and faulted back in on access. Arrays that are
+already memmaps (for example a loaded container) are stored as they are and
+do not count against the budget.
+
+Digests are BLAKE2b over dtype, shape and pixel bytes. Each array's digest
+is remembered for as long as that array object is alive.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from .instrument import span
+
+# Default budget for arrays held in RAM (1 GiB)
+DEFAULT_BUDGET_BYTES = 1 << 30
+
+# Bytes hashed per update() call
+DIGEST_CHUNK_BYTES = 1 << 24
+
+
+def image_digest(img):
+    """Return a hex BLAKE2b digest of img's dtype, shape and pixel bytes"""
+    img = np.ascontiguousarray(img)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{img.dtype.str}{img.shape}'.encode('ascii'))
+    flat = img.reshape(-1).view(np.uint8)
+    with span('digest', bytes=flat.size):
+        for start in range(0, flat.size, DIGEST_CHUNK_BYTES):
+            digest.update(flat[start:start + DIGEST_CHUNK_BYTES])
+    return digest.hexdigest()
+
+
+class SessionStore:
+    """LRU cache of computed images that spills to memmapped temp files"""
+
+    def __init__(self, max_bytes=DEFAULT_BUDGET_BYTES, spill_dir=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._files = {}
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def digest(self, img):
+        """Return image_digest(img), computed once per live array object"""
+        with self._lock:
+            entry = self._digests.get(id(img))
+        if entry is not None and entry[0]() is img:
+            return entry[1]
+        value = image_digest(img)
+        with self._lock:
+            self._digests[id(img)] = (weakref.ref(img), value)
+            # Forget digests of arrays that have been freed
+            for key in [key for key, (ref, _) in self._digests.items() if ref() is None]:
+                del self._digests[key]
+        return value
+
+    def get(self, key):
+        """Return the array stored under key (possibly a memmap), or None"""
+        with self._lock:
+            arr = self._entries.get(key)
+            if arr is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return arr
+
+    def put(self, key, arr):
+        """Store arr under key and return it, or its memmap if it was spilled at once"""
+        with self._lock:
+            self._discard(key)
+            if not isinstance(arr, np.memmap) and 0 < self.max_bytes < arr.nbytes:
+                # Could never fit: spill it rather than everything else
+                arr = self._spill(key, arr)
+            elif not isinstance(arr, np.memmap):
+                self.memory_bytes += arr.nbytes
+            self._entries[key] = arr
+            self._enforce_budget()
+            return arr
+
+    def get_or_compute(self, key, compute):
+        """Return (array, cached) for key, calling compute() on a miss"""
+        arr = self.get(key)
+        if arr is not None:
+            return arr, True
+        # Computed outside the lock so other lookups are not blocked meanwhile
+        return self.put(key, compute()), False
+
+    def _enforce_budget(self):
+        # Least recently used first
+        for key, arr in list(self._entries.items()):
+            if self.memory_bytes <= self.max_bytes:
+                break
+            if isinstance(arr, np.memmap) or arr.nbytes == 0:
+                continue
+            self._entries[key] = self._spill(key, arr)
+            self.memory_bytes -= arr.nbytes
+
+    def _spill(self, key, arr):
+        fd, path = tempfile.mkstemp(prefix='image-encryption-', suffix='.spill',
+                                    dir=self.spill_dir)
+        os.close(fd)
+        with span('spill', bytes=arr.nbytes):
+            writer = np.memmap(path, dtype=arr.dtype, mode='w+', shape=arr.shape)
+            writer[...] = arr
+            writer.flush()
+            del writer
+        self._files[key] = path
+        self.spilled_bytes += arr.nbytes
+        return np.memmap(path, dtype=arr.dtype, mode='r', shape=arr.shape)
+
+    def _discard(self, key):
+        arr = self._entries.pop(key, None)
+        if arr is None:
+            return
+        path = self._files.pop(key, None)
+        if path is not None:
+            self.spilled_bytes -= arr.nbytes
+            try:
+                # Open memmaps keep their pages on POSIX; Windows may refuse
+                os.remove(path)
+            except OSError:
+                pass
+        elif not isinstance(arr, np.memmap):
+            self.memory_bytes -= arr.nbytes
+
+    def discard(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        """Drop every entry and delete the spill files"""
+        with self._lock:
+            for key in list(self._entries):
+                self._discard(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
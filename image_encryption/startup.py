@@ -0,0 +1,90 @@
+"""Cold-start profiling for the GUI.
+
+The GUI is started in a child interpreter with ``-X importtime``. The child
+prints ``time.monotonic()`` at each milestone (first frame shown,
+dependencies loaded, histogram backend ready). That clock is shared between
+processes, so milestones are measured from the moment the child was spawned
+and include interpreter start-up. The per-module import log is folded into a
+per-package breakdown.
+"""
+
+import json
+import subprocess
+import sys
+import time
+
+# Prefix of the line the probe prints with its own timings
+PROBE_MARKER = 'STARTUP-PROBE '
+
+
+def parse_importtime(text):
+    """Return {top-level package: (self_us, cumulative_us)} from -X importtime output
+
+    A module's cumulative time is counted only where its package is entered
+    from a different package, so nested imports within a package are not
+    counted twice.
+    """
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip().split('.')[0], self_us, cumulative_us))
+
+    packages = {}
+    parents = []
+    # The log lists children before their parent, so walk it backwards
+    for depth, package, self_us, cumulative_us in reversed(entries):
+        del parents[depth:]
+        entered = depth == 0 or parents[-1] != package
+        parents.append(package)
+        self_total, cumulative_total = packages.get(package, (0, 0))
+        packages[package] = (self_total + self_us,
+                             cumulative_total + (cumulative_us if entered else 0))
+    return packages
+
+
+def format_report(packages, milestones, wall_seconds, limit=15):
+    """Render the import breakdown and milestone timings as a text table"""
+    lines = [f"{'package':<28}{'self ms':>10}{'cumulative ms':>16}"]
+    ranked = sorted(packages.items(), key=lambda item: item[1][1], reverse=True)
+    for package, (self_us, cumulative_us) in ranked[:limit]:
+        lines.append(f"{package:<28}{self_us / 1000:>10.1f}{cumulative_us / 1000:>16.1f}")
+    lines.append('')
+    for name, seconds in milestones.items():
+        value = 'n/a' if seconds is None else f"{seconds * 1000:.1f} ms"
+        lines.append(f"{name.replace('_', ' ')}: {value}")
+    lines.append(f"process wall time: {wall_seconds * 1000:.1f} ms")
+    return '\n'.join(lines)
+
+
+def report_milestones(milestones):
+    """Print milestone timestamps for the parent process (called in the probe)"""
+    print(PROBE_MARKER + json.dumps(milestones), flush=True)
+
+
+def run_probe(script, timeout=60):
+    """Run script --startup-probe under -X importtime
+
+    Returns (packages, {milestone: seconds since spawn}, wall seconds).
+    """
+    start = time.monotonic()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', script, '--startup-probe'],
+                               capture_output=True, text=True, timeout=timeout)
+    wall_seconds = time.monotonic() - start
+
+    milestones = {}
+    for line in completed.stdout.splitlines():
+        if line.startswith(PROBE_MARKER):
+            milestones = json.loads(line[len(PROBE_MARKER):])
+    if completed.returncode != 0 and not milestones:
+        raise RuntimeError(f"Startup probe failed:\n{completed.stderr[-2000:]}")
+
+    elapsed = {name: None if stamp is None else stamp - start
+               for name, stamp in milestones.items()}
+    return parse_importtime(completed.stderr), elapsed, wall_seconds
@@ -0,0 +1,174 @@
+"""Out-of-core strip encryption for images too large to hold in memory.
+
+Strip scheme
+------------
+The whole-image scheme needs a permutation over every pixel, which does not
+fit the memory budget of a gigapixel image. The strip scheme instead walks
+the pixels in row-major order and cuts them into consecutive strips of
+``STRIP_PIXELS`` pixels (the last strip may be shorter). Every strip is
+XORed with the key and its pixels are shuffled among themselves with a
+legacy ``RandomState`` seeded by ``[key, strip_index]``. Key 0 is the
+identity, as in the whole-image scheme.
+
+Pixels are ciphered as their raw bytes, so uint8 and uint16 images (the
+dtypes containers hold) both work; for uint16 both bytes of every sample
+are XORed with the key, as in the whole-image scheme.
+
+Strip boundaries depend only on the pixel count, never on the image width or
+the memory budget, so files can be decrypted on a machine with a different
+budget. Strip and whole-image ciphertexts are not interchangeable; the
+container format records strip ciphertexts as scheme ``strip-v1``.
+
+Sources are read through ``np.load(mmap_mode='r')`` (``.npy``),
+:mod:`.container` files or ``np.memmap`` (raw files with a known shape), and
+results are written into a ``.npy`` or container memmap, so peak memory is
+bounded by the tile budget rather than by the image size. Other image
+formats have to be decoded whole by OpenCV before streaming starts.
+"""
+
+import numpy as np
+
+from . import cipher, container
+from .permutation import index_dtype
+
+SCHEME_STRIP = 'strip-v1'
+
+# Pixels per independently scrambled strip (part of the scheme, do not change)
+STRIP_PIXELS = 1 << 20
+
+# Default working memory for one block of strips (64 MiB)
+DEFAULT_TILE_BYTES = 64 * 1024 * 1024
+
+# Sample types the strip scheme accepts
+DTYPES = (np.dtype(np.uint8), np.dtype(np.uint16))
+
+
+def strip_indices(key, strip_index, strip_pixels):
+    """Return the scrambling permutation of one strip"""
+    indices = np.arange(strip_pixels, dtype=index_dtype(strip_pixels))
+    np.random.RandomState([key, strip_index]).shuffle(indices)
+    return indices
+
+
+def strips_per_block(pixel_bytes, tile_bytes=DEFAULT_TILE_BYTES):
+    """Return how many strips fit in tile_bytes of working memory (at least one)"""
+    # One strip each of input, output and permutation indices
+    strip_bytes = STRIP_PIXELS * (2 * pixel_bytes + index_dtype(STRIP_PIXELS).itemsize)
+    return max(1, tile_bytes // strip_bytes)
+
+
+def open_source(path, shape=None):
+    """Open path read-only without loading it when possible
+
+    ``.npy`` and container files are memory-mapped, raw files are
+    memory-mapped with the given (H, W[, C]) shape and anything else is
+    decoded by OpenCV as stored (native channel order and bit depth).
+    """
+    if shape is not None:
+        return np.memmap(path, dtype=np.uint8, mode='r', shape=tuple(shape))
+    if path.lower().endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    if path.lower().endswith(container.EXTENSION):
+        return container.load(path)[1]
+
+    from .loader import read_image
+    return read_image(path)[0]
+
+
+def open_output(path, shape, scheme=SCHEME_STRIP, dtype=np.uint8, channel_order=''):
+    """Create a ``.npy`` or container memmap of shape and dtype at path
+
+    Channel order is unknown for .npy/raw sources, so it defaults to empty.
+    """
+    if path.lower().endswith(container.EXTENSION):
+        header = container.ContainerHeader(scheme, shape, dtype, channel_order=channel_order)
+        return container.create(path, header)
+    return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+
+
+def _process(src, out, key, tile_bytes, decrypting, progress):
+    if src.dtype not in DTYPES or src.ndim < 2:
+        raise ValueError(f"Expected a uint8 or uint16 image of shape (H, W[, C]), "
+                         f"got {src.dtype} {src.shape}")
+    if out.shape != src.shape or out.dtype != src.dtype:
+        raise ValueError(f"out must be a {src.dtype} array of shape {src.shape}")
+    key = cipher.validate_key(key)
+
+    total_pixels = src.shape[0] * src.shape[1]
+    if total_pixels == 0:
+        return out
+    # Raw bytes of each pixel, whatever the dtype
+    src_flat = src.reshape(total_pixels, -1).view(np.uint8)
+    out_flat = out.reshape(total_pixels, -1).view(np.uint8)
+    pixel_bytes = src_flat.shape[1]
+
+    block_pixels = strips_per_block(pixel_bytes, tile_bytes) * STRIP_PIXELS
+    kernel = cipher.unscramble if decrypting else cipher.scramble
+    block_in = np.empty((min(block_pixels, total_pixels), pixel_bytes), dtype=np.uint8)
+    block_out = np.empty_like(block_in)
+
+    for block_start in range(0, total_pixels, block_pixels):
+        block_stop = min(block_start + block_pixels, total_pixels)
+        count = block_stop - block_start
+        # Pull one block of strips through the page cache into RAM
+        np.copyto(block_in[:count], src_flat[block_start:block_stop])
+
+        for strip_start in range(0, count, STRIP_PIXELS):
+            strip_stop = min(strip_start + STRIP_PIXELS, count)
+            strip_shape = (strip_stop - strip_start, 1, pixel_bytes)
+            strip_in = block_in[strip_start:strip_stop].reshape(strip_shape)
+            strip_out = block_out[strip_start:strip_stop].reshape(strip_shape)
+            if key == 0:
+                np.copyto(strip_out, strip_in)
+            else:
+                strip_index = (block_start + strip_start) // STRIP_PIXELS
+                indices = strip_indices(key, strip_index, strip_shape[0])
+                kernel(strip_in, key, indices, strip_out)
+
+        out_flat[block_start:block_stop] = block_out[:count]
+        if progress is not None:
+            progress(block_stop, total_pixels)
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+def encrypt_strips(src, out, key, tile_bytes=DEFAULT_TILE_BYTES, progress=None):
+    """Encrypt src into out with the strip scheme, one block at a time
+
+    src and out may be memmaps. progress, if given, is called as
+    progress(pixels_done, total_pixels) after each block.
+    """
+    return _process(src, out, key, tile_bytes, False, progress)
+
+
+def decrypt_strips(src, out, key, tile_bytes=DEFAULT_TILE_BYTES, progress=None):
+    """Inverse of encrypt_strips()"""
+    return _process(src, out, key, tile_bytes, True, progress)
+
+
+def encrypt_file(src_path, dst_path, key, tile_bytes=DEFAULT_TILE_BYTES, shape=None,
+                 progress=None):
+    """Stream src_path into a ``.npy`` or container file at dst_path with the strip scheme"""
+    src = open_source(src_path, shape)
+    out = open_output(dst_path, src.shape, SCHEME_STRIP, dtype=src.dtype)
+    return encrypt_strips(src, out, key, tile_bytes, progress)
+
+
+def decrypt_file(src_path, dst_path, key, tile_bytes=DEFAULT_TILE_BYTES, shape=None,
+                 progress=None):
+    """Stream a strip-encrypted src_path into a ``.npy`` or container file at dst_path
+
+    A container must hold the strip scheme and, if it has a key check
+    value, match key; ``.npy`` and raw inputs cannot be checked.
+    """
+    if shape is None and src_path.lower().endswith(container.EXTENSION):
+        header = container.read_header(src_path)
+        if header.scheme != SCHEME_STRIP:
+            raise ValueError(f"{src_path} is not a {SCHEME_STRIP} container ({header.scheme})")
+        if container.check_key(header, key) is False:
+            raise ValueError("Wrong key (key check value does not match)")
+    src = open_source(src_path, shape)
+    out = open_output(dst_path, src.shape, container.SCHEME_PLAIN, dtype=src.dtype)
+    return decrypt_strips(src, out, key, tile_bytes, progress)
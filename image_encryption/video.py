@@ -0,0 +1,238 @@
+"""Streaming encryption of videos and multi-frame images.
+
+Frames run through three overlapping stages: decode on a reader thread,
+cipher on a small thread pool, and encode on the calling thread. They are
+connected by a bounded queue of futures, which keeps frames in order and
+stalls the reader when encoding falls behind. OpenCV and NumPy release the
+GIL in decode, encode, gather and XOR, so the stages really do overlap.
+
+Every frame of a stream has the same size, so the scrambling permutation is
+looked up once per ``(key, frame size)`` and reused for every frame.
+
+The ciphertext has to survive the container bit for bit. Videos are
+therefore written with a lossless codec (FFV1 in ``.mkv`` by default), and
+multi-frame stills (animated GIF, multi-page TIFF) are written as
+multi-page TIFF, one page at a time as frames complete. Audio tracks are
+not copied.
+"""
+
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from . import cipher
+from .permutation import get_indices
+from .schemes import DEFAULT_SCHEME
+
+DEFAULT_FOURCC = 'FFV1'
+MULTI_FRAME_EXTENSIONS = ('.gif', '.tif', '.tiff')
+
+_END = object()
+
+
+class StreamResult:
+    """Totals for one processed stream"""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+
+    @property
+    def frames_per_second(self):
+        return self.frames / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        megabytes_per_second = self.bytes / self.elapsed / 1e6 if self.elapsed else 0.0
+        return (f"{self.frames} frame(s) in {self.elapsed:.2f}s "
+                f"({self.frames_per_second:.1f} fps, {megabytes_per_second:.1f} MB/s)")
+
+
+class FrameCipher:
+    """Encrypts or decrypts frames, fetching the permutation once per frame size"""
+
+    def __init__(self, mode, key, scheme=DEFAULT_SCHEME):
+        if mode not in ('encrypt', 'decrypt'):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.key = cipher.validate_key(key)
+        self.scheme = scheme
+        self._kernel = cipher.scramble if mode == 'encrypt' else cipher.unscramble
+        self._indices = {}
+        self._lock = threading.Lock()
+
+    def _indices_for(self, total_pixels):
+        with self._lock:
+            indices = self._indices.get(total_pixels)
+            if indices is None:
+                indices = self._indices[total_pixels] = get_indices(
+                    self.key, total_pixels, self.scheme)
+            return indices
+
+    def __call__(self, frame):
+        frame = np.ascontiguousarray(frame)
+        if frame.dtype != np.uint8:
+            raise ValueError(f"Expected uint8 frames, got {frame.dtype}")
+        out = np.empty_like(frame)
+        if self.key == 0:
+            np.copyto(out, frame)
+            return out
+        indices = self._indices_for(frame.shape[0] * frame.shape[1])
+        return self._kernel(frame, self.key, indices, out)
+
+
+def run_pipeline(frames, transform, sink, workers=2, queue_size=8, progress=None):
+    """Decode frames on a reader thread, transform on a pool, sink in order
+
+    frames is an iterable of arrays (consumed on the reader thread),
+    transform maps a frame to its result and sink(result) is called on the
+    calling thread in input order. Returns a StreamResult.
+    """
+    result = StreamResult()
+    pending = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    reader_error = []
+
+    def read(executor):
+        try:
+            for frame in frames:
+                if stop.is_set():
+                    break
+                pending.put((frame.nbytes, executor.submit(transform, frame)))
+        except Exception as e:
+            reader_error.append(e)
+        finally:
+            pending.put(_END)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='frame-cipher') as executor:
+        reader = threading.Thread(target=read, args=(executor,), daemon=True)
+        reader.start()
+        try:
+            while True:
+                item = pending.get()
+                if item is _END:
+                    break
+                nbytes, future = item
+                sink(future.result())
+                result.frames += 1
+                result.bytes += nbytes
+                if progress is not None:
+                    progress(result.frames)
+        finally:
+            stop.set()
+            # Unblock the reader if it is waiting on a full queue
+            while reader.is_alive():
+                try:
+                    pending.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            reader.join()
+
+    if reader_error:
+        raise reader_error[0]
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _read_video(capture):
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            yield frame
+    finally:
+        capture.release()
+
+
+def process_video(mode, key, src_path, dst_path, scheme=DEFAULT_SCHEME, fourcc=DEFAULT_FOURCC,
+                  workers=2, queue_size=8, progress=None):
+    """Encrypt or decrypt every frame of a video into a losslessly encoded video"""
+    capture = cv2.VideoCapture(src_path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {src_path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    writer = cv2.VideoWriter(dst_path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+    if not writer.isOpened():
+        capture.release()
+        raise ValueError(f"Could not open {dst_path} for writing with codec {fourcc}")
+    try:
+        return run_pipeline(_read_video(capture), FrameCipher(mode, key, scheme), writer.write,
+                            workers, queue_size, progress)
+    finally:
+        writer.release()
+
+
+def _read_pages(src_path, batch):
+    """Yield the frames of a multi-frame image, decoding batch pages at a time"""
+    if src_path.lower().endswith('.gif'):
+        # GIF frames are drawn over the previous ones, so decode them in sequence
+        capture = cv2.VideoCapture(src_path)
+        if not capture.isOpened():
+            raise ValueError(f"Could not load frames from: {src_path}")
+        yield from _read_video(capture)
+        return
+    count = cv2.imcount(src_path)
+    if count == 0:
+        raise ValueError(f"Could not load frames from: {src_path}")
+    for start in range(0, count, batch):
+        ok, pages = cv2.imreadmulti(src_path, start=start, count=min(batch, count - start),
+                                    flags=cv2.IMREAD_COLOR)
+        if not ok:
+            raise ValueError(f"Could not load frames {start}+ from: {src_path}")
+        yield from pages
+
+
+class _TiffPageWriter:
+    """Appends frames to a multi-page TIFF one page at a time"""
+
+    def __init__(self, path):
+        from PIL import TiffImagePlugin
+        self._file = TiffImagePlugin.AppendingTiffWriter(path, new=True)
+
+    def write(self, frame):
+        ok, page = cv2.imencode('.tiff', frame)
+        if not ok:
+            raise ValueError(f"Could not encode a {frame.shape} frame as TIFF")
+        self._file.write(page.tobytes())
+        self._file.newFrame()
+
+    def close(self):
+        self._file.close()
+
+
+def process_frames(mode, key, src_path, dst_path, scheme=DEFAULT_SCHEME, workers=2,
+                   queue_size=8, progress=None):
+    """Encrypt or decrypt every page/frame of a multi-frame image into a multi-page TIFF
+
+    Pages are decoded queue_size at a time and each result is appended to
+    dst_path as soon as it is ready, so memory does not grow with the
+    number of pages.
+    """
+    pages = _read_pages(src_path, queue_size)
+    # Fail on an unreadable source before creating the output
+    first = next(pages, None)
+    if first is None:
+        raise ValueError(f"Could not load frames from: {src_path}")
+    writer = _TiffPageWriter(dst_path)
+    try:
+        return run_pipeline(itertools.chain([first], pages), FrameCipher(mode, key, scheme),
+                            writer.write, workers, queue_size, progress)
+    finally:
+        writer.close()
+
+
+def process(mode, key, src_path, dst_path, **options):
+    """Dispatch to process_frames() for multi-frame stills, else process_video()"""
+    if src_path.lower().endswith(MULTI_FRAME_EXTENSIONS):
+        options.pop('fourcc', None)
+        return process_frames(mode, key, src_path, dst_path, **options)
+    return process_video(mode, key, src_path, dst_path, **options)
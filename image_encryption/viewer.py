@@ -0,0 +1,251 @@
+"""Tiled zoom-and-pan rendering of large images.
+
+A View maps an image onto a canvas: a zoom factor (display pixels per image
+pixel) and the image point at the canvas centre. The display is cut into
+``TILE_SIZE`` squares, and only the tiles that intersect the canvas are
+rendered. A tile is cut from the pyramid level closest above the zoom, so a
+zoomed-out view of a 100 MP image never touches level 0. Each tile is then
+scaled by at most 2x and converted to 8-bit RGB. Zooming in past 1:1 uses
+nearest-neighbour scaling so individual pixels stay sharp.
+
+TileRenderer keeps an LRU cache of converted tiles (for example Tk
+PhotoImages), so panning back over a region does not render it again.
+Nothing here depends on Tk.
+"""
+
+import math
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from . import loader
+from .instrument import span
+
+# Edge of one display tile in canvas pixels
+TILE_SIZE = 256
+
+# Zoom changes by this factor per wheel step
+ZOOM_STEP = 2 ** 0.25
+
+# Largest zoom (display pixels per image pixel)
+MAX_ZOOM = 32.0
+
+# Converted tiles kept per renderer
+MAX_TILES = 256
+
+
+class View:
+    """Zoom and centre of one image shown on a canvas"""
+
+    def __init__(self, image_width, image_height, canvas_width=1, canvas_height=1):
+        self.image_width = image_width
+        self.image_height = image_height
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.zoom = 1.0
+        self.center_x = image_width / 2
+        self.center_y = image_height / 2
+        self.fitted = True
+        self.fit()
+
+    @property
+    def fit_zoom(self):
+        """Zoom at which the whole image fits the canvas, at most 1"""
+        return min(self.canvas_width / self.image_width,
+                   self.canvas_height / self.image_height, 1.0)
+
+    @property
+    def display_size(self):
+        """(width, height) of the whole image at the current zoom"""
+        return (max(1, round(self.image_width * self.zoom)),
+                max(1, round(self.image_height * self.zoom)))
+
+    def fit(self):
+        """Show the whole image, centred"""
+        self.zoom = self.fit_zoom
+        self.center_x = self.image_width / 2
+        self.center_y = self.image_height / 2
+        self.fitted = True
+
+    def resize_canvas(self, width, height):
+        self.canvas_width = max(1, width)
+        self.canvas_height = max(1, height)
+        if self.fitted:
+            self.fit()
+        else:
+            self._clamp()
+
+    def resize_image(self, width, height):
+        """Keep showing the same region after the image is replaced by a rescaled one"""
+        scale = width / self.image_width
+        self.image_width, self.image_height = width, height
+        if self.fitted:
+            self.fit()
+            return
+        self.zoom = min(self.zoom / scale, MAX_ZOOM)
+        self.center_x *= scale
+        self.center_y *= scale
+        self._clamp()
+
+    def origin(self):
+        """Return the display coordinates of the canvas's top-left corner"""
+        width, height = self.display_size
+        # An image smaller than the canvas is centred in it
+        x = (width - self.canvas_width) / 2 if width <= self.canvas_width else \
+            self.center_x * self.zoom - self.canvas_width / 2
+        y = (height - self.canvas_height) / 2 if height <= self.canvas_height else \
+            self.center_y * self.zoom - self.canvas_height / 2
+        return round(x), round(y)
+
+    def to_image(self, canvas_x, canvas_y):
+        """Return the image coordinates under a canvas point"""
+        x, y = self.origin()
+        return (canvas_x + x) / self.zoom, (canvas_y + y) / self.zoom
+
+    def zoom_at(self, factor, canvas_x, canvas_y):
+        """Multiply the zoom by factor, keeping the image point under the cursor fixed"""
+        image_x, image_y = self.to_image(canvas_x, canvas_y)
+        zoom = min(max(self.zoom * factor, self.fit_zoom), MAX_ZOOM)
+        if zoom == self.zoom:
+            return False
+        self.zoom = zoom
+        self.center_x = image_x - (canvas_x - self.canvas_width / 2) / zoom
+        self.center_y = image_y - (canvas_y - self.canvas_height / 2) / zoom
+        self.fitted = False
+        self._clamp()
+        return True
+
+    def pan(self, dx, dy):
+        """Move the image by (dx, dy) canvas pixels"""
+        self.center_x -= dx / self.zoom
+        self.center_y -= dy / self.zoom
+        self.fitted = False
+        self._clamp()
+
+    def scroll_fractions(self):
+        """Return ((first, last) horizontally, (first, last) vertically) for scrollbars"""
+        width, height = self.display_size
+        x, y = self.origin()
+        return ((max(0.0, x / width), min(1.0, (x + self.canvas_width) / width)),
+                (max(0.0, y / height), min(1.0, (y + self.canvas_height) / height)))
+
+    def moveto(self, axis, fraction):
+        """Scroll so the canvas starts at fraction of the display along axis 'x' or 'y'"""
+        if axis == 'x':
+            self.center_x = fraction * self.image_width + self.canvas_width / 2 / self.zoom
+        else:
+            self.center_y = fraction * self.image_height + self.canvas_height / 2 / self.zoom
+        self.fitted = False
+        self._clamp()
+
+    def match(self, other):
+        """Show the same relative region and scale as other (a view of another image)"""
+        scale = self.image_width / other.image_width
+        self.zoom = min(other.zoom / scale, MAX_ZOOM)
+        self.center_x = other.center_x * scale
+        self.center_y = other.center_y * self.image_height / other.image_height
+        self.fitted = other.fitted
+        if self.fitted:
+            self.fit()
+        else:
+            self._clamp()
+
+    def _clamp(self):
+        # Keep the canvas inside the image wherever the image is larger than it
+        for axis, size, canvas in (('center_x', self.image_width, self.canvas_width),
+                                   ('center_y', self.image_height, self.canvas_height)):
+            half = canvas / 2 / self.zoom
+            value = getattr(self, axis)
+            if half * 2 >= size:
+                value = size / 2
+            else:
+                value = min(max(value, half), size - half)
+            setattr(self, axis, value)
+
+    def visible_tiles(self):
+        """Return [(column, row, canvas_x, canvas_y)] of the tiles intersecting the canvas"""
+        width, height = self.display_size
+        x, y = self.origin()
+        first_column, first_row = max(0, x) // TILE_SIZE, max(0, y) // TILE_SIZE
+        last_column = (min(width, x + self.canvas_width) - 1) // TILE_SIZE
+        last_row = (min(height, y + self.canvas_height) - 1) // TILE_SIZE
+        return [(column, row, column * TILE_SIZE - x, row * TILE_SIZE - y)
+                for row in range(first_row, last_row + 1)
+                for column in range(first_column, last_column + 1)]
+
+
+def level_for_zoom(zoom):
+    """Return the pyramid level to cut tiles from at zoom (level i is 2**i smaller)"""
+    if zoom >= 1.0:
+        return 0
+    return max(0, int(math.floor(math.log2(1.0 / zoom) + 1e-9)))
+
+
+def render_tile(pyramid, zoom, column, row):
+    """Return tile (column, row) of the image displayed at zoom, in the image's own order
+
+    Tiles on the right and bottom edges are cut to the image.
+    """
+    height, width = pyramid.image.shape[:2]
+    display_width = max(1, round(width * zoom))
+    display_height = max(1, round(height * zoom))
+    x0, y0 = column * TILE_SIZE, row * TILE_SIZE
+    tile_width = min(TILE_SIZE, display_width - x0)
+    tile_height = min(TILE_SIZE, display_height - y0)
+
+    source = pyramid.level(level_for_zoom(zoom))
+    # Scale from the level to the display (at most 2x down when zoomed out)
+    scale_x = display_width / source.shape[1]
+    scale_y = display_height / source.shape[0]
+    # Only the source region under this tile, plus a pixel of margin
+    left = max(0, int(x0 / scale_x) - 1)
+    top = max(0, int(y0 / scale_y) - 1)
+    right = min(source.shape[1], int(math.ceil((x0 + tile_width) / scale_x)) + 1)
+    bottom = min(source.shape[0], int(math.ceil((y0 + tile_height) / scale_y)) + 1)
+    crop = np.ascontiguousarray(source[top:bottom, left:right])
+
+    matrix = np.array([[scale_x, 0, left * scale_x - x0],
+                       [0, scale_y, top * scale_y - y0]], dtype=np.float64)
+    interpolation = cv2.INTER_NEAREST if zoom >= 1.0 else cv2.INTER_LINEAR
+    return cv2.warpAffine(crop, matrix, (tile_width, tile_height), flags=interpolation,
+                          borderMode=cv2.BORDER_REPLICATE)
+
+
+class TileRenderer:
+    """Renders and caches display tiles of one pyramid
+
+    convert turns an 8-bit RGB(A) or grayscale tile into whatever the caller
+    draws (for example an ImageTk.PhotoImage); by default tiles are cached as
+    arrays.
+    """
+
+    def __init__(self, pyramid, channel_order='', convert=None, max_tiles=MAX_TILES):
+        self.pyramid = pyramid
+        self.channel_order = channel_order
+        self.convert = convert
+        self.max_tiles = max_tiles
+        self.hits = 0
+        self.misses = 0
+        self._tiles = OrderedDict()
+
+    def tile(self, zoom, column, row):
+        key = (zoom, column, row)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+        self.misses += 1
+        with span('render_tile', level=level_for_zoom(zoom)):
+            tile = loader.to_display(render_tile(self.pyramid, zoom, column, row),
+                                     self.channel_order)
+            if self.convert is not None:
+                tile = self.convert(tile)
+        self._tiles[key] = tile
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def clear(self):
+        self._tiles.clear()
@@ -0,0 +1,307 @@
+"""Watch a directory and encrypt (or decrypt) images as they arrive.
+
+An asyncio loop polls the input tree every ``POLL_INTERVAL`` seconds (one
+``os.walk`` plus a ``stat`` per file, run off the loop thread; all
+bookkeeping stays on the loop thread). A file
+is only taken once its size and modification time are unchanged across two
+scans and it has not been modified for ``SETTLE_SECONDS``, so files that
+are still being copied in are left alone. Files whose output already exists
+and is newer are skipped, which makes restarts cheap.
+
+Ready files go into a bounded queue. When it is full, the scanner waits on
+it, so a burst of arrivals never piles up in memory. They are picked up by
+later scans instead. ``workers`` consumers each hand one file at a time to
+a process pool running :func:`.batch.process_file` (decode, cipher, atomic
+write), exactly like the batch command.
+
+Counters (queue depth, files in flight, files/s over the last minute and
+the p95 latency from a file becoming ready to its output being written)
+are logged every ``STATUS_INTERVAL`` seconds and, with ``status_port``,
+served as JSON on ``http://127.0.0.1:<port>/``.
+"""
+
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from . import batch, cipher
+from .schemes import DEFAULT_SCHEME, SCHEMES
+
+# Seconds between scans of the input tree
+POLL_INTERVAL = 0.5
+
+# A file must be unmodified for this long before it is taken
+SETTLE_SECONDS = 1.0
+
+# Ready files waiting for a worker before the scanner blocks
+DEFAULT_QUEUE_SIZE = 64
+
+# Seconds between status log lines
+STATUS_INTERVAL = 5.0
+
+# Seconds of completed files files/s is averaged over
+RATE_WINDOW = 60.0
+
+# Most recent latencies the p95 is taken from
+LATENCY_WINDOW = 1000
+
+
+class WatchStats:
+    """Live counters of one watch run"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.files = 0
+        self.bytes = 0
+        self.failures = []
+        self._finished = deque()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, latency, nbytes=None, failure=None):
+        now = time.monotonic()
+        if failure is None:
+            self.files += 1
+            self.bytes += nbytes
+        else:
+            self.failures.append(failure)
+        self._finished.append(now)
+        self._latencies.append(latency)
+
+    @property
+    def files_per_second(self):
+        now = time.monotonic()
+        while self._finished and self._finished[0] < now - RATE_WINDOW:
+            self._finished.popleft()
+        window = min(RATE_WINDOW, now - self.started)
+        return len(self._finished) / window if window > 0 else 0.0
+
+    @property
+    def p95_latency(self):
+        """95th percentile of ready-to-written seconds, or None before the first file"""
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def snapshot(self):
+        return {
+            'queue_depth': self.queue_depth,
+            'in_flight': self.in_flight,
+            'files': self.files,
+            'failed': len(self.failures),
+            'megabytes': round(self.bytes / 1e6, 3),
+            'files_per_second': round(self.files_per_second, 3),
+            'p95_latency_ms': None if self.p95_latency is None else round(self.p95_latency * 1e3, 1),
+            'uptime_s': round(time.monotonic() - self.started, 1),
+        }
+
+    def summary(self):
+        p95 = self.p95_latency
+        return (f"queue {self.queue_depth}, in flight {self.in_flight}, {self.files} done, "
+                f"{len(self.failures)} failed, {self.files_per_second:.2f} files/s, "
+                f"p95 {'-' if p95 is None else f'{p95 * 1e3:.0f} ms'}")
+
+
+def _inside(path, directory):
+    path, directory = os.path.abspath(path), os.path.abspath(directory)
+    return os.path.commonpath([path, directory]) == directory
+
+
+def _signature(path):
+    """Return (size, mtime_ns) of path, or None if it vanished"""
+    try:
+        status = os.stat(path)
+    except OSError:
+        return None
+    return status.st_size, status.st_mtime_ns
+
+
+def _is_current(src_signature, dst_path):
+    """True if dst_path exists and is at least as new as the source"""
+    dst_signature = _signature(dst_path)
+    return dst_signature is not None and dst_signature[1] >= src_signature[1]
+
+
+class Watcher:
+    """Scans input_dir and feeds settled images to the process pool"""
+
+    def __init__(self, mode, key, input_dir, output_dir, scheme=DEFAULT_SCHEME, workers=None,
+                 queue_size=DEFAULT_QUEUE_SIZE, poll_interval=POLL_INTERVAL,
+                 settle=SETTLE_SECONDS):
+        if mode not in ('encrypt', 'decrypt'):
+            raise ValueError(f"Unknown mode: {mode}")
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown scrambling scheme: {scheme}")
+        if not os.path.isdir(input_dir):
+            raise ValueError(f"Not a directory: {input_dir}")
+        self.mode = mode
+        self.key = cipher.validate_key(key)
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.scheme = scheme
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.settle = settle
+        self.stats = WatchStats()
+        # path -> signature at the previous scan, queued, or handled
+        self._seen = {}
+        self._queued = set()
+        self._handled = {}
+
+    def list_files(self):
+        """Return [(path, signature)] of the images under input_dir; runs off the loop thread
+
+        Only touches the file system, never the watcher's bookkeeping.
+        """
+        files = []
+        for path in batch.find_images(self.input_dir):
+            if _inside(path, self.output_dir):
+                continue
+            signature = _signature(path)
+            if signature is not None:
+                files.append((path, signature))
+        return files
+
+    def scan(self, files):
+        """Return (ready paths, whether any file is still settling) for a list_files() result
+
+        Runs on the loop thread, like the consumers that update the same tables.
+        """
+        ready = []
+        settling = False
+        now = time.time_ns()
+        for path, signature in files:
+            if path in self._queued or self._handled.get(path) == signature:
+                continue
+            previous, self._seen[path] = self._seen.get(path), signature
+            if previous != signature or now - signature[1] < self.settle * 1e9:
+                settling = True
+                continue
+            del self._seen[path]
+            if _is_current(signature, self._output_for(path)):
+                self._handled[path] = signature
+                continue
+            ready.append((path, signature))
+        # Forget files that were removed, so they count as new if they return
+        present = {path for path, _ in files}
+        for table in (self._seen, self._handled):
+            for path in [path for path in table if path not in present]:
+                del table[path]
+        return ready, settling
+
+    def _output_for(self, path):
+        return batch.output_path_for(path, self.input_dir, self.output_dir)
+
+    async def _scan_loop(self, queue, once):
+        loop = asyncio.get_running_loop()
+        while True:
+            files = await loop.run_in_executor(None, self.list_files)
+            ready, settling = self.scan(files)
+            for path, signature in ready:
+                self._queued.add(path)
+                # Blocks while the queue is full: this is the backpressure
+                await queue.put((path, signature, time.monotonic()))
+                self.stats.queue_depth = queue.qsize()
+            if once and not ready and not settling:
+                await queue.join()
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    async def _consume(self, queue, pool):
+        loop = asyncio.get_running_loop()
+        while True:
+            path, signature, ready_at = await queue.get()
+            self.stats.queue_depth = queue.qsize()
+            self.stats.in_flight += 1
+            try:
+                nbytes = await loop.run_in_executor(
+                    pool, batch.process_file, self.mode, self.key, path,
+                    self._output_for(path), self.scheme)
+                self.stats.record(time.monotonic() - ready_at, nbytes)
+            except Exception as e:
+                self.stats.record(time.monotonic() - ready_at, failure=(path, str(e)))
+                print(f"FAILED {path}: {e}", file=sys.stderr)
+            finally:
+                # Not retried until the file changes
+                self._handled[path] = signature
+                self._queued.discard(path)
+                self.stats.in_flight -= 1
+                queue.task_done()
+
+    async def _report(self, interval, log):
+        while True:
+            await asyncio.sleep(interval)
+            log(self.stats.summary())
+
+    async def _serve_status(self, reader, writer):
+        try:
+            await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        body = json.dumps(self.stats.snapshot()).encode()
+        writer.write(b'HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n'
+                     b'Content-Length: %d\r\n\r\n' % len(body) + body)
+        await writer.drain()
+        writer.close()
+
+    async def run(self, once=False, status_port=None, status_interval=STATUS_INTERVAL,
+                  log=None, stop=None):
+        """Process files until stop (an asyncio.Event) is set, or with once=True until idle
+
+        Files still queued when stopping are left for the next run; files
+        being processed are finished first.
+        """
+        log = log or (lambda line: print(line, file=sys.stderr, flush=True))
+        stop = stop or asyncio.Event()
+        queue = asyncio.Queue(self.queue_size)
+        server = None
+        if status_port is not None:
+            server = await asyncio.start_server(self._serve_status, '127.0.0.1', status_port)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            scanner = asyncio.ensure_future(self._scan_loop(queue, once))
+            helpers = [asyncio.ensure_future(self._consume(queue, pool))
+                       for _ in range(self.workers)]
+            if status_interval:
+                helpers.append(asyncio.ensure_future(self._report(status_interval, log)))
+            stopped = asyncio.ensure_future(stop.wait())
+            try:
+                await asyncio.wait([scanner, stopped], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in [scanner, stopped] + helpers:
+                    task.cancel()
+                await asyncio.gather(scanner, stopped, *helpers, return_exceptions=True)
+                if server is not None:
+                    server.close()
+                    await server.wait_closed()
+            if scanner.done() and not scanner.cancelled() and scanner.exception():
+                raise scanner.exception()
+        log(self.stats.summary())
+        return self.stats
+
+
+def watch(mode, key, input_dir, output_dir, once=False, status_port=None,
+          status_interval=STATUS_INTERVAL, **options):
+    """Run a Watcher until SIGINT/SIGTERM (or, with once=True, until idle) and return its stats"""
+    watcher = Watcher(mode, key, input_dir, output_dir, **options)
+
+    async def main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+        return await watcher.run(once=once, status_port=status_port,
+                                 status_interval=status_interval, stop=stop)
+
+    return asyncio.run(main())
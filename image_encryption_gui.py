@@ -1,14 +1,56 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import cv2
+import argparse
 import os
+import sys
+import threading
+import time
+
+from image_encryption import instrument
+from image_encryption.instrument import span
+from image_encryption.jobs import JobRunner
+from image_encryption.schemes import DEFAULT_SCHEME, SCHEMES
+
+# Heavy dependencies are bound by load_dependencies() once the window is up;
+# matplotlib is imported only when histograms are first drawn
+np = cv2 = Image = ImageTk = None
+HistogramCache = PyramidCache = SessionStore = TileRenderer = View = None
+container = loader = viewer = progressive = roi = cipher = None
+_dependencies_lock = threading.Lock()
+
+def load_dependencies():
+    """Import NumPy, OpenCV, PIL and the cipher package on first use"""
+    global np, cv2, Image, ImageTk, HistogramCache, PyramidCache, SessionStore, TileRenderer, View
+    global container, loader, viewer, progressive, roi, cipher
+    with _dependencies_lock:
+        if cipher is not None:
+            return
+        import numpy as np
+        import cv2
+        from PIL import Image, ImageTk
+        from image_encryption.histogram import HistogramCache
+        from image_encryption.preview import PyramidCache
+        from image_encryption.session import SessionStore
+        from image_encryption.viewer import TileRenderer, View
+        from image_encryption import container, loader, viewer, progressive, roi
+        # Bound last: a non-None cipher means everything above is ready
+        from image_encryption import cipher
+
+# Line colours and legend labels for histogram channels in RGB order
+HISTOGRAM_COLORS = ['#e74c3c', '#27ae60', '#3498db']
+HISTOGRAM_LABELS = ['Red', 'Green', 'Blue']
+
+# Random adjacent pairs per direction behind the correlation shown with each histogram
+METRICS_SAMPLE = 100000
+
+# Quiet period after the last <Configure> event before panes are re-rendered
+RESIZE_DEBOUNCE_MS = 150
+
+# How often the stage timing panel checks for new spans
+TRACE_REFRESH_MS = 1000
 
 class ImageEncryptionTool:
-    def __init__(self, root):
+    def __init__(self, root, memory_budget=None):
         self.root = root
         self.root.title("Image Encryption Tool - Pixel Manipulation")
         
@@ -34,10 +76,13 @@ class ImageEncryptionTool:
         self.root.bind('<F11>', lambda e: self.toggle_fullscreen())
         
         # Initialize variables
+        self.original_source = None
         self.original_image = None
         self.encrypted_image = None
         self.decrypted_image = None
         self.current_key = None
+        self.current_scheme = None
+        self.encrypted_header = None
         self.fullscreen = True
         
         # Initialize button references
@@ -45,6 +90,47 @@ class ImageEncryptionTool:
         self.decrypt_btn = None
         self.histogram_btn = None
         
+        # Images stay in their native channel order; this maps each pane to it
+        self.channel_orders = {}
+        
+        # Downscale pyramids for display, and pending debounced resize
+        self.pyramids = None
+        self.resize_after_id = None
+        
+        # Zoom/pan state and cached display tiles per pane; with sync on,
+        # every pane shows the same region as the one last moved
+        self.views = {}
+        self.tile_renderers = {}
+        self.pending_renders = set()
+        self.drag_start = None
+        
+        # Rectangles marked on the original with Shift+drag, in full-resolution
+        # pixels; when there are any, only they are encrypted. The regions of
+        # the current ciphertext are kept as (rectangles, mask), or None
+        self.roi_rectangles = []
+        self.roi_drag = None
+        self.encrypted_regions = None
+        
+        # Panes showing a display-resolution preview while the full result is
+        # computed, with the channel order of what they showed before
+        self.preview_panes = {}
+        
+        # Histograms are cached per image and drawn into one persistent figure
+        self.histogram_cache = None
+        self.histogram_figure = None
+        
+        # Computed results by (operation, where its input came from, key, scheme),
+        # kept within memory_budget bytes of RAM and spilled to temp files beyond
+        # that. Only the uploaded original is hashed; a ciphertext is identified
+        # by the encrypt key that produced it or by the file it was loaded from
+        self.memory_budget = memory_budget
+        self.session = None
+        self.encrypted_provenance = None
+        
+        # Heavy work runs on a background thread, results come back via root.after
+        self.jobs = JobRunner(self.root)
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
+        
         self.setup_ui()
         
         # Bind resize event for responsiveness
@@ -66,11 +152,40 @@ class ImageEncryptionTool:
             self.root.attributes('-fullscreen', False)
             self.root.geometry("1400x900+100+50")
     
+    def ensure_dependencies(self):
+        """Finish loading heavy modules before the first operation that needs them"""
+        load_dependencies()
+        if self.pyramids is None:
+            self.pyramids = PyramidCache()
+            self.histogram_cache = HistogramCache()
+            if self.memory_budget is None:
+                self.session = SessionStore()
+            else:
+                self.session = SessionStore(self.memory_budget)
+    
+    def on_close(self):
+        """Stop background work before closing the window"""
+        self.jobs.shutdown()
+        if self.session is not None:
+            self.session.clear()
+        self.root.destroy()
+    
     def on_window_resize(self, event):
         """Handle window resize events for better responsiveness"""
         if event.widget == self.root:
-            # Update scrollregion when window is resized
-            self.root.after_idle(lambda: self.main_canvas.configure(scrollregion=self.main_canvas.bbox("all")))
+            # Re-fit all panes once the window has stopped changing size
+            if self.resize_after_id is not None:
+                self.root.after_cancel(self.resize_after_id)
+            self.resize_after_id = self.root.after(RESIZE_DEBOUNCE_MS, self.refresh_images)
+    
+    def refresh_images(self):
+        """Re-render every loaded image to fit its (possibly resized) pane"""
+        self.resize_after_id = None
+        for frame_key in ('original_image', 'encrypted_image', 'decrypted_image'):
+            img_array = getattr(self, frame_key)
+            # Panes showing a preview are redrawn when their result arrives
+            if img_array is not None and frame_key not in self.preview_panes:
+                self.display_image(img_array, frame_key)
     
     def setup_ui(self):
         # Create main container without scrollbars for full-screen experience
@@ -106,6 +221,8 @@ class ImageEncryptionTool:
         self.setup_control_panel(main_frame)
         self.setup_images_frame(main_frame)
         self.setup_histogram_frame(main_frame)
+        if instrument.recorder.enabled:
+            self.setup_trace_panel(main_frame)
     
     def setup_control_panel(self, parent):
         # Compact control panel
@@ -144,6 +261,15 @@ class ImageEncryptionTool:
                                  justify='center')
         self.key_entry.grid(row=0, column=2, padx=(0, 10))
         
+        # Pixel scrambling scheme
+        self.scheme_var = tk.StringVar(value=DEFAULT_SCHEME)
+        self.scheme_combo = ttk.Combobox(control_frame,
+                                         textvariable=self.scheme_var,
+                                         values=SCHEMES,
+                                         state='readonly',
+                                         width=11)
+        self.scheme_combo.grid(row=0, column=3, padx=(0, 10))
+        
         # Action buttons
         self.encrypt_btn = tk.Button(control_frame, 
                                    text="🔒 Encrypt",
@@ -155,7 +281,7 @@ class ImageEncryptionTool:
                                    pady=8,
                                    cursor='hand2',
                                    state=tk.DISABLED)
-        self.encrypt_btn.grid(row=0, column=3, padx=5)
+        self.encrypt_btn.grid(row=0, column=4, padx=5)
         
         self.decrypt_btn = tk.Button(control_frame, 
                                    text="🔓 Decrypt",
@@ -167,7 +293,7 @@ class ImageEncryptionTool:
                                    pady=8,
                                    cursor='hand2',
                                    state=tk.DISABLED)
-        self.decrypt_btn.grid(row=0, column=4, padx=5)
+        self.decrypt_btn.grid(row=0, column=5, padx=5)
         
         self.histogram_btn = tk.Button(control_frame, 
                                      text="📊 Histograms",
@@ -179,7 +305,70 @@ class ImageEncryptionTool:
                                      pady=8,
                                      cursor='hand2',
                                      state=tk.DISABLED)
-        self.histogram_btn.grid(row=0, column=5, padx=5)
+        self.histogram_btn.grid(row=0, column=6, padx=5)
+        
+        self.save_btn = tk.Button(control_frame,
+                                 text="💾 Save",
+                                 command=self.save_encrypted,
+                                 font=('Arial', 10, 'bold'),
+                                 bg="#20c997",
+                                 fg='white',
+                                 padx=15,
+                                 pady=8,
+                                 cursor='hand2',
+                                 state=tk.DISABLED)
+        self.save_btn.grid(row=0, column=7, padx=5)
+        
+        self.load_btn = tk.Button(control_frame,
+                                 text="📂 Load",
+                                 command=self.load_encrypted,
+                                 font=('Arial', 10, 'bold'),
+                                 bg="#17a2b8",
+                                 fg='white',
+                                 padx=15,
+                                 pady=8,
+                                 cursor='hand2')
+        self.load_btn.grid(row=0, column=8, padx=5)
+        
+        # Progress of the running background job
+        self.progress_var = tk.DoubleVar(value=0.0)
+        self.progress_bar = ttk.Progressbar(control_frame,
+                                            variable=self.progress_var,
+                                            maximum=1.0,
+                                            length=180,
+                                            mode='determinate')
+        self.progress_bar.grid(row=0, column=9, padx=(15, 5))
+        
+        self.cancel_btn = tk.Button(control_frame,
+                                   text="✖ Cancel",
+                                   command=self.jobs.cancel,
+                                   font=('Arial', 10, 'bold'),
+                                   bg="#6c757d",
+                                   fg='white',
+                                   padx=10,
+                                   pady=8,
+                                   cursor='hand2',
+                                   state=tk.DISABLED)
+        self.cancel_btn.grid(row=0, column=10, padx=5)
+        
+        # Zoom and pan all image panes together
+        self.sync_var = tk.BooleanVar(value=True)
+        sync_check = tk.Checkbutton(control_frame,
+                                    text="🔗 Sync panes",
+                                    variable=self.sync_var,
+                                    font=('Arial', 10),
+                                    bg='#f8f9fa')
+        sync_check.grid(row=0, column=11, padx=5)
+        
+        # A key check value in saved files rejects wrong keys early, but with
+        # only 256 keys it also gives the key away, so it is off by default
+        self.key_check_var = tk.BooleanVar(value=False)
+        key_check = tk.Checkbutton(control_frame,
+                                   text="🔑 Store key check",
+                                   variable=self.key_check_var,
+                                   font=('Arial', 10),
+                                   bg='#f8f9fa')
+        key_check.grid(row=0, column=12, padx=5)
     
     def setup_images_frame(self, parent):
         # Images section with larger display
@@ -226,14 +415,16 @@ class ImageEncryptionTool:
                                  highlightbackground='#dee2e6')
             img_canvas.grid(row=0, column=0, sticky='nsew')
             
-            v_scroll = ttk.Scrollbar(img_frame, orient="vertical", command=img_canvas.yview)
+            # Scrollbars move the pane's view rather than the canvas itself
+            frame_key = title.lower().replace(' ', '_')
+            v_scroll = ttk.Scrollbar(img_frame, orient="vertical",
+                                     command=lambda *args, key=frame_key: self.on_scrollbar(key, 'y', *args))
             v_scroll.grid(row=0, column=1, sticky='ns')
             
-            h_scroll = ttk.Scrollbar(img_frame, orient="horizontal", command=img_canvas.xview)
+            h_scroll = ttk.Scrollbar(img_frame, orient="horizontal",
+                                     command=lambda *args, key=frame_key: self.on_scrollbar(key, 'x', *args))
             h_scroll.grid(row=1, column=0, sticky='ew')
             
-            img_canvas.configure(yscrollcommand=v_scroll.set, xscrollcommand=h_scroll.set)
-            
             # Initial placeholder
             placeholder_text = f"No {title.lower()}\nloaded yet\n\n📷"
             img_label = tk.Label(img_canvas, text=placeholder_text, bg='#f8f9fa', 
@@ -241,22 +432,29 @@ class ImageEncryptionTool:
             img_canvas.create_window(0, 0, window=img_label, anchor='nw')
             
             # Store references
-            self.image_frames[title.lower().replace(' ', '_')] = {
+            self.image_frames[frame_key] = {
                 'canvas': img_canvas,
                 'label': img_label,
-                'frame': img_frame
+                'frame': img_frame,
+                'h_scroll': h_scroll,
+                'v_scroll': v_scroll
             }
             
-            # Mouse wheel scrolling for images
-            def make_scroll_handler(canvas):
-                def _on_img_scroll(event):
-                    if event.state & 0x1:  # Shift pressed
-                        canvas.xview_scroll(int(-1*(event.delta/120)), "units")
-                    else:
-                        canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-                return _on_img_scroll
+            # Wheel zooms around the cursor, dragging pans, double-click toggles fit / 1:1
+            img_canvas.bind("<MouseWheel>",
+                            lambda e, key=frame_key: self.on_zoom(key, e, 1 if e.delta > 0 else -1))
+            img_canvas.bind("<Button-4>", lambda e, key=frame_key: self.on_zoom(key, e, 1))
+            img_canvas.bind("<Button-5>", lambda e, key=frame_key: self.on_zoom(key, e, -1))
+            img_canvas.bind("<ButtonPress-1>", lambda e: setattr(self, 'drag_start', (e.x, e.y)))
+            img_canvas.bind("<B1-Motion>", lambda e, key=frame_key: self.on_drag(key, e))
+            img_canvas.bind("<Double-Button-1>", lambda e, key=frame_key: self.on_toggle_zoom(key, e))
             
-            img_canvas.bind("<MouseWheel>", make_scroll_handler(img_canvas))
+            # On the original, Shift+drag marks a region to encrypt and right-click clears them
+            if frame_key == 'original_image':
+                img_canvas.bind("<Shift-ButtonPress-1>", self.on_roi_start)
+                img_canvas.bind("<Shift-B1-Motion>", self.on_roi_drag)
+                img_canvas.bind("<ButtonRelease-1>", self.on_roi_end)
+                img_canvas.bind("<Button-3>", self.clear_roi)
     
     def setup_histogram_frame(self, parent):
         # Histogram section with larger space
@@ -279,6 +477,55 @@ class ImageEncryptionTool:
         # Initial message
         self.show_initial_histogram_message()
     
+    def setup_trace_panel(self, parent):
+        """Optional panel listing per-stage wall/CPU time and memory peaks"""
+        trace_section = ttk.LabelFrame(parent, text="⏱️ Stage Timings", padding=5)
+        trace_section.grid(row=4, column=0, sticky='ew', pady=(5, 0))
+        trace_section.grid_columnconfigure(0, weight=1)
+        
+        self.trace_text = tk.Text(trace_section, height=8, font=('Courier', 9),
+                                  bg='#ffffff', fg='#2c3e50', relief=tk.FLAT, state=tk.DISABLED)
+        self.trace_text.grid(row=0, column=0, rowspan=2, sticky='ew')
+        
+        tk.Button(trace_section, text="💾 Export Trace", command=self.export_trace,
+                  font=('Arial', 9), cursor='hand2').grid(row=0, column=1, padx=(10, 0), sticky='ew')
+        tk.Button(trace_section, text="🧹 Clear", command=self.clear_trace,
+                  font=('Arial', 9), cursor='hand2').grid(row=1, column=1, padx=(10, 0), sticky='ew')
+        
+        self.trace_span_count = None
+        self.refresh_trace_panel()
+    
+    def refresh_trace_panel(self):
+        """Redraw the timing table when new spans were recorded, then reschedule"""
+        spans = instrument.recorder.spans()
+        if len(spans) != self.trace_span_count:
+            self.trace_span_count = len(spans)
+            summary = instrument.recorder.summary()
+            text = instrument.format_summary(summary) if summary else "No stages recorded yet"
+            self.trace_text.config(state=tk.NORMAL)
+            self.trace_text.delete('1.0', tk.END)
+            self.trace_text.insert('1.0', text)
+            self.trace_text.config(state=tk.DISABLED)
+        self.root.after(TRACE_REFRESH_MS, self.refresh_trace_panel)
+    
+    def clear_trace(self):
+        instrument.recorder.clear()
+        self.trace_span_count = None
+    
+    def export_trace(self):
+        """Write recorded spans as a Chrome trace or a JSON report"""
+        file_path = filedialog.asksaveasfilename(
+            title="Export Trace",
+            defaultextension='.trace.json',
+            filetypes=[("Chrome trace", "*.trace.json"), ("JSON report", "*.json")]
+        )
+        if not file_path:
+            return
+        try:
+            instrument.recorder.export(file_path)
+        except OSError as e:
+            messagebox.showerror("Export Failed", f"❌ Could not write trace:\n\n{str(e)}")
+    
     def show_initial_histogram_message(self):
         initial_frame = tk.Frame(self.histogram_container, bg='#ffffff')
         initial_frame.grid(row=0, column=0, columnspan=3, sticky='nsew')
@@ -311,13 +558,16 @@ class ImageEncryptionTool:
         
         if file_path:
             try:
-                # Load image using cv2
-                self.original_image = cv2.imread(file_path)
-                if self.original_image is None:
-                    raise ValueError("Could not load image. Please check the file format.")
+                self.ensure_dependencies()
                 
-                # Convert BGR to RGB
-                self.original_image = cv2.cvtColor(self.original_image, cv2.COLOR_BGR2RGB)
+                # Decode a reduced preview now; the full image is decoded
+                # only when encryption or histograms need every pixel
+                source = loader.LazyImage(file_path)
+                self.original_source = source
+                self.original_image = source.preview
+                self.channel_orders['original_image'] = source.channel_order
+                self.views.pop('original_image', None)
+                self.roi_rectangles = []
                 
                 # Display the image
                 self.display_image(self.original_image, 'original_image')
@@ -328,66 +578,74 @@ class ImageEncryptionTool:
                 
                 # Reset other images
                 self.encrypted_image = None
+                self.encrypted_header = None
+                self.encrypted_regions = None
+                self.encrypted_provenance = None
                 self.decrypted_image = None
                 self.reset_image_display('encrypted_image', "No encrypted\nimage yet\n\n🔒")
                 self.reset_image_display('decrypted_image', "No decrypted\nimage yet\n\n🔓")
                 self.decrypt_btn.config(state=tk.DISABLED)
+                self.save_btn.config(state=tk.DISABLED)
                 
                 # Show success message
-                img_shape = self.original_image.shape
+                img = self.original_image
+                channels = 1 if img.ndim == 2 else img.shape[2]
                 messagebox.showinfo("Image Loaded Successfully!", 
                                   f"✅ Image loaded successfully!\n\n" +
-                                  f"Size: {img_shape[1]} x {img_shape[0]} pixels\n" +
-                                  f"Channels: {img_shape[2]}\n\n" +
+                                  f"Size: {source.size[0]} x {source.size[1]} pixels\n" +
+                                  f"Channels: {channels} ({source.channel_order}, {img.dtype})\n\n" +
                                   f"Ready for encryption!")
                 
             except Exception as e:
                 messagebox.showerror("Error Loading Image", f"❌ Failed to load image:\n\n{str(e)}")
     
     def display_image(self, img_array, frame_key):
+        with span('display', pane=frame_key):
+            self._display_image(img_array, frame_key)
+    
+    def pane_size(self, frame_key):
+        """Return the (width, height) images in a pane are fitted to"""
+        canvas = self.image_frames[frame_key]['canvas']
+        canvas.update_idletasks()
+        canvas_width = canvas.winfo_width()
+        canvas_height = canvas.winfo_height()
+        
+        # If canvas is too small, use minimum size
+        if canvas_width < 100:
+            canvas_width = 300
+        if canvas_height < 100:
+            canvas_height = 250
+        return canvas_width, canvas_height
+    
+    def _display_image(self, img_array, frame_key):
         try:
-            # Get canvas reference
-            canvas = self.image_frames[frame_key]['canvas']
+            self.ensure_dependencies()
+            self.preview_panes.pop(frame_key, None)
+            canvas_width, canvas_height = self.pane_size(frame_key)
             
-            # Convert to PIL Image
-            img_pil = Image.fromarray(img_array.astype(np.uint8))
+            # Tiles are cut from the nearest cached pyramid level instead of the
+            # full image; only visible tiles are converted to 8-bit RGB for display
+            pyramid = self.pyramids.get(frame_key, img_array)
+            channel_order = self.channel_orders.get(frame_key, '')
+            renderer = self.tile_renderers.get(frame_key)
+            if renderer is None or renderer.pyramid is not pyramid or renderer.channel_order != channel_order:
+                renderer = TileRenderer(pyramid, channel_order,
+                                        convert=lambda tile: ImageTk.PhotoImage(Image.fromarray(tile)))
+                self.tile_renderers[frame_key] = renderer
             
-            # Get canvas size for scaling
-            canvas.update_idletasks()
-            canvas_width = canvas.winfo_width()
-            canvas_height = canvas.winfo_height()
+            # Keep the pane's zoom and position when its image is replaced
+            height, width = img_array.shape[:2]
+            view = self.views.get(frame_key)
+            if view is None:
+                view = self.views[frame_key] = View(width, height, canvas_width, canvas_height)
+                leader = self.sync_leader(frame_key)
+                if leader is not None:
+                    view.match(leader)
+            elif (view.image_width, view.image_height) != (width, height):
+                view.resize_image(width, height)
+            view.resize_canvas(canvas_width, canvas_height)
             
-            # If canvas is too small, use minimum size
-            if canvas_width < 100:
-                canvas_width = 300
-            if canvas_height < 100:
-                canvas_height = 250
-            
-            # Calculate scaling to fit in canvas while preserving aspect ratio
-            img_width, img_height = img_pil.size
-            scale_x = canvas_width / img_width
-            scale_y = canvas_height / img_height
-            scale = min(scale_x, scale_y, 1.0)  # Don't scale up
-            
-            # Calculate new dimensions
-            new_width = int(img_width * scale)
-            new_height = int(img_height * scale)
-            
-            # Resize image
-            img_resized = img_pil.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Convert to PhotoImage
-            img_tk = ImageTk.PhotoImage(img_resized)
-            
-            # Clear canvas and add image
-            canvas.delete("all")
-            canvas.create_image(canvas_width//2, canvas_height//2, image=img_tk, anchor='center')
-            
-            # Update scroll region
-            canvas.configure(scrollregion=canvas.bbox("all"))
-            
-            # Keep reference to prevent garbage collection
-            canvas.image = img_tk
+            self.render_view(frame_key)
             
         except Exception as e:
             # Show error in canvas
@@ -396,12 +654,157 @@ class ImageEncryptionTool:
             error_msg = f"Error displaying image:\n{str(e)[:50]}..."
             canvas.create_text(150, 100, text=error_msg, fill='red', font=('Arial', 10))
     
+    def render_view(self, frame_key):
+        """Draw the tiles of a pane's view that intersect its canvas"""
+        self.pending_renders.discard(frame_key)
+        view = self.views.get(frame_key)
+        renderer = self.tile_renderers.get(frame_key)
+        if view is None or renderer is None:
+            return
+        
+        frame = self.image_frames[frame_key]
+        canvas = frame['canvas']
+        canvas.delete("all")
+        tiles = []
+        for column, row, x, y in view.visible_tiles():
+            tile = renderer.tile(view.zoom, column, row)
+            canvas.create_image(x, y, image=tile, anchor='nw')
+            tiles.append(tile)
+        canvas.create_text(view.canvas_width - 6, view.canvas_height - 4, anchor='se',
+                           text=f"{view.zoom:.0%}", fill='#6c757d', font=('Arial', 9))
+        if frame_key == 'original_image' and self.roi_rectangles:
+            self.draw_roi(canvas, view)
+        
+        (x_first, x_last), (y_first, y_last) = view.scroll_fractions()
+        frame['h_scroll'].set(x_first, x_last)
+        frame['v_scroll'].set(y_first, y_last)
+        
+        # Keep references to prevent garbage collection
+        canvas.image = tiles
+    
+    def sync_leader(self, frame_key):
+        """Return another pane's view to follow when panes are synced, else None"""
+        if not self.sync_var.get():
+            return None
+        for key, view in self.views.items():
+            if key != frame_key:
+                return view
+        return None
+    
+    def view_changed(self, frame_key):
+        """Redraw a pane (and the synced panes) once pending input is handled"""
+        keys = [frame_key]
+        if self.sync_var.get():
+            view = self.views[frame_key]
+            for key, other in self.views.items():
+                if key != frame_key:
+                    other.match(view)
+                    keys.append(key)
+        for key in keys:
+            # Coalesce bursts of wheel and motion events into one render per pane
+            if key not in self.pending_renders:
+                self.pending_renders.add(key)
+                self.root.after_idle(self.render_view, key)
+    
+    def on_zoom(self, frame_key, event, steps):
+        view = self.views.get(frame_key)
+        if view is not None and view.zoom_at(viewer.ZOOM_STEP ** steps, event.x, event.y):
+            self.view_changed(frame_key)
+    
+    def on_drag(self, frame_key, event):
+        view = self.views.get(frame_key)
+        if view is None or self.drag_start is None:
+            return
+        view.pan(event.x - self.drag_start[0], event.y - self.drag_start[1])
+        self.drag_start = (event.x, event.y)
+        self.view_changed(frame_key)
+    
+    def on_toggle_zoom(self, frame_key, event):
+        """Switch between fitting the pane and 1:1 pixels around the clicked point"""
+        view = self.views.get(frame_key)
+        if view is None:
+            return
+        if view.fitted and view.zoom < 1.0:
+            view.zoom_at(1.0 / view.zoom, event.x, event.y)
+        else:
+            view.fit()
+        self.view_changed(frame_key)
+    
+    def on_scrollbar(self, frame_key, axis, command, amount, unit=None):
+        view = self.views.get(frame_key)
+        if view is None:
+            return
+        if command == 'moveto':
+            view.moveto(axis, float(amount))
+        else:
+            extent = view.canvas_width if axis == 'x' else view.canvas_height
+            step = extent * (0.9 if unit == 'pages' else 0.1) * int(amount)
+            view.pan(-step if axis == 'x' else 0, -step if axis == 'y' else 0)
+        self.view_changed(frame_key)
+    
+    def roi_scale(self):
+        """Return full-resolution pixels per pixel of the image in the original pane"""
+        return self.original_source.size[0] / self.views['original_image'].image_width
+    
+    def draw_roi(self, canvas, view):
+        """Outline the marked regions on the original pane"""
+        scale = view.zoom / self.roi_scale()
+        x, y = view.origin()
+        for left, top, width, height in self.roi_rectangles:
+            canvas.create_rectangle(left * scale - x, top * scale - y,
+                                    (left + width) * scale - x, (top + height) * scale - y,
+                                    outline='#ffc107', width=2)
+    
+    def on_roi_start(self, event):
+        # Shift+drag marks a region instead of panning
+        self.drag_start = None
+        if self.original_source is not None and 'original_image' in self.views:
+            self.roi_drag = (event.x, event.y)
+    
+    def on_roi_drag(self, event):
+        if self.roi_drag is None:
+            return
+        canvas = self.image_frames['original_image']['canvas']
+        canvas.delete('roi_drag')
+        canvas.create_rectangle(*self.roi_drag, event.x, event.y, outline='#ffc107',
+                                width=2, dash=(4, 2), tags='roi_drag')
+    
+    def on_roi_end(self, event):
+        if self.roi_drag is None:
+            return
+        start, self.roi_drag = self.roi_drag, None
+        view = self.views.get('original_image')
+        if view is None:
+            return
+        scale = self.roi_scale()
+        (x0, y0), (x1, y1) = view.to_image(*start), view.to_image(event.x, event.y)
+        width, height = self.original_source.size
+        self.roi_rectangles += roi.clip_rectangles(
+            [(round(min(x0, x1) * scale), round(min(y0, y1) * scale),
+              round(abs(x1 - x0) * scale), round(abs(y1 - y0) * scale))], height, width)
+        self.render_view('original_image')
+    
+    def clear_roi(self, event=None):
+        if self.roi_rectangles:
+            self.roi_rectangles = []
+            self.render_view('original_image')
+    
+    def promote_original(self):
+        """Show the full-resolution original once a job has decoded it"""
+        source = self.original_source
+        if source is not None and source.loaded and self.original_image is not source.full():
+            self.original_image = source.full()
+            self.channel_orders['original_image'] = source.channel_order
+            self.display_image(self.original_image, 'original_image')
+    
     def reset_image_display(self, frame_key, message):
         """Reset image display to show placeholder message"""
         canvas = self.image_frames[frame_key]['canvas']
         canvas.delete("all")
         canvas.create_text(150, 100, text=message, fill='#6c757d', font=('Arial', 10), justify='center')
         canvas.image = None
+        self.views.pop(frame_key, None)
+        self.tile_renderers.pop(frame_key, None)
     
     def validate_key(self):
         try:
@@ -415,8 +818,66 @@ class ImageEncryptionTool:
             messagebox.showerror("Invalid Key", "❌ Please enter a valid integer key (0-255)")
             return None
     
+    def set_busy(self, busy):
+        """Disable the action buttons while a background job is running"""
+        action_state = tk.DISABLED if busy else tk.NORMAL
+        self.upload_btn.config(state=action_state)
+        self.load_btn.config(state=action_state)
+        if self.original_image is not None or self.encrypted_image is not None:
+            self.histogram_btn.config(state=action_state)
+        if self.original_image is not None:
+            self.encrypt_btn.config(state=action_state)
+        if self.encrypted_image is not None:
+            self.decrypt_btn.config(state=action_state)
+            self.save_btn.config(state=action_state)
+        self.cancel_btn.config(state=tk.NORMAL if busy else tk.DISABLED)
+        if not busy:
+            self.progress_var.set(0.0)
+    
+    def run_job(self, work, on_done, error_title, on_finish=None):
+        """Run work(report) in the background and call on_done(result) on the Tk thread"""
+        def on_error(e):
+            messagebox.showerror(error_title, f"❌ {error_title}:\n\n{str(e)}")
+        
+        def finish():
+            self.set_busy(False)
+            if on_finish is not None:
+                on_finish()
+        
+        self.set_busy(True)
+        self.jobs.submit(work,
+                         on_done=on_done,
+                         on_error=on_error,
+                         on_progress=self.progress_var.set,
+                         on_finish=finish)
+    
+    def show_preview(self, frame_key, make_preview, channel_order):
+        """Show make_preview(width, height) in a pane until its full result arrives"""
+        try:
+            preview = make_preview(*self.pane_size(frame_key))
+        except Exception:
+            # Only a preview: the job reports any real problem
+            return
+        if preview is None:
+            return
+        previous_order = self.channel_orders.get(frame_key, '')
+        self.channel_orders[frame_key] = channel_order
+        self.display_image(preview, frame_key)
+        self.preview_panes[frame_key] = previous_order
+    
+    def drop_preview(self, frame_key, placeholder):
+        """Put back what a pane showed before its preview if the job did not finish"""
+        if frame_key not in self.preview_panes:
+            return
+        self.channel_orders[frame_key] = self.preview_panes.pop(frame_key)
+        img_array = getattr(self, frame_key)
+        if img_array is not None:
+            self.display_image(img_array, frame_key)
+        else:
+            self.reset_image_display(frame_key, placeholder)
+    
     def encrypt_image(self):
-        if self.original_image is None:
+        if self.original_source is None:
             messagebox.showerror("No Image", "❌ Please upload an image first")
             return
         
@@ -424,45 +885,68 @@ class ImageEncryptionTool:
         if key is None:
             return
         
-        try:
-            # Create a copy for encryption
-            self.encrypted_image = self.original_image.copy().astype(np.uint16)
-            
-            # XOR encryption
-            self.encrypted_image = np.bitwise_xor(self.encrypted_image, key)
-            
-            # Additional scrambling for enhanced security
-            if key > 0:
-                height, width = self.encrypted_image.shape[:2]
-                np.random.seed(key)  # Reproducible scrambling
-                
-                # Generate scrambling indices
-                total_pixels = height * width
-                indices = np.arange(total_pixels)
-                np.random.shuffle(indices)
-                
-                # Apply scrambling
-                flat_img = self.encrypted_image.reshape(-1, self.encrypted_image.shape[2])
-                scrambled_img = flat_img[indices]
-                self.encrypted_image = scrambled_img.reshape(self.encrypted_image.shape)
-            
-            # Convert back to uint8
-            self.encrypted_image = np.clip(self.encrypted_image, 0, 255).astype(np.uint8)
+        source = self.original_source
+        scheme = self.scheme_var.get()
+        rectangles = list(self.roi_rectangles)
+        
+        # Show the ciphertext at display resolution right away; the exact
+        # full-resolution result replaces it when the job below finishes
+        self.ensure_dependencies()
+        if not rectangles:
+            plain = source.full() if source.loaded else source.preview
+            self.show_preview('encrypted_image', lambda width, height: progressive.encrypt_preview(
+                plain, key, width, height, scheme=scheme), source.channel_order)
+        
+        def work(report):
+            # XOR encryption + pixel scrambling via the headless cipher core,
+            # on the full-resolution image in its native channel order;
+            # a key/scheme already used on this image is served from the session.
+            # The original is hashed once per upload, the result never is
+            image = source.full()
+            cache_key = ('encrypt', self.session.digest(image), key, scheme, tuple(rectangles))
+            if rectangles:
+                # Only the marked regions, on a copy so the original stays intact
+                result = self.session.get_or_compute(cache_key, lambda: roi.encrypt(
+                    image.copy(), key, rectangles, scheme=scheme,
+                    progress=lambda done, total: report(done / total),
+                    workers=cipher.cpu_workers()))
+            else:
+                result = self.session.get_or_compute(cache_key, lambda: cipher.encrypt(
+                    image, key, scheme=scheme, progress=lambda done, total: report(done / total),
+                    workers=cipher.cpu_workers()))
+            return result, cache_key
+        
+        def on_done(outcome):
+            (result, cached), cache_key = outcome
+            self.promote_original()
+            self.encrypted_image = result
+            self.encrypted_provenance = cache_key
+            self.channel_orders['encrypted_image'] = source.channel_order
+            # Its histograms are the original's with bins relabelled by the key,
+            # unless only regions were encrypted
+            if not rectangles:
+                self.histogram_cache.link(result, source.full(), key)
+            self.encrypted_regions = (rectangles, None) if rectangles else None
             
             # Display encrypted image
             self.display_image(self.encrypted_image, 'encrypted_image')
             
-            # Enable decrypt button
+            # Enable decrypt and save buttons
             self.current_key = key
+            self.current_scheme = scheme
+            self.encrypted_header = None
             self.decrypt_btn.config(state=tk.NORMAL)
+            self.save_btn.config(state=tk.NORMAL)
             
             messagebox.showinfo("Encryption Complete", 
                               f"🔒 Image encrypted successfully!\n\n" +
                               f"Key: {key}\n" +
-                              f"Method: XOR + Pixel Scrambling")
-            
-        except Exception as e:
-            messagebox.showerror("Encryption Error", f"❌ Encryption failed:\n\n{str(e)}")
+                              f"Method: XOR + Pixel Scrambling ({scheme})" +
+                              (f"\nRegions: {len(rectangles)}" if rectangles else "") +
+                              ("\n\n(from session cache)" if cached else ""))
+        
+        self.run_job(work, on_done, "Encryption failed",
+                     on_finish=lambda: self.drop_preview('encrypted_image', "No encrypted\nimage yet\n\n🔒"))
     
     def decrypt_image(self):
         if self.encrypted_image is None:
@@ -473,154 +957,393 @@ class ImageEncryptionTool:
         if key is None:
             return
         
-        try:
-            # Create copy for decryption
-            self.decrypted_image = self.encrypted_image.copy().astype(np.uint16)
-            
-            # Reverse scrambling first
-            if key > 0:
-                height, width = self.decrypted_image.shape[:2]
-                np.random.seed(key)  # Same seed as encryption
-                
-                # Generate same indices as encryption
-                total_pixels = height * width
-                indices = np.arange(total_pixels)
-                np.random.shuffle(indices)
-                
-                # Create reverse mapping
-                reverse_indices = np.argsort(indices)
-                
-                # Apply reverse scrambling
-                flat_img = self.decrypted_image.reshape(-1, self.decrypted_image.shape[2])
-                unscrambled_img = flat_img[reverse_indices]
-                self.decrypted_image = unscrambled_img.reshape(self.decrypted_image.shape)
-            
-            # Reverse XOR encryption
-            self.decrypted_image = np.bitwise_xor(self.decrypted_image, key)
-            
-            # Convert back to uint8
-            self.decrypted_image = np.clip(self.decrypted_image, 0, 255).astype(np.uint8)
+        image = self.encrypted_image
+        scheme = self.scheme_var.get()
+        regions = self.encrypted_regions
+        provenance = self.encrypted_provenance
+        
+        # Preview the plaintext at display resolution when the permutation allows it
+        if regions is None:
+            self.show_preview('decrypted_image', lambda width, height: progressive.decrypt_preview(
+                image, key, width, height, scheme=scheme), self.channel_orders.get('encrypted_image', ''))
+        
+        def work(report):
+            # Reverse scrambling and XOR via the headless cipher core, unless
+            # this ciphertext was already decrypted with the same key and scheme.
+            # Its provenance covers its regions too, so nothing is hashed here
+            cache_key = ('decrypt', provenance, key, scheme)
+            if regions is not None:
+                rectangles, mask = regions
+                return self.session.get_or_compute(cache_key, lambda: roi.decrypt(
+                    np.array(image), key, rectangles, mask, scheme=scheme,
+                    progress=lambda done, total: report(done / total),
+                    workers=cipher.cpu_workers()))
+            return self.session.get_or_compute(cache_key, lambda: cipher.decrypt(
+                image, key, scheme=scheme, progress=lambda done, total: report(done / total),
+                workers=cipher.cpu_workers()))
+        
+        def on_done(outcome):
+            result, cached = outcome
+            self.decrypted_image = result
+            self.channel_orders['decrypted_image'] = self.channel_orders.get('encrypted_image', '')
+            if regions is None:
+                self.histogram_cache.link(result, image, key)
             
             # Display decrypted image
             self.display_image(self.decrypted_image, 'decrypted_image')
             
             # Status check
-            if key == self.current_key:
+            if self.encrypted_header is not None:
+                # Loaded from a container: only its key check value can tell
+                matches = container.check_key(self.encrypted_header, key)
+                if matches is None:
+                    status = "Key could not be verified (file has no key check value)"
+                elif matches and scheme == self.current_scheme:
+                    status = "Perfect decryption! ✅"
+                elif matches:
+                    status = f"Warning: Different scheme used (file uses {self.current_scheme}) ⚠️"
+                else:
+                    status = "Warning: Key does not match the file's key check value ⚠️"
+            elif key == self.current_key and scheme == self.current_scheme:
                 status = "Perfect decryption! ✅"
-            else:
+            elif key != self.current_key:
                 status = f"Warning: Different key used (encrypted with {self.current_key}) ⚠️"
+            else:
+                status = f"Warning: Different scheme used (encrypted with {self.current_scheme}) ⚠️"
             
             messagebox.showinfo("Decryption Complete",
                               f"🔓 Image decrypted!\n\n" +
                               f"Key: {key}\n" +
-                              f"Status: {status}")
+                              f"Status: {status}" +
+                              ("\n\n(from session cache)" if cached else ""))
+        
+        self.run_job(work, on_done, "Decryption failed",
+                     on_finish=lambda: self.drop_preview('decrypted_image', "No decrypted\nimage yet\n\n🔓"))
+    
+    def save_encrypted(self):
+        """Save the encrypted image as a memory-mappable container"""
+        if self.encrypted_image is None:
+            messagebox.showerror("No Encrypted Image", "❌ No encrypted image available to save")
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            title="Save Encrypted Image",
+            defaultextension=container.EXTENSION,
+            filetypes=[("Encrypted image container", f"*{container.EXTENSION}"),
+                       ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        
+        image = self.encrypted_image
+        scheme = self.current_scheme
+        header = self.encrypted_header
+        key = self.current_key if self.key_check_var.get() else None
+        channel_order = self.channel_orders.get('encrypted_image', '')
+        rectangles, mask = self.encrypted_regions or (None, None)
+        
+        def work(report):
+            # A loaded file keeps its own key check value and channel order;
+            # the regions of an ROI ciphertext are stored for decryption
+            if header is None:
+                saved = container.save(file_path, image, scheme, key=key,
+                                       channel_order=channel_order,
+                                       rectangles=rectangles, mask=mask)
+            else:
+                saved = container.save(file_path, image, scheme,
+                                       channel_order=header.channel_order,
+                                       key_check=header.key_check,
+                                       rectangles=rectangles, mask=mask)
+            report(1.0)
+            return saved
+        
+        def on_done(saved):
+            messagebox.showinfo("Image Saved",
+                              f"💾 Encrypted image saved!\n\n" +
+                              f"File: {os.path.basename(file_path)}\n" +
+                              f"Scheme: {saved.scheme}")
+        
+        self.run_job(work, on_done, "Saving failed")
+    
+    def load_encrypted(self):
+        """Open an encrypted container; pixels are memory-mapped, not decoded"""
+        file_path = filedialog.askopenfilename(
+            title="Load Encrypted Image",
+            filetypes=[("Encrypted image container", f"*{container.EXTENSION}"),
+                       ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        
+        try:
+            self.ensure_dependencies()
+            header, pixels = container.load(file_path)
+            if header.scheme not in SCHEMES:
+                raise ValueError(f"Unsupported scheme '{header.scheme}' for the GUI")
+            
+            self.encrypted_image = pixels
+            self.encrypted_header = header
+            # The file as it is now; rewriting it changes its size or mtime
+            status = os.stat(file_path)
+            self.encrypted_provenance = ('file', os.path.abspath(file_path),
+                                         status.st_size, status.st_mtime_ns)
+            self.encrypted_regions = (header.rectangles, header.mask) if header.has_regions else None
+            self.channel_orders['encrypted_image'] = header.channel_order
+            self.current_key = None
+            self.current_scheme = header.scheme
+            self.scheme_var.set(header.scheme)
+            
+            self.display_image(self.encrypted_image, 'encrypted_image')
+            self.decrypted_image = None
+            self.reset_image_display('decrypted_image', "No decrypted\nimage yet\n\n🔓")
+            self.decrypt_btn.config(state=tk.NORMAL)
+            self.save_btn.config(state=tk.NORMAL)
+            self.histogram_btn.config(state=tk.NORMAL)
+            
+            messagebox.showinfo("Encrypted Image Loaded",
+                              f"📂 Encrypted image loaded!\n\n" +
+                              f"Size: {header.shape[1]} x {header.shape[0]} pixels\n" +
+                              f"Scheme: {header.scheme}\n" +
+                              f"Key check: {'yes' if header.key_check else 'no'}" +
+                              (f"\nEncrypted regions: {len(header.rectangles)}"
+                               f"{' + mask' if header.mask is not None else ''}"
+                               if header.has_regions else ""))
             
         except Exception as e:
-            messagebox.showerror("Decryption Error", f"❌ Decryption failed:\n\n{str(e)}")
+            messagebox.showerror("Error Loading Image", f"❌ Failed to load encrypted image:\n\n{str(e)}")
     
     def visualize_histograms(self):
-        # Clear previous histograms
-        for widget in self.histogram_container.winfo_children():
-            widget.destroy()
-        
         # Collect available images
         images_data = []
         
         if self.original_image is not None:
-            images_data.append(('Original Image', self.original_image, '#28a745'))
+            images_data.append(('original_image', 'Original Image', self.original_image))
         
         if self.encrypted_image is not None:
-            images_data.append(('Encrypted Image', self.encrypted_image, '#dc3545'))
+            images_data.append(('encrypted_image', 'Encrypted Image', self.encrypted_image))
         
         if self.decrypted_image is not None:
-            images_data.append(('Decrypted Image', self.decrypted_image, '#007bff'))
+            images_data.append(('decrypted_image', 'Decrypted Image', self.decrypted_image))
         
         if not images_data:
             messagebox.showwarning("No Images", "❌ No images available for histogram analysis.\nPlease upload an image first.")
             return
         
+        source = self.original_source
+        orders = dict(self.channel_orders)
+        
+        def work(report):
+            from image_encryption import metrics
+            
+            # Counting pixels is the slow part, so it runs in the background;
+            # it is skipped for images whose histograms are cached, and cipher
+            # results derive theirs from their input's (see HistogramCache.link)
+            histograms = []
+            for i, (slot, title, img_array) in enumerate(images_data):
+                if slot == 'original_image':
+                    # Count the full image, not the reduced preview
+                    img_array = source.full()
+                    orders[slot] = source.channel_order
+                hists = self.histogram_cache.compute(
+                    slot, img_array,
+                    progress=lambda done, total, i=i: report((i + done / total) / len(images_data)))
+                # Plot channels in red, green, blue order whatever the storage order
+                rgb = loader.rgb_channels(orders.get(slot, ''), len(hists))
+                # Entropy comes from the counts; correlation from sampled pairs
+                correlation = metrics.sampled_correlation(img_array, METRICS_SAMPLE)
+                quality = {'entropy': metrics.channel_entropy(hists[rgb]),
+                           'correlation': {name: values[rgb] for name, values in correlation.items()}}
+                histograms.append((title, hists[rgb], quality))
+                report((i + 1) / len(images_data))
+            return histograms
+        
+        def on_done(histograms):
+            self.promote_original()
+            self.render_histograms(histograms)
+        
+        # Even with every histogram cached, decoding the original and sampling
+        # pixel pairs touch the full image, so this never runs on the Tk thread
+        self.run_job(work, on_done, "Failed to generate histograms")
+    
+    def setup_histogram_figure(self):
+        """Create the persistent histogram figure that later renders update in place"""
+        from matplotlib.figure import Figure
+        from matplotlib.patches import Polygon
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        
+        # Replace the initial message with one figure holding all three plots
+        for widget in self.histogram_container.winfo_children():
+            widget.destroy()
+        
+        self.histogram_figure = Figure(figsize=(15, 4), dpi=80)
+        self.histogram_figure.patch.set_facecolor('white')
+        self.histogram_axes = []
+        
+        for ax in self.histogram_figure.subplots(1, 3):
+            ax.set_xlim(0, 255)
+            ax.set_xlabel('Pixel Intensity', fontsize=9)
+            ax.set_ylabel('Frequency', fontsize=9)
+            ax.grid(True, alpha=0.3, linestyle='--')
+            
+            # Clean up plot
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+            ax.tick_params(axis='both', labelsize=8)
+            
+            # One line and one filled area per channel, updated with set_data/set_xy
+            artists = []
+            for color, label in zip(HISTOGRAM_COLORS, HISTOGRAM_LABELS):
+                line, = ax.plot([], [], color=color, linewidth=2, label=label, alpha=0.9)
+                area = Polygon(np.zeros((0, 2)), closed=True, alpha=0.2, color=color)
+                ax.add_patch(area)
+                artists.append((line, area))
+            ax.legend(fontsize=8, loc='upper right')
+            
+            title = ax.set_title('', fontsize=11, fontweight='bold', pad=10, color='#2c3e50')
+            empty_text = ax.text(0.5, 0.5, "No histogram\navailable", transform=ax.transAxes,
+                                 ha='center', va='center', color='#6c757d', fontsize=10)
+            metrics_text = ax.text(0.02, 0.97, '', transform=ax.transAxes, ha='left', va='top',
+                                   family='monospace', fontsize=7, color='#2c3e50',
+                                   bbox={'facecolor': 'white', 'alpha': 0.7, 'edgecolor': 'none'})
+            self.histogram_axes.append({'ax': ax, 'title': title, 'empty': empty_text,
+                                        'metrics': metrics_text, 'artists': artists})
+        
+        self.histogram_figure.tight_layout()
+        
+        # Embed plot
+        self.histogram_canvas = FigureCanvasTkAgg(self.histogram_figure, self.histogram_container)
+        self.histogram_canvas.get_tk_widget().grid(row=0, column=0, columnspan=3, sticky='nsew')
+    
+    def format_quality(self, quality):
+        """Return the entropy/correlation overlay text for one histogram panel"""
+        if quality is None:
+            return ''
+        labels = [label[0] for label in HISTOGRAM_LABELS]
+        if len(quality['entropy']) == 1:
+            labels = ['Y']
+        lines = ['entropy ' + ' '.join(f'{l} {v:5.2f}' for l, v in zip(labels, quality['entropy']))]
+        for name, values in quality['correlation'].items():
+            lines.append(f'{name[:4]} r ' + ' '.join(f'{l} {v:+.2f}' for l, v in zip(labels, values)))
+        return '\n'.join(lines)
+    
+    def render_histograms(self, histograms):
+        """Update the persistent figure with precomputed per-channel histograms"""
         try:
-            # Create histogram for each image - side by side layout
-            for i, (title, img_array, color_theme) in enumerate(images_data):
-                # Frame for this histogram
-                hist_frame = tk.Frame(self.histogram_container,
-                                    bg='#ffffff',
-                                    relief=tk.RIDGE,
-                                    bd=2)
-                hist_frame.grid(row=0, column=i, padx=3, pady=5, sticky='nsew')
-                
-                # Calculate figure size based on available space
-                fig_width = 5
-                fig_height = 4
-                
-                # Create matplotlib figure
-                fig, ax = plt.subplots(1, 1, figsize=(fig_width, fig_height), dpi=80)
-                fig.patch.set_facecolor('white')
-                
-                # Plot title
-                ax.set_title(f'{title}\nRGB Distribution', 
-                           fontsize=11, fontweight='bold', pad=10, color='#2c3e50')
-                
-                # Calculate histograms
-                colors = ['#e74c3c', '#27ae60', '#3498db']
-                labels = ['Red', 'Green', 'Blue']
-                
-                max_freq = 0
-                for j, (color, label) in enumerate(zip(colors, labels)):
-                    hist = cv2.calcHist([img_array], [j], None, [256], [0, 256])
-                    hist = hist.flatten()
-                    max_freq = max(max_freq, np.max(hist))
-                    
-                    # Plot with styling
-                    ax.plot(range(256), hist, color=color, linewidth=2, label=label, alpha=0.9)
-                    ax.fill_between(range(256), hist, alpha=0.2, color=color)
-                
-                # Styling
-                ax.set_xlim(0, 255)
-                ax.set_ylim(0, max_freq * 1.1)
-                ax.set_xlabel('Pixel Intensity', fontsize=9)
-                ax.set_ylabel('Frequency', fontsize=9)
-                ax.legend(fontsize=8, loc='upper right')
-                ax.grid(True, alpha=0.3, linestyle='--')
-                
-                # Clean up plot
-                ax.spines['top'].set_visible(False)
-                ax.spines['right'].set_visible(False)
-                ax.tick_params(axis='both', labelsize=8)
-                
-                plt.tight_layout()
-                
-                # Embed plot
-                canvas = FigureCanvasTkAgg(fig, hist_frame)
-                canvas.draw()
-                canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-                
-                # Close figure to free memory
-                plt.close(fig)
+            if self.histogram_figure is None:
+                with span('histogram_figure'):
+                    self.setup_histogram_figure()
             
-            # Fill empty columns if less than 3 images
-            for i in range(len(images_data), 3):
-                empty_frame = tk.Frame(self.histogram_container, bg='#f8f9fa', relief=tk.SUNKEN, bd=1)
-                empty_frame.grid(row=0, column=i, padx=3, pady=5, sticky='nsew')
+            bins = np.arange(256)
+            with span('histogram_render'):
+                for i, panel in enumerate(self.histogram_axes):
+                    title, hists, quality = histograms[i] if i < len(histograms) else ('', None, None)
+                    panel['title'].set_text(f'{title}\nRGB Distribution' if title else '')
+                    panel['empty'].set_visible(hists is None)
+                    panel['metrics'].set_text(self.format_quality(quality))
+                    
+                    max_freq = 0
+                    for j, (line, area) in enumerate(panel['artists']):
+                        if hists is None or j >= len(hists):
+                            line.set_data([], [])
+                            area.set_xy(np.zeros((0, 2)))
+                            continue
+                        hist = hists[j]
+                        max_freq = max(max_freq, hist.max())
+                        line.set_data(bins, hist)
+                        area.set_xy(np.column_stack([np.r_[0, bins, 255], np.r_[0, hist, 0]]))
+                    
+                    panel['ax'].set_ylim(0, max(max_freq, 1) * 1.1)
                 
-                empty_label = tk.Label(empty_frame,
-                                     text="No histogram\navailable",
-                                     bg='#f8f9fa',
-                                     fg='#6c757d',
-                                     font=('Arial', 10))
-                empty_label.pack(expand=True)
+                # Tracing draws synchronously so matplotlib's rendering time is
+                # attributed to this span; otherwise Tk draws when idle
+                if instrument.recorder.enabled:
+                    self.histogram_canvas.draw()
+                else:
+                    self.histogram_canvas.draw_idle()
             
             messagebox.showinfo("Histograms Generated",
-                              f"📊 Generated {len(images_data)} histogram(s) successfully!\n\n" +
+                              f"📊 Generated {len(histograms)} histogram(s) successfully!\n\n" +
                               "All histograms are displayed side by side for easy comparison.")
             
         except Exception as e:
             messagebox.showerror("Histogram Error", f"❌ Failed to generate histograms:\n\n{str(e)}")
 
-def main():
+def profile_startup(budget_ms=None):
+    """Print a per-import breakdown of a cold start and check the first-frame budget"""
+    from image_encryption.startup import format_report, run_probe
+    
+    packages, milestones, wall_seconds = run_probe(os.path.abspath(__file__))
+    print(format_report(packages, milestones, wall_seconds))
+    
+    first_frame = milestones.get('first_frame')
+    if budget_ms is None:
+        return 0
+    if first_frame is None:
+        print("Time to first frame could not be measured (is a display available?)")
+        return 1
+    if first_frame * 1000 > budget_ms:
+        print(f"Time to first frame exceeds the {budget_ms:g} ms budget")
+        return 1
+    return 0
+
+def run_startup_probe():
+    """Start the GUI, record start-up milestones for profile_startup() and exit"""
+    from image_encryption.startup import report_milestones
+    
+    milestones = {'first_frame': None, 'dependencies_loaded': None, 'histograms_ready': None}
+    try:
+        root = tk.Tk()
+        ImageEncryptionTool(root)
+        root.update()
+        milestones['first_frame'] = time.monotonic()
+        root.destroy()
+    except tk.TclError:
+        # No display available: import timings are still meaningful
+        pass
+    
+    load_dependencies()
+    milestones['dependencies_loaded'] = time.monotonic()
+    import matplotlib.backends.backend_tkagg
+    milestones['histograms_ready'] = time.monotonic()
+    report_milestones(milestones)
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Image Encryption Tool - Pixel Manipulation")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="print a per-import cold-start breakdown and exit")
+    parser.add_argument('--startup-budget-ms', type=float,
+                        help="with --profile-startup, fail if the first frame takes longer")
+    parser.add_argument('--startup-probe', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--memory-budget-mb', type=float,
+                        help="RAM for cached results before they spill to temp files (default: 1024)")
+    parser.add_argument('--trace', nargs='?', const='time', choices=['time', 'memory'],
+                        help="record per-stage timings (and tracemalloc peaks with 'memory') "
+                             f"and show them in a status panel; also enabled by {instrument.ENV_VAR}")
+    parser.add_argument('--trace-output', metavar='FILE',
+                        help="write recorded spans to FILE on exit (*.trace.json: Chrome trace)")
+    args = parser.parse_args(argv)
+    
+    if args.trace:
+        instrument.enable(memory=(args.trace == 'memory'))
+    
+    if args.profile_startup:
+        return profile_startup(args.startup_budget_ms)
+    if args.startup_probe:
+        return run_startup_probe()
+    
     root = tk.Tk()
-    app = ImageEncryptionTool(root)
+    budget = None if args.memory_budget_mb is None else int(args.memory_budget_mb * 2**20)
+    app = ImageEncryptionTool(root, memory_budget=budget)
+    
+    # Paint the first frame, then load heavy modules in the background
+    root.update()
+    threading.Thread(target=load_dependencies, daemon=True).start()
     root.mainloop()
+    
+    if args.trace_output:
+        instrument.recorder.export(args.trace_output)
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
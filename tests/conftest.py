@@ -0,0 +1,17 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Make the package importable when pytest is run from anywhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def random_image():
+    """Return a factory of reproducible random images spanning the dtype's full range"""
+    def make(shape, dtype=np.uint8, seed=0):
+        return np.random.default_rng(seed).integers(0, np.iinfo(dtype).max, shape, dtype=dtype,
+                                                    endpoint=True)
+    return make
@@ -0,0 +1,52 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from image_encryption import batch, cipher, container
+
+
+def test_png_round_trip(tmp_path, random_image):
+    img = random_image((30, 40, 4))
+    (tmp_path / 'in' / 'sub').mkdir(parents=True)
+    cv2.imwrite(str(tmp_path / 'in' / 'sub' / 'a.png'), img)
+    result = batch.run_batch('encrypt', 9, str(tmp_path / 'in'), str(tmp_path / 'enc'), workers=1)
+    assert result.files == 1 and not result.failures
+    encrypted = cv2.imread(str(tmp_path / 'enc' / 'sub' / 'a.png'), cv2.IMREAD_UNCHANGED)
+    assert np.array_equal(encrypted, cipher.encrypt(img, 9))
+    batch.run_batch('decrypt', 9, str(tmp_path / 'enc'), str(tmp_path / 'dec'), workers=1)
+    assert np.array_equal(cv2.imread(str(tmp_path / 'dec' / 'sub' / 'a.png'),
+                                     cv2.IMREAD_UNCHANGED), img)
+
+
+def test_containers_in_and_out(tmp_path, random_image):
+    img = random_image((30, 40, 3))
+    cv2.imwrite(str(tmp_path / 'a.png'), img)
+    batch.process_file('encrypt', 9, str(tmp_path / 'a.png'), str(tmp_path / 'a.pxc'),
+                       scheme='feistel-v1')
+    header, encrypted = container.load(str(tmp_path / 'a.pxc'))
+    assert header.scheme == 'feistel-v1' and header.channel_order == 'BGR'
+    assert np.array_equal(encrypted, cipher.encrypt(img, 9, scheme='feistel-v1'))
+
+    # The container's scheme wins over the default
+    batch.process_file('decrypt', 9, str(tmp_path / 'a.pxc'), str(tmp_path / 'b.png'))
+    assert np.array_equal(cv2.imread(str(tmp_path / 'b.png'), cv2.IMREAD_UNCHANGED), img)
+    batch.process_file('decrypt', 9, str(tmp_path / 'a.pxc'), str(tmp_path / 'b.pxc'))
+    header, decrypted = container.load(str(tmp_path / 'b.pxc'))
+    assert header.scheme == container.SCHEME_PLAIN and np.array_equal(decrypted, img)
+
+
+def test_gui_saved_container_is_checked(tmp_path, random_image):
+    img = random_image((10, 10, 3))
+    path = str(tmp_path / 'saved.pxc')
+    container.save(path, cipher.encrypt(img, 5), 'shuffle-v1', key=5)
+    with pytest.raises(ValueError, match="Wrong key"):
+        batch.process_file('decrypt', 6, path, str(tmp_path / 'out.png'))
+    with pytest.raises(ValueError, match="already encrypted"):
+        batch.process_file('encrypt', 5, path, str(tmp_path / 'out.png'))
+
+
+def test_output_path_for(tmp_path):
+    assert batch.output_path_for(str(tmp_path / 'in' / 'x' / 'a.jpg'), str(tmp_path / 'in'),
+                                 'out', 'pxc') == os.path.join('out', 'x', 'a.pxc')
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from image_encryption import cipher
+from image_encryption.schemes import SCHEME_FEISTEL, SCHEME_SHUFFLE
+
+# More than one CHUNK_PIXELS chunk, so several workers really split the work
+LARGE_SHAPE = (1100, 1000, 3)
+
+
+def legacy_encrypt(img, key):
+    """The GUI's original seed + shuffle cipher"""
+    result = np.bitwise_xor(img.astype(np.uint16), key)
+    if key > 0:
+        np.random.seed(key)
+        indices = np.arange(img.shape[0] * img.shape[1])
+        np.random.shuffle(indices)
+        result = result.reshape(-1, img.shape[2])[indices].reshape(img.shape)
+    return np.clip(result, 0, 255).astype(np.uint8)
+
+
+def legacy_decrypt(img, key):
+    """The GUI's original argsort inverse of legacy_encrypt()"""
+    result = img.astype(np.uint16)
+    if key > 0:
+        np.random.seed(key)
+        indices = np.arange(img.shape[0] * img.shape[1])
+        np.random.shuffle(indices)
+        result = result.reshape(-1, img.shape[2])[np.argsort(indices)].reshape(img.shape)
+    return np.clip(np.bitwise_xor(result, key), 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize('key', [0, 1, 42, 255])
+def test_encrypt_matches_legacy_cipher(random_image, key):
+    img = random_image((37, 53, 3))
+    ciphertext = cipher.encrypt(img, key)
+    assert np.array_equal(ciphertext, legacy_encrypt(img, key))
+    assert np.array_equal(cipher.decrypt(ciphertext, key), legacy_decrypt(ciphertext, key))
+    assert np.array_equal(cipher.decrypt(ciphertext, key), img)
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_workers_match_legacy_cipher(random_image, workers):
+    img = random_image(LARGE_SHAPE)
+    ciphertext = cipher.encrypt(img, 123, workers=workers)
+    assert np.array_equal(ciphertext, legacy_encrypt(img, 123))
+    assert np.array_equal(cipher.decrypt(ciphertext, 123, workers=workers), img)
+
+
+@pytest.mark.parametrize('scheme', [SCHEME_SHUFFLE, SCHEME_FEISTEL])
+@pytest.mark.parametrize('shape, dtype', [
+    ((31, 17), np.uint8),
+    ((31, 17, 4), np.uint8),
+    ((29, 23, 3), np.uint16),
+])
+def test_round_trip(random_image, scheme, shape, dtype):
+    img = random_image(shape, dtype)
+    ciphertext = cipher.encrypt(img, 99, scheme=scheme)
+    assert ciphertext.shape == img.shape and ciphertext.dtype == img.dtype
+    assert not np.array_equal(ciphertext, img)
+    assert np.array_equal(cipher.decrypt(ciphertext, 99, scheme=scheme), img)
+
+
+def test_feistel_workers_agree(random_image):
+    img = random_image(LARGE_SHAPE)
+    serial = cipher.encrypt(img, 7, scheme=SCHEME_FEISTEL, workers=1)
+    assert np.array_equal(cipher.encrypt(img, 7, scheme=SCHEME_FEISTEL, workers=4), serial)
+    assert np.array_equal(cipher.decrypt(serial, 7, scheme=SCHEME_FEISTEL, workers=4), img)
+
+
+def test_out_and_progress(random_image):
+    img = random_image((40, 60, 3))
+    out = np.empty_like(img)
+    calls = []
+    assert cipher.encrypt(img, 5, out=out, progress=lambda done, total: calls.append(
+        (done, total))) is out
+    assert calls[-1] == (40 * 60, 40 * 60)
+    with pytest.raises(ValueError):
+        cipher.encrypt(img, 5, out=img)
+
+
+@pytest.mark.parametrize('key', [-1, 256, 'abc', None])
+def test_invalid_key(key):
+    with pytest.raises(ValueError):
+        cipher.validate_key(key)
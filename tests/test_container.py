@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from image_encryption import container
+
+
+@pytest.mark.parametrize('shape, dtype, channel_order', [
+    ((20, 30), np.uint8, 'GRAY'),
+    ((20, 30, 3), np.uint8, 'RGB'),
+    ((20, 30, 4), np.uint16, 'RGBA'),
+])
+def test_save_load_round_trip(tmp_path, shape, dtype, channel_order):
+    img = np.random.default_rng(0).integers(0, 1000, shape).astype(dtype)
+    path = str(tmp_path / 'img.pxc')
+    container.save(path, img, 'shuffle-v1', key=8)
+    header, pixels = container.load(path)
+    assert header.scheme == 'shuffle-v1'
+    assert header.shape == shape and header.dtype == np.dtype(dtype)
+    assert header.channel_order == channel_order
+    assert np.array_equal(pixels, img)
+    assert container.check_key(header, 8) is True
+    assert container.check_key(header, 9) is False
+
+
+def test_no_key_check_by_default(tmp_path):
+    path = str(tmp_path / 'img.pxc')
+    container.save(path, np.zeros((4, 4, 3), dtype=np.uint8), 'feistel-v1')
+    assert container.check_key(container.read_header(path), 1) is None
+
+
+def test_region_table_round_trip(tmp_path):
+    img = np.arange(15 * 17, dtype=np.uint8).reshape(15, 17)
+    mask = np.random.default_rng(0).random((15, 17)) > 0.5
+    rectangles = [(0, 0, 3, 4), (5, 6, 7, 8)]
+    path = str(tmp_path / 'img.pxc')
+    container.save(path, img, 'shuffle-v1', rectangles=rectangles, mask=mask)
+    header, pixels = container.load(path)
+    assert header.rectangles == rectangles
+    assert np.array_equal(header.mask, mask)
+    assert np.array_equal(pixels, img)
+
+    header.rectangles = header.mask = None
+    container.update(path, header)
+    assert not container.read_header(path).has_regions
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'not.pxc'
+    path.write_bytes(b'\0' * 100)
+    with pytest.raises(ValueError):
+        container.read_header(str(path))
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pytest
+
+from image_encryption import cipher, daemon
+from image_encryption.client import CipherClient, DaemonError
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'getuid'), reason="needs Unix domain sockets")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def socket_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('daemon') / 'daemon.sock')
+    # The daemon runs in its own process, as it would for real clients
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        process = daemon.start_subprocess(path, workers=2)
+    finally:
+        os.chdir(cwd)
+    yield path
+    process.terminate()
+    process.wait(10)
+
+
+@pytest.mark.parametrize('scheme', ['shuffle-v1', 'feistel-v1'])
+def test_round_trip_matches_in_process_cipher(socket_path, random_image, scheme):
+    img = random_image((45, 67, 3))
+    with CipherClient(socket_path) as client:
+        encrypted = client.encrypt(img, 173, scheme=scheme)
+        assert np.array_equal(encrypted, cipher.encrypt(img, 173, scheme=scheme))
+        assert np.array_equal(client.decrypt(encrypted, 173, scheme=scheme), img)
+
+
+def test_zero_copy_buffers_are_reused(socket_path, random_image):
+    img = random_image((20, 30))
+    with CipherClient(socket_path) as client, client.allocate(img.shape) as src, \
+            client.allocate(img.shape) as dst:
+        for key in (1, 2):
+            src.array[...] = img
+            client.run('encrypt', src, dst, key)
+            assert np.array_equal(dst.array, cipher.encrypt(img, key))
+
+
+def test_uint16_is_rejected_clearly(socket_path, random_image):
+    img = random_image((10, 10, 3), np.uint16)
+    with CipherClient(socket_path) as client:
+        with pytest.raises(TypeError, match="only ciphers uint8"):
+            client.encrypt(img, 5)
+        with pytest.raises(DaemonError, match="only ciphers uint8"):
+            client.request({'op': 'encrypt', 'key': 5, 'shape': [10, 10, 3],
+                            'dtype': 'uint16', 'src': 'unused', 'dst': 'unused'})
+        # The connection is still usable afterwards
+        assert client.ping()['ok']
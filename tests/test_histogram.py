@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from image_encryption import cipher, histogram
+from image_encryption.schemes import SCHEME_FEISTEL, SCHEME_SHUFFLE
+
+
+def test_channel_histograms_match_per_channel_bincount(random_image):
+    img = random_image((30, 40, 3))
+    expected = [np.bincount(img[..., c].ravel(), minlength=256) for c in range(3)]
+    assert np.array_equal(histogram.channel_histograms(img), expected)
+    wide = random_image((30, 40), np.uint16)
+    assert np.array_equal(histogram.channel_histograms(wide)[0],
+                          np.bincount((wide >> 8).ravel(), minlength=256))
+
+
+@pytest.mark.parametrize('scheme', [SCHEME_SHUFFLE, SCHEME_FEISTEL])
+@pytest.mark.parametrize('dtype', [np.uint8, np.uint16])
+def test_linked_results_are_derived_exactly(random_image, scheme, dtype):
+    img = random_image((37, 41, 3), dtype)
+    encrypted = cipher.encrypt(img, 173, scheme=scheme)
+    decrypted = cipher.decrypt(encrypted, 173, scheme=scheme)
+    cache = histogram.HistogramCache(verify=False)
+    cache.compute('original', img)
+    cache.link(encrypted, img, 173)
+    cache.link(decrypted, encrypted, 173)
+
+    assert np.array_equal(cache.compute('encrypted', encrypted),
+                          histogram.channel_histograms(encrypted))
+    assert np.array_equal(cache.compute('decrypted', decrypted),
+                          histogram.channel_histograms(decrypted))
+    assert (cache.scanned, cache.derived) == (1, 2)
+
+
+def test_unlinked_or_orphaned_images_are_scanned(random_image):
+    img = random_image((20, 20))
+    encrypted = cipher.encrypt(img, 9)
+    cache = histogram.HistogramCache(verify=False)
+    cache.link(encrypted, img, 9)
+    # The source's histograms are not known yet
+    cache.compute('encrypted', encrypted)
+    assert (cache.scanned, cache.derived) == (1, 0)
+
+
+@pytest.mark.parametrize('value, verify', [('1', True), ('yes', True), ('0', False), ('', False)])
+def test_verify_environment_variable(monkeypatch, value, verify):
+    monkeypatch.setenv(histogram.VERIFY_ENV_VAR, value)
+    assert histogram.HistogramCache().verify is verify
+
+
+def test_verify_catches_a_wrong_link(random_image, monkeypatch):
+    monkeypatch.setenv(histogram.VERIFY_ENV_VAR, '1')
+    img = random_image((20, 20, 3))
+    encrypted = cipher.encrypt(img, 9)
+    cache = histogram.HistogramCache()
+    cache.compute('original', img)
+    cache.link(encrypted, img, 10)
+    with pytest.raises(AssertionError):
+        cache.compute('encrypted', encrypted)
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from image_encryption import container, keystream
+
+
+def test_round_trip_in_memory():
+    stream_key = keystream.derive_key('secret', salt=bytes(range(16)))
+    img = np.random.default_rng(0).integers(0, 65536, (33, 45, 3), dtype=np.uint16)
+    ciphertext = keystream.encrypt(img, stream_key)
+    assert not np.array_equal(ciphertext, img)
+    assert np.array_equal(keystream.decrypt(ciphertext, stream_key, workers=3), img)
+
+
+def test_chunks_match_one_keystream():
+    stream_key = keystream.derive_key('secret', salt=bytes(16))
+    data = np.zeros(3 * keystream.CHUNK_BYTES + 5, dtype=np.uint8)
+    expected = keystream.keystream(stream_key, 0, data.size)
+    assert np.array_equal(keystream.xor_keystream(data, stream_key, workers=2), expected)
+    assert np.array_equal(keystream.keystream(stream_key, 64, 100), expected[64:164])
+
+
+def test_file_round_trip(tmp_path):
+    img = np.random.default_rng(1).integers(0, 256, (40, 30, 3), dtype=np.uint8)
+    np.save(tmp_path / 'src.npy', img)
+    header = keystream.encrypt_file(str(tmp_path / 'src.npy'), str(tmp_path / 'enc.pxc'),
+                                    'passphrase')
+    assert container.read_header(str(tmp_path / 'enc.pxc')).salt == header.salt
+    keystream.decrypt_file(str(tmp_path / 'enc.pxc'), str(tmp_path / 'dec.npy'), 'passphrase')
+    assert np.array_equal(np.load(tmp_path / 'dec.npy'), img)
+    with pytest.raises(ValueError):
+        keystream.decrypt_file(str(tmp_path / 'enc.pxc'), str(tmp_path / 'bad.npy'), 'wrong')
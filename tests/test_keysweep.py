@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from image_encryption import cipher, keysweep
+from image_encryption.schemes import SCHEME_FEISTEL, SCHEME_SHUFFLE
+
+
+def natural_image(height=96, width=128):
+    """Smooth gradients, whose neighbouring pixels correlate strongly"""
+    ys, xs = np.mgrid[:height, :width]
+    return np.dstack([(xs * 2) % 256, (ys * 2) % 256, (xs + ys) % 256]).astype(np.uint8)
+
+
+@pytest.mark.parametrize('scheme', [SCHEME_SHUFFLE, SCHEME_FEISTEL])
+@pytest.mark.parametrize('key', [0, 137])
+def test_sweep_finds_planted_key(scheme, key):
+    ciphertext = cipher.encrypt(natural_image(), key, scheme=scheme)
+    result = keysweep.sweep(ciphertext, scheme=scheme, sample=2000, stop_score=None)
+    assert len(result.scores) == 256
+    best_key, best_score = result.best
+    assert best_key == key and best_score > 0.9
+    assert result.ranking(2)[1][1] < 0.2
+
+
+def test_sweep_stops_early_and_reports_progress():
+    ciphertext = cipher.encrypt(natural_image(), 42, scheme=SCHEME_FEISTEL)
+    calls = []
+    result = keysweep.sweep(ciphertext, scheme=SCHEME_FEISTEL, sample=2000, workers=1,
+                            progress=lambda done, total: calls.append((done, total)))
+    assert result.stopped_early and result.best[0] == 42
+    assert len(result.scores) < 256 and calls[-1][1] == 256
+
+
+def test_sweep_rejects_tiny_images():
+    with pytest.raises(ValueError):
+        keysweep.sweep(np.zeros((1, 10), dtype=np.uint8))
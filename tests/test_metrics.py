@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from image_encryption import metrics
+
+
+def reference(img, other, monkeypatch):
+    # One chunk covering the whole image
+    monkeypatch.setattr(metrics, 'CHUNK_PIXELS', img.shape[0] * img.shape[1])
+    return metrics.analyze(img, other)
+
+
+@pytest.mark.parametrize('height', [5, 9, 13, 8, 7])
+def test_analyze_chunks_match_whole_image(random_image, monkeypatch, height):
+    img = random_image((height, 16, 3))
+    other = random_image((height, 16, 3), seed=1)
+    expected = reference(img, other, monkeypatch)
+    # Four rows per chunk, so heights 4k + 1 end on a one-row overlap
+    monkeypatch.setattr(metrics, 'CHUNK_PIXELS', 64)
+    result = metrics.analyze(img, other)
+    for name in ('entropy', 'npcr', 'uaci'):
+        assert np.allclose(result[name], expected[name])
+    for name, values in expected['correlation'].items():
+        assert np.allclose(result['correlation'][name], values)
+
+
+def test_last_row_counted_once(monkeypatch):
+    img = np.zeros((9, 16), dtype=np.uint8)
+    img[-1] = 200
+    monkeypatch.setattr(metrics, 'CHUNK_PIXELS', 64)
+    p = 1 / 9
+    expected = -(p * np.log2(p) + (1 - p) * np.log2(1 - p))
+    assert np.isclose(metrics.analyze(img)['entropy'][0], expected)
+
+
+def test_npcr_uaci_of_identical_and_inverted_images(random_image):
+    img = random_image((20, 30))
+    npcr, uaci = metrics.npcr_uaci(img, img)
+    assert npcr.tolist() == [0.0] and uaci.tolist() == [0.0]
+    npcr, uaci = metrics.npcr_uaci(img, 255 - img)
+    assert npcr[0] == pytest.approx(100 - 100 * np.mean(img == 255 - img))
+    assert uaci[0] == pytest.approx(np.abs(255 - 2 * img.astype(int)).mean() / 255 * 100)
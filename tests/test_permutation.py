@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from image_encryption.permutation import FeistelPermutation, get_indices, index_dtype, \
+    scramble_indices
+from image_encryption.schemes import SCHEME_FEISTEL
+
+
+@pytest.mark.parametrize('total_pixels', [1, 2, 3, 7, 255, 1001, 65537, 99991])
+@pytest.mark.parametrize('key', [1, 200])
+def test_feistel_is_a_bijection(key, total_pixels):
+    permutation = FeistelPermutation(key, total_pixels)
+    sources = permutation[:]
+    assert len(permutation) == total_pixels
+    assert sources.dtype == index_dtype(total_pixels)
+    assert np.array_equal(np.sort(sources), np.arange(total_pixels))
+    assert np.array_equal(permutation.destination(sources), np.arange(total_pixels))
+
+
+def test_feistel_slices_match_whole():
+    permutation = FeistelPermutation(9, 10007)
+    whole = permutation[:]
+    assert np.array_equal(permutation[1000:2001], whole[1000:2001])
+    assert np.array_equal(permutation[[5, 0, 10006]], whole[[5, 0, 10006]])
+
+
+def test_feistel_depends_on_key_and_size():
+    assert not np.array_equal(FeistelPermutation(1, 1000)[:], FeistelPermutation(2, 1000)[:])
+    assert np.array_equal(get_indices(3, 4096, SCHEME_FEISTEL)[:], FeistelPermutation(3, 4096)[:])
+
+
+def test_shuffle_matches_global_seed():
+    np.random.seed(17)
+    expected = np.arange(5000)
+    np.random.shuffle(expected)
+    assert np.array_equal(scramble_indices(17, 5000), expected)
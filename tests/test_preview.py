@@ -0,0 +1,20 @@
+import numpy as np
+
+from image_encryption.preview import PyramidCache
+
+
+def test_pyramid_cache_reuses_pyramid_of_same_array():
+    img = np.zeros((300, 400, 3), dtype=np.uint8)
+    cache = PyramidCache()
+    assert cache.get('a', img) is cache.get('a', img)
+    assert cache.get('a', img.copy()) is not cache.get('a', img)
+
+
+def test_pyramid_cache_reuses_pyramid_of_same_memmap(tmp_path):
+    path = tmp_path / 'img.npy'
+    np.save(path, np.arange(300 * 400 * 3, dtype=np.uint8).reshape(300, 400, 3))
+    memmap = np.load(path, mmap_mode='r')
+    cache = PyramidCache()
+    pyramid = cache.get('a', memmap)
+    assert cache.get('a', memmap) is pyramid
+    assert pyramid.fit(100, 100).shape == (75, 100, 3)
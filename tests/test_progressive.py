@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from image_encryption import cipher, permutation, progressive
+from image_encryption.schemes import SCHEME_FEISTEL, SCHEME_SHUFFLE
+
+
+@pytest.fixture
+def empty_cache():
+    permutation.default_cache.clear()
+    yield permutation.default_cache
+    permutation.default_cache.clear()
+
+
+def full_grid(img, rows, columns):
+    height, width = img.shape[:2]
+    positions = progressive.grid_positions(height, width, rows, columns)
+    return img.reshape(height * width, *img.shape[2:])[positions].reshape(
+        rows, columns, *img.shape[2:])
+
+
+@pytest.mark.parametrize('scheme', [SCHEME_SHUFFLE, SCHEME_FEISTEL])
+@pytest.mark.parametrize('dtype', [np.uint8, np.uint16])
+def test_encrypt_preview_samples_the_full_result(random_image, empty_cache, scheme, dtype):
+    img = random_image((90, 120, 3), dtype)
+    # Caches the shuffle permutation
+    ciphertext = cipher.encrypt(img, 61, scheme=scheme)
+    preview = progressive.encrypt_preview(img, 61, 40, 40, scheme=scheme)
+    assert preview.shape == (30, 40, 3) and preview.dtype == dtype
+    assert np.array_equal(preview, full_grid(ciphertext, 30, 40))
+
+
+def test_encrypt_preview_without_cached_permutation_is_a_stand_in(random_image, empty_cache):
+    img = random_image((90, 120, 3))
+    preview = progressive.encrypt_preview(img, 61, 40, 40, scheme=SCHEME_SHUFFLE)
+    # The full-size permutation is never generated
+    assert (61, 90 * 120) not in empty_cache
+    assert np.array_equal(preview, cipher.encrypt(full_grid(img, 30, 40), 61))
+
+
+def test_feistel_decrypt_preview_samples_the_full_result(random_image):
+    img = random_image((90, 120))
+    ciphertext = cipher.encrypt(img, 200, scheme=SCHEME_FEISTEL)
+    preview = progressive.decrypt_preview(ciphertext, 200, 60, 60, scheme=SCHEME_FEISTEL)
+    assert np.array_equal(preview, full_grid(img, 45, 60))
+
+
+def test_shuffle_decrypt_preview_fills_cells_with_their_own_pixels(empty_cache, monkeypatch):
+    # Every plaintext pixel holds the index of the 8 x 8 cell it lies in
+    ys, xs = np.mgrid[:64, :64]
+    img = (ys // 8 * 8 + xs // 8).astype(np.uint8)
+    cells = np.arange(64, dtype=np.uint8).reshape(8, 8)
+    ciphertext = cipher.encrypt(img, 99)
+
+    # A few cells may miss every sample and copy the cell before them
+    preview = progressive.decrypt_preview(ciphertext, 99, 8, 8)
+    missed = preview != cells
+    assert missed.sum() <= 4
+    assert np.array_equal(preview[missed], cells.reshape(-1)[np.flatnonzero(missed) - 1])
+
+    # Sampling every ciphertext pixel hits every cell
+    monkeypatch.setattr(progressive, 'SPLAT_SAMPLES', 64)
+    assert np.array_equal(progressive.decrypt_preview(ciphertext, 99, 8, 8), cells)
+
+
+def test_shuffle_decrypt_preview_needs_a_cached_permutation(random_image, empty_cache):
+    assert progressive.decrypt_preview(random_image((30, 30)), 5, 10, 10) is None
+    assert len(empty_cache) == 0
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from image_encryption import container, roi
+from image_encryption.schemes import SCHEME_FEISTEL, SCHEME_SHUFFLE
+
+
+def test_clip_rectangles():
+    assert roi.clip_rectangles([(-5, -5, 10, 10), (90, 90, 50, 50), (200, 0, 5, 5)],
+                               100, 100) == [(0, 0, 5, 5), (90, 90, 10, 10)]
+
+
+@pytest.mark.parametrize('scheme', [SCHEME_SHUFFLE, SCHEME_FEISTEL])
+@pytest.mark.parametrize('dtype', [np.uint8, np.uint16])
+def test_overlapping_regions_round_trip(random_image, scheme, dtype):
+    img = random_image((60, 80, 3), dtype)
+    rectangles = [(10, 10, 30, 20), (25, 15, 30, 30)]
+    mask = np.zeros((60, 80), dtype=bool)
+    mask[40:, :20] = True
+    mask[5, 70:] = True
+    inside = mask.copy()
+    for x, y, w, h in rectangles:
+        inside[y:y + h, x:x + w] = True
+
+    encrypted = roi.encrypt(img.copy(), 77, rectangles, mask, scheme=scheme)
+    assert np.array_equal(encrypted[~inside], img[~inside])
+    assert not np.array_equal(encrypted[inside], img[inside])
+    assert np.array_equal(roi.decrypt(encrypted, 77, rectangles, mask, scheme=scheme), img)
+
+
+def test_progress_covers_every_region(random_image):
+    img = random_image((50, 50))
+    calls = []
+    roi.encrypt(img, 9, [(0, 0, 10, 10), (20, 20, 5, 4)], np.eye(50, dtype=bool),
+                progress=lambda done, total: calls.append((done, total)))
+    assert calls[-1] == (100 + 20 + 50, 100 + 20 + 50)
+
+
+def test_rejects_read_only_image(random_image):
+    img = random_image((10, 10, 3))
+    img.flags.writeable = False
+    with pytest.raises(ValueError):
+        roi.encrypt(img, 1, [(0, 0, 5, 5)])
+
+
+def test_file_round_trip(random_image, tmp_path):
+    img = random_image((40, 50, 3))
+    mask = np.zeros((40, 50), dtype=bool)
+    mask[::3, ::4] = True
+    np.save(tmp_path / 'src.npy', img)
+    header = roi.encrypt_file(str(tmp_path / 'src.npy'), str(tmp_path / 'enc.pxc'), 12,
+                              [(5, 5, 100, 10)], mask)
+    assert header.key_check is None
+    stored = container.read_header(str(tmp_path / 'enc.pxc'))
+    assert stored.rectangles == [(5, 5, 45, 10)]
+    assert np.array_equal(stored.mask, mask)
+    roi.decrypt_file(str(tmp_path / 'enc.pxc'), str(tmp_path / 'dec.npy'), 12)
+    assert np.array_equal(np.load(tmp_path / 'dec.npy'), img)
+
+
+def test_in_place_file_round_trip(random_image, tmp_path):
+    img = random_image((30, 30))
+    path = str(tmp_path / 'img.pxc')
+    container.save(path, img, container.SCHEME_PLAIN)
+    roi.encrypt_file(path, None, 40, [(0, 0, 15, 15)], key_check=True)
+    with pytest.raises(ValueError):
+        roi.decrypt_file(path, None, 41)
+    roi.decrypt_file(path, None, 40)
+    header, pixels = container.load(path)
+    assert header.scheme == container.SCHEME_PLAIN and not header.has_regions
+    assert np.array_equal(pixels, img)
+
+
+@pytest.mark.parametrize('decrypted_name', ['dec.npy', 'dec.pxc'])
+def test_file_round_trip_in_bands(random_image, tmp_path, monkeypatch, decrypted_name):
+    # Three rows per band
+    monkeypatch.setattr(roi, 'COPY_BYTES', 3 * 50 * 3)
+    img = random_image((40, 50, 3))
+    container.save(str(tmp_path / 'src.pxc'), img, container.SCHEME_PLAIN, channel_order='BGR')
+    roi.encrypt_file(str(tmp_path / 'src.pxc'), str(tmp_path / 'enc.pxc'), 12,
+                     [(0, 7, 20, 20), (30, 30, 10, 10)])
+    header, encrypted = container.load(str(tmp_path / 'enc.pxc'))
+    assert header.channel_order == 'BGR'
+    assert np.array_equal(encrypted[:7], img[:7])
+    assert not np.array_equal(encrypted[7:27, :20], img[7:27, :20])
+
+    decrypted = roi.decrypt_file(str(tmp_path / 'enc.pxc'), str(tmp_path / decrypted_name), 12)
+    assert isinstance(decrypted, np.memmap)
+    assert np.array_equal(decrypted, img)
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+
+from image_encryption import cipher
+from image_encryption.session import SessionStore, image_digest
+
+
+def block(value, size=1000):
+    return np.full(size, value, dtype=np.uint8)
+
+
+def test_least_recently_used_entries_spill_first(tmp_path):
+    store = SessionStore(max_bytes=2500, spill_dir=str(tmp_path))
+    for name in 'abc':
+        store.put(name, block(ord(name)))
+    assert isinstance(store.get('a'), np.memmap)
+    assert not isinstance(store.get('b'), np.memmap)
+    # 'c' is now the least recently used one in RAM
+    store.put('d', block(ord('d')))
+    assert isinstance(store.get('c'), np.memmap)
+    assert not isinstance(store.get('b'), np.memmap)
+    assert store.memory_bytes == 2000 and store.spilled_bytes == 2000
+
+
+def test_spilled_entries_come_back_identical(random_image, tmp_path):
+    store = SessionStore(max_bytes=1, spill_dir=str(tmp_path))
+    img = random_image((30, 40, 3))
+    stored = store.put('img', img)
+    assert isinstance(stored, np.memmap)
+    assert store.memory_bytes == 0
+    assert np.array_equal(store.get('img'), img)
+    assert store.get('img').dtype == img.dtype and store.get('img').shape == img.shape
+
+    store.clear()
+    assert len(store) == 0 and os.listdir(tmp_path) == []
+
+
+def test_results_are_keyed_by_digest_key_and_scheme(random_image):
+    store = SessionStore()
+    img = random_image((20, 30, 3))
+    calls = []
+
+    def encrypt(image, key, scheme):
+        cache_key = ('encrypt', store.digest(image), key, scheme)
+        return store.get_or_compute(cache_key, lambda: calls.append(key) or cipher.encrypt(
+            image, key, scheme=scheme))
+
+    first, cached = encrypt(img, 5, 'shuffle-v1')
+    assert not cached
+    # Same pixels in another array object hit
+    again, cached = encrypt(img.copy(), 5, 'shuffle-v1')
+    assert cached and again is first
+    assert not encrypt(img, 6, 'shuffle-v1')[1]
+    assert not encrypt(img, 5, 'feistel-v1')[1]
+    assert calls == [5, 6, 5]
+    assert (store.hits, store.misses) == (1, 3)
+
+    # A result's own key identifies it without hashing it
+    provenance = ('encrypt', image_digest(img), 5, 'shuffle-v1')
+    decrypt_key = ('decrypt', provenance, 5, 'shuffle-v1')
+    decrypted, cached = store.get_or_compute(decrypt_key, lambda: cipher.decrypt(first, 5))
+    assert not cached and np.array_equal(decrypted, img)
+    again, cached = store.get_or_compute(decrypt_key, lambda: None)
+    assert cached and again is decrypted
+
+
+def test_digest_depends_on_dtype_and_shape():
+    img = np.zeros((4, 6), dtype=np.uint8)
+    assert image_digest(img) == image_digest(img.copy())
+    assert image_digest(img) != image_digest(img.reshape(6, 4))
+    assert image_digest(img) != image_digest(img.view(np.uint16))
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from image_encryption import container, tiled
+
+
+def test_strips_round_trip_across_blocks():
+    # Two strips, one block each
+    img = np.random.default_rng(0).integers(0, 256, (1100, 1000), dtype=np.uint8)
+    encrypted = tiled.encrypt_strips(img, np.empty_like(img), 31, tile_bytes=1)
+    assert not np.array_equal(encrypted, img)
+    assert np.array_equal(tiled.encrypt_strips(img, np.empty_like(img), 31), encrypted)
+    assert np.array_equal(tiled.decrypt_strips(encrypted, np.empty_like(img), 31, tile_bytes=1),
+                          img)
+
+
+def test_file_round_trip(tmp_path):
+    img = np.random.default_rng(1).integers(0, 256, (60, 70, 3), dtype=np.uint8)
+    np.save(tmp_path / 'src.npy', img)
+    tiled.encrypt_file(str(tmp_path / 'src.npy'), str(tmp_path / 'enc.pxc'), 200)
+    assert container.read_header(str(tmp_path / 'enc.pxc')).scheme == tiled.SCHEME_STRIP
+    tiled.decrypt_file(str(tmp_path / 'enc.pxc'), str(tmp_path / 'dec.npy'), 200)
+    assert np.array_equal(np.load(tmp_path / 'dec.npy'), img)
+
+
+def test_decrypt_file_rejects_other_schemes(tmp_path):
+    img = np.zeros((8, 8, 3), dtype=np.uint8)
+    container.save(str(tmp_path / 'other.pxc'), img, 'shuffle-v1', key=3)
+    with pytest.raises(ValueError):
+        tiled.decrypt_file(str(tmp_path / 'other.pxc'), str(tmp_path / 'dec.npy'), 3)
+
+
+def test_decrypt_file_checks_key(tmp_path):
+    img = np.zeros((8, 8, 3), dtype=np.uint8)
+    container.save(str(tmp_path / 'strip.pxc'), img, tiled.SCHEME_STRIP, key=3)
+    with pytest.raises(ValueError):
+        tiled.decrypt_file(str(tmp_path / 'strip.pxc'), str(tmp_path / 'dec.npy'), 4)
+    tiled.decrypt_file(str(tmp_path / 'strip.pxc'), str(tmp_path / 'dec.npy'), 3)
+
+
+def test_uint16_file_round_trip(tmp_path, random_image):
+    img = random_image((50, 40, 3), np.uint16)
+    np.save(tmp_path / 'src.npy', img)
+    encrypted = tiled.encrypt_file(str(tmp_path / 'src.npy'), str(tmp_path / 'enc.pxc'), 9)
+    header = container.read_header(str(tmp_path / 'enc.pxc'))
+    assert header.dtype == np.uint16 and encrypted.dtype == np.uint16
+    assert not np.array_equal(encrypted, img)
+    tiled.decrypt_file(str(tmp_path / 'enc.pxc'), str(tmp_path / 'dec.npy'), 9)
+    decrypted = np.load(tmp_path / 'dec.npy')
+    assert decrypted.dtype == np.uint16 and np.array_equal(decrypted, img)
+
+
+def test_unsupported_dtypes_are_rejected():
+    img = np.zeros((4, 4), dtype=np.uint32)
+    with pytest.raises(ValueError, match="uint8 or uint16"):
+        tiled.encrypt_strips(img, np.empty_like(img), 1)
+    with pytest.raises(ValueError, match="out must be"):
+        tiled.encrypt_strips(img.astype(np.uint16), np.empty((4, 4), dtype=np.uint8), 1)
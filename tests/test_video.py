@@ -0,0 +1,64 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from image_encryption import cipher, video
+
+
+def test_multi_page_tiff_round_trip(tmp_path, random_image):
+    pages = [random_image((24, 32, 3), seed=seed) for seed in range(11)]
+    src, encrypted, decrypted = (str(tmp_path / name) for name in ('in.tif', 'enc.tif', 'dec.tif'))
+    assert cv2.imwritemulti(src, pages)
+
+    # Batches of two pages through a queue of two frames
+    result = video.process('encrypt', 77, src, encrypted, workers=2, queue_size=2)
+    assert result.frames == 11
+    video.process('decrypt', 77, encrypted, decrypted, workers=2, queue_size=2)
+
+    ok, ciphertexts = cv2.imreadmulti(encrypted)
+    assert ok and len(ciphertexts) == 11
+    for page, ciphertext in zip(pages, ciphertexts):
+        assert np.array_equal(ciphertext, cipher.encrypt(page, 77))
+    ok, plaintexts = cv2.imreadmulti(decrypted)
+    assert all(np.array_equal(page, plaintext) for page, plaintext in zip(pages, plaintexts))
+
+
+def test_unreadable_source_creates_no_output(tmp_path):
+    with pytest.raises(ValueError):
+        video.process_frames('encrypt', 1, str(tmp_path / 'missing.tif'),
+                             str(tmp_path / 'out.tif'))
+    assert not (tmp_path / 'out.tif').exists()
+
+
+def test_pipeline_keeps_order_and_bounds_the_queue():
+    read = []
+    sunk = []
+    reading_ahead = []
+
+    def frames():
+        for index in range(20):
+            read.append(index)
+            reading_ahead.append(len(read) - len(sunk))
+            yield np.full((2, 2), index, dtype=np.uint8)
+
+    def slow_transform(frame):
+        # Later frames finish first
+        threading.Event().wait(0.002 * (20 - int(frame[0, 0])))
+        return frame
+
+    result = video.run_pipeline(frames(), slow_transform, lambda frame: sunk.append(
+        int(frame[0, 0])), workers=4, queue_size=3)
+    assert sunk == list(range(20)) and result.frames == 20
+    # At most the queue, one frame being put and one being sunk are ahead
+    assert max(reading_ahead) <= 3 + 2
+
+
+def test_pipeline_reraises_reader_errors():
+    def frames():
+        yield np.zeros((2, 2), dtype=np.uint8)
+        raise ValueError("corrupt frame")
+
+    with pytest.raises(ValueError, match="corrupt frame"):
+        video.run_pipeline(frames(), lambda frame: frame, lambda frame: None)
@@ -0,0 +1,73 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from image_encryption import batch, watch
+
+# An hour ago: settled as far as the watcher is concerned
+OLD = time.time() - 3600
+
+
+def make_tree(root, random_image):
+    paths = []
+    for index, name in enumerate(['a.png', 'b.png', os.path.join('sub', 'c.png')]):
+        path = root / 'in' / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        cv2.imwrite(str(path), random_image((20 + index, 30, 3), seed=index))
+        os.utime(path, (OLD, OLD))
+        paths.append(path)
+    return paths
+
+
+def run_once(root, **options):
+    return watch.watch('encrypt', 77, str(root / 'in'), str(root / 'out'), once=True,
+                       status_interval=0, poll_interval=0.05, settle=0.1, workers=1, **options)
+
+
+def test_once_matches_batch_and_reruns_are_no_ops(tmp_path, random_image):
+    paths = make_tree(tmp_path, random_image)
+    # A queue of one makes the scanner wait on the single worker
+    stats = run_once(tmp_path, queue_size=1)
+    assert stats.files == 3 and not stats.failures
+
+    outputs = {}
+    for path in paths:
+        relative = path.relative_to(tmp_path / 'in')
+        expected = tmp_path / 'expected' / relative
+        batch.process_file('encrypt', 77, str(path), str(expected))
+        output = tmp_path / 'out' / relative
+        assert np.array_equal(cv2.imread(str(output), cv2.IMREAD_UNCHANGED),
+                              cv2.imread(str(expected), cv2.IMREAD_UNCHANGED))
+        outputs[output] = output.stat().st_mtime_ns
+
+    stats = run_once(tmp_path)
+    assert stats.files == 0 and not stats.failures
+    assert {output: output.stat().st_mtime_ns for output in outputs} == outputs
+
+
+def test_fresh_files_are_left_to_settle(tmp_path, random_image):
+    make_tree(tmp_path, random_image)
+    fresh = tmp_path / 'in' / 'fresh.png'
+    cv2.imwrite(str(fresh), random_image((10, 10, 3)))
+    watcher = watch.Watcher('encrypt', 77, str(tmp_path / 'in'), str(tmp_path / 'out'),
+                            settle=60)
+
+    # The first sighting of any file only records its signature
+    ready, settling = watcher.scan(watcher.list_files())
+    assert ready == [] and settling
+    ready, settling = watcher.scan(watcher.list_files())
+    assert settling
+    assert sorted(os.path.basename(path) for path, _ in ready) == ['a.png', 'b.png', 'c.png']
+
+
+def test_current_outputs_are_skipped(tmp_path, random_image):
+    paths = make_tree(tmp_path, random_image)
+    done = tmp_path / 'out' / 'a.png'
+    batch.process_file('encrypt', 77, str(paths[0]), str(done))
+    watcher = watch.Watcher('encrypt', 77, str(tmp_path / 'in'), str(tmp_path / 'out'),
+                            settle=0)
+    watcher.scan(watcher.list_files())
+    ready, _ = watcher.scan(watcher.list_files())
+    assert sorted(os.path.basename(path) for path, _ in ready) == ['b.png', 'c.png']